@@ -0,0 +1,53 @@
+import importlib.util
+import os
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_engine.py")
+
+
+@pytest.fixture(scope="session")
+def tqd():
+    # The launcher is a single script with dashes in its name, so load it by path
+    spec = importlib.util.spec_from_file_location("tqd", os.path.join(ROOT, "the-quaker-deliverance.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def engine():
+    # Command prefix that starts the fake engine (also usable as an "exe")
+    return [sys.executable, FAKE_ENGINE]
+
+
+def make_bsp(entities, version=29, pad=45000):
+    # Minimal BSP: header, entity lump, then padding (scans skip BSPs < 40000 bytes).
+    # version is a BSP29 version number or a magic such as b"BSP2".
+    lump = entities.encode('latin-1') + b"\0"
+    header = version if isinstance(version, bytes) else struct.pack('<i', version)
+    header += struct.pack('<II', 124, len(lump))
+    return header.ljust(124, b"\0") + lump + b"\0" * pad
+
+
+def make_pak(path, files, directory_order=None):
+    # PAK of [(game path, data)], stored in list order; directory_order lists
+    # the same game paths in the order the directory should name them
+    body, entries = b"", {}
+    for name, data in files:
+        entries[name] = (12 + len(body), len(data))
+        body += data
+    directory = b"".join(name.encode('latin-1').ljust(56, b"\0") + struct.pack('<II', *entries[name])
+                         for name in directory_order or [name for name, _ in files])
+    with open(path, 'wb') as f:
+        f.write(b"PACK" + struct.pack('<II', 12 + len(body), len(directory)) + body + directory)
+    return str(path)
+
+
+def map_entities(title="", *extra):
+    # Entity lump text of a playable map: worldspawn, a spawn and extra blocks
+    blocks = ['"classname" "worldspawn"\n"message" "%s"' % title, '"classname" "info_player_start"']
+    return "".join("{\n%s\n}\n" % block for block in blocks + list(extra))
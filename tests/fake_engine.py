@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Stand-in for a Quake engine, used by the tests in place of a real one.
+# Runs the +commands of its command line in order, printing what an engine
+# prints on its console (flushed per line, as stdbuf makes a real one do):
+#   +map / +load  "Loading <name>"
+#   +echo TEXT    TEXT
+#   +wait         one 10 ms frame
+#   +timedemo D   "<frames> frames <seconds> seconds <fps> fps"
+#   +quit         exit
+# Like a real engine it keeps running after the last command until killed.
+# -fakefps N sets the fps +timedemo reports (default 132.7), so benchmark
+# configurations can be told apart by their args.
+# Environment:
+#   FAKE_ENGINE_LOG_ONLY  write the timedemo summary only to <game>/qconsole.log
+#   FAKE_ENGINE_EXIT      exit code for +quit (default 0)
+#   FAKE_ENGINE_LINGER    seconds to stay up after the last command (default 30)
+import os
+import sys
+import time
+
+
+def split_commands(argv):
+    # ["-game", "ad", "+map", "start", "+echo", "x"] -> {"-game": ["ad"]}, [("+map", ["start"]), ...]
+    options, commands = {}, []
+    current = None
+    for arg in argv:
+        if arg[:1] in "+-" and len(arg) > 1 and not arg[1:].replace('.', '').isdigit():
+            current = [arg, []]
+            if arg.startswith("+"):
+                commands.append(current)
+            else:
+                options[arg] = current[1]
+        elif current is not None:
+            current[1].append(arg)
+    return options, [(name, args) for name, args in commands]
+
+
+def say(text):
+    print(text, flush=True)
+
+
+def main(argv):
+    options, commands = split_commands(argv)
+    game = (options.get("-game") or ["id1"])[0]
+    fps = float((options.get("-fakefps") or ["132.7"])[0])
+    say(f"Fake Quake 1.0 ({game})")
+    for name, args in commands:
+        if name in ("+map", "+load"):
+            say(f"Loading {' '.join(args)}")
+            time.sleep(0.05)
+        elif name == "+echo":
+            say(" ".join(args))
+        elif name == "+wait":
+            time.sleep(0.01)
+        elif name == "+timedemo":
+            frames = 969
+            summary = f"{frames} frames {frames / fps:.1f} seconds {fps:.1f} fps"
+            if os.environ.get("FAKE_ENGINE_LOG_ONLY"):
+                os.makedirs(game, exist_ok=True)
+                with open(os.path.join(game, "qconsole.log"), 'a') as f:
+                    f.write(summary + "\n")
+            else:
+                say(summary)
+        elif name == "+quit":
+            return int(os.environ.get("FAKE_ENGINE_EXIT", "0"))
+    time.sleep(float(os.environ.get("FAKE_ENGINE_LINGER", "30")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
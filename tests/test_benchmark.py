@@ -0,0 +1,71 @@
+import json
+
+from conftest import FAKE_ENGINE
+
+
+def test_parse_timedemo_output(tqd):
+    assert tqd.parse_timedemo_output("969 frames 7.3 seconds 132.7 fps\n") == \
+        {"frames": 969, "seconds": 7.3, "fps": 132.7}
+    # FTEQW appends frame times; the last summary wins
+    text = "969 frames 9.0 seconds 107.6 fps\n969 frames 7.31 seconds 132.65 fps, 0.4 ms best\n"
+    assert tqd.parse_timedemo_output(text)["fps"] == 132.65
+    assert tqd.parse_timedemo_output("Playing demo from demo1.dem.\n") is None
+    assert tqd.parse_timedemo_output(None) is None
+
+
+def test_run_timedemo_stops_engine_after_summary(tqd, engine, tmp_path):
+    cmd = engine + ["-game", "id1", "-fakefps", "250", "+timedemo", "demo1"]
+    result = tqd.run_timedemo(cmd, cwd=str(tmp_path), timeout=20)
+    assert result["status"] == "ok"
+    assert result["frames"] == 969 and result["fps"] == 250.0
+    # The fake engine lingers for 30 s, as real ones keep running
+    assert result["wall"] < 15
+
+
+def test_run_timedemo_reads_console_log(tqd, engine, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ENGINE_LOG_ONLY", "1")
+    monkeypatch.setenv("FAKE_ENGINE_LINGER", "0")
+    log_path = tmp_path / "id1" / "qconsole.log"
+    log_path.parent.mkdir()
+    log_path.write_text("969 frames 99.0 seconds 9.8 fps\n")  # an earlier run
+    cmd = engine + ["-game", "id1", "-fakefps", "60", "+timedemo", "demo1"]
+    result = tqd.run_timedemo(cmd, cwd=str(tmp_path), log_path=str(log_path), timeout=20)
+    assert result["status"] == "ok"
+    assert result["fps"] == 60.0
+
+
+def test_run_timedemo_without_summary(tqd, engine, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ENGINE_LINGER", "0")
+    result = tqd.run_timedemo(engine + ["+echo", "nothing"], cwd=str(tmp_path), timeout=20)
+    assert result["status"] == "no timedemo output"
+    assert result["fps"] is None
+
+
+def test_benchmark_runs_and_summary(tqd, tmp_path):
+    rows = tqd.run_benchmark([FAKE_ENGINE], ["id1"], ["demo1", "demo2"], ["-fakefps 100", "-fakefps 200"],
+                             repeat=2, timeout=20, log=lambda *a: None)
+    assert len(rows) == 8
+    assert all(r["status"] == "ok" for r in rows)
+    summary = tqd.summarize_benchmark(rows)
+    assert len(summary) == 4
+    by_args = {(s["demo"], s["args"]): s for s in summary}
+    assert by_args[("demo1", "-fakefps 100")]["mean_fps"] == 100.0
+    assert by_args[("demo2", "-fakefps 200")]["ok"] == 2
+
+    out = tmp_path / "bench.json"
+    tqd.write_benchmark_results(rows, str(out))
+    data = json.loads(out.read_text())
+    assert len(data["runs"]) == 8 and len(data["summary"]) == 4
+
+    out = tmp_path / "bench.csv"
+    tqd.write_benchmark_results(rows, str(out))
+    lines = out.read_text().splitlines()
+    assert lines[0].startswith("engine,mod,demo,args,run,status")
+    assert len(lines) == 9
+
+
+def test_summary_counts_failed_runs(tqd):
+    rows = [{"engine": "e", "mod": "id1", "demo": "d", "args": "", "run": i, "status": s, "fps": f}
+            for i, (s, f) in enumerate([("ok", 100.0), ("timeout", None), ("ok", 50.0)], 1)]
+    (s,) = tqd.summarize_benchmark(rows)
+    assert (s["runs"], s["ok"], s["mean_fps"], s["min_fps"], s["max_fps"]) == (3, 2, 75.0, 50.0, 100.0)
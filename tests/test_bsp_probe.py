@@ -0,0 +1,62 @@
+import io
+import struct
+
+import pytest
+
+from conftest import make_bsp, make_pak, map_entities
+
+
+@pytest.mark.parametrize("version, fmt", [(29, "BSP29"), (b"BSP2", "BSP2"), (b"2PSB", "2PSB")])
+def test_probe_detects_format(tqd, version, fmt):
+    probe = tqd.probe_bsp(io.BytesIO(make_bsp(map_entities("The Installation"), version=version)))
+    assert probe["format"] == fmt
+    assert probe["valid"] and probe["has_spawn"]
+    assert probe["title"] == "The Installation"
+    assert probe["ent_off"] == tqd.BSP_HEADER_BYTES
+
+
+@pytest.mark.parametrize("magic", [
+    struct.pack('<i', 30),  # Half-Life
+    b"IBSP",                # Quake 2/3
+])
+def test_probe_rejects_other_formats(tqd, magic):
+    data = magic + make_bsp(map_entities("Elsewhere"))[4:]
+    probe = tqd.probe_bsp(io.BytesIO(data))
+    assert probe["format"] is None and not probe["valid"]
+    assert probe["entities"] == ""
+    assert tqd.probe_bsp(io.BytesIO(b"BSP"))["format"] is None  # truncated
+
+
+def test_probe_rejects_lump_outside_file(tqd):
+    data = make_bsp(map_entities("Cut Short"), pad=0)
+    assert tqd.probe_bsp(io.BytesIO(data), size=len(data))["valid"]
+    assert tqd.probe_bsp(io.BytesIO(data), size=len(data) - 1)["format"] is None
+    # Entity lump overlapping the header
+    bad = struct.pack('<iII', 29, 100, 10) + data[12:]
+    assert tqd.probe_bsp(io.BytesIO(bad))["format"] is None
+
+
+def test_probe_without_spawn_is_not_playable(tqd):
+    probe = tqd.probe_bsp(io.BytesIO(make_bsp('{\n"classname" "worldspawn"\n"message" "Box"\n}\n')))
+    assert probe["format"] == "BSP29"
+    assert not probe["valid"] and not probe["has_spawn"]
+    assert probe["title"] == "Box"
+
+
+def test_probe_entity_limit(tqd):
+    extra = '{\n"classname" "monster_army"\n}\n' * 100
+    data = make_bsp(map_entities("Big") + extra)
+    probe = tqd.probe_bsp(io.BytesIO(data), entity_limit=64)
+    assert len(probe["entities"]) == 64 and probe["ent_size"] > 64
+    full = tqd.probe_bsp(io.BytesIO(data), entity_limit=None)
+    assert full["entities"].count("monster_army") == 100
+
+
+def test_probe_inside_pak(tqd, tmp_path):
+    e1m1 = make_bsp(map_entities("Slipgate Complex"))
+    e1m2 = make_bsp(map_entities("Castle of the Damned"), version=b"BSP2")
+    pak_path = make_pak(tmp_path / "pak0.pak", [("maps/e1m1.bsp", e1m1), ("maps/e1m2.bsp", e1m2)])
+    with open(pak_path, 'rb') as f:
+        probe = tqd.probe_bsp(f, 12 + len(e1m1), len(e1m2))
+    assert probe["format"] == "BSP2"
+    assert probe["title"] == "Castle of the Damned"
@@ -0,0 +1,57 @@
+import threading
+
+
+def run_session(tqd, cmd, tmp_path, **kwargs):
+    done = threading.Event()
+    records = []
+
+    def on_exit(record):
+        records.append(record)
+        done.set()
+
+    session = tqd.EngineSession(cmd, cwd=str(tmp_path), info={"mod": "id1", "map": "start"},
+                                on_exit=on_exit, **kwargs)
+    assert done.wait(20), "fake engine did not exit"
+    return session, records[0]
+
+
+def test_session_records_load_milestones(tqd, engine, tmp_path):
+    cmd = engine + ["-game", "id1", "+map", "start"] + tqd.telemetry_commands() + ["+quit"]
+    session, record = run_session(tqd, cmd, tmp_path)
+    assert record["mod"] == "id1" and record["map"] == "start"
+    assert record["exit_code"] == 0
+    # +map takes 50 ms in the fake engine, then 8 "wait" frames of 10 ms
+    assert 0.05 <= record["map_spawn"] < record["first_frame"] <= record["session_seconds"]
+    assert record["load_seconds"] == record["first_frame"]
+    text = session.output_text()
+    assert "Loading start" in text and tqd.INGAME_MARKER in text
+
+
+def test_session_without_map_has_no_load_time(tqd, engine, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ENGINE_EXIT", "3")
+    session, record = run_session(tqd, engine + ["+echo", "hello", "+quit"], tmp_path)
+    assert record["exit_code"] == 3
+    assert record["load_seconds"] is None and record["map_spawn"] is None
+    assert "hello" in session.output_text()
+
+
+def test_session_output_is_bounded(tqd, engine, tmp_path):
+    cmd = engine + [arg for i in range(50) for arg in ("+echo", f"line{i}")] + ["+quit"]
+    session, _ = run_session(tqd, cmd, tmp_path, max_lines=10)
+    lines = session.output_text().splitlines()
+    assert len(lines) == 10
+    assert lines[-1].endswith("line49")
+
+
+def test_history_round_trip(tqd, engine, tmp_path):
+    cmd = engine + ["+map", "start"] + tqd.telemetry_commands() + ["+quit"]
+    _, record = run_session(tqd, cmd, tmp_path)
+    path = str(tmp_path / "history.jsonl")
+    tqd.append_launch_history(dict(record, warmed=True), path)
+    tqd.append_launch_history(dict(record, warmed=False, load_seconds=2.0), path)
+    with open(path, 'a') as f:
+        f.write('{"truncated": ')  # crash mid-write
+    history = tqd.read_launch_history(path)
+    assert [r["warmed"] for r in history] == [False, True]
+    loads = tqd.summarize_warm_loads(history)
+    assert loads[False] == (2.0, 1) and loads[True] == (record["load_seconds"], 1)
@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import map_entities
+
+
+def monsters(classname, count, spawnflags=0):
+    return '{\n"classname" "%s"\n"spawnflags" "%d"\n}\n' % (classname, spawnflags) * count
+
+
+def secrets(count):
+    return '{\n"classname" "trigger_secret"\n"target" "t1"\n}\n' * count
+
+
+MAPS = {
+    # 120 on easy, 160 on normal, 170 on hard/nightmare
+    "castle": map_entities("Castle", monsters("monster_shambler", 10), monsters("monster_knight", 110),
+                           monsters("monster_ogre", 40, spawnflags=256), monsters("monster_ogre", 10, spawnflags=768)),
+    # 200 on every skill, no shamblers
+    "horde": map_entities("Horde", monsters("monster_army", 200), secrets(3),
+                          '{\n"classname" "info_player_coop"\n}\n'),
+    # Shamblers but few monsters
+    "pit": map_entities("Pit", monsters("monster_shambler", 5),
+                        '{\n"classname" "info_player_deathmatch"\n"angle" "90"\n}\n'),
+}
+
+
+@pytest.fixture
+def index(tqd):
+    return tqd.build_entity_index({name: tqd.entity_summary(text) for name, text in MAPS.items()})
+
+
+def test_summary_counts_per_skill(tqd):
+    summary = tqd.entity_summary(MAPS["castle"])
+    assert summary["monsters"] == [120, 160, 170, 170]
+    assert summary["classes"]["monster_ogre"] == 50
+    assert summary["secrets"] == 0
+    assert "spawnflags" in summary["keys"] and "classname" not in summary["keys"]
+    assert "partial" not in summary
+    assert tqd.entity_summary(MAPS["horde"], partial=True)["partial"]
+    assert tqd.skill_stats(tqd.entity_summary(MAPS["horde"]))[2] == (200, 3)
+
+
+def test_parse_map_query(tqd):
+    terms, filters = tqd.parse_map_query("Castle has:monster_Shambler monsters>150 -coop key:angle secrets<=2")
+    assert terms == ["castle"]
+    assert filters == [(False, "has", "monster_shambler"), (False, "monsters", (">", 150)),
+                       (True, "has", "info_player_coop"), (False, "key", "angle"),
+                       (False, "secrets", ("<=", 2))]
+    # Not filters: no name after the colon, unknown comparisons, a lone dash
+    terms, filters = tqd.parse_map_query("has: health>5 -")
+    assert terms == ["has:", "health>5", "-"] and filters == []
+
+
+@pytest.mark.parametrize("skill, expected", [(0, set()), (1, {"castle"}), (3, {"castle"})])
+def test_has_and_monster_count_per_skill(tqd, index, skill, expected):
+    _, filters = tqd.parse_map_query("has:monster_shambler monsters>150")
+    assert tqd.query_entity_index(index, filters, skill) == expected
+
+
+def test_negated_filters_and_aliases(tqd, index):
+    def query(text, skill=1):
+        return tqd.query_entity_index(index, tqd.parse_map_query(text)[1], skill)
+
+    assert query("-has:monster_shambler") == {"horde"}
+    assert query("coop") == {"horde"}
+    assert query("dm") == query("deathmatch") == {"pit"}
+    assert query("-dm monsters>=160") == {"castle", "horde"}
+    assert query("-dm monsters>=160", skill=0) == {"horde"}
+    assert query("key:angle") == {"pit"}
+    assert query("secrets>0") == {"horde"}
+    assert query("monsters=5") == {"pit"}
+    assert query("has:no_such_entity") == set()
+    assert query("") == set(MAPS)
+
+
+def test_glob_filters(tqd, index):
+    def query(text):
+        return tqd.query_entity_index(index, tqd.parse_map_query(text)[1])
+
+    assert query("has:monster_*") == set(MAPS)
+    assert query("has:monster_[ak]*") == {"castle", "horde"}
+    assert query("-has:monster_og?e") == {"horde", "pit"}
+    assert query("has:info_player_*") == set(MAPS)
+    assert query("key:spawn*") == {"castle", "horde", "pit"}
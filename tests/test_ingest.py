@@ -0,0 +1,61 @@
+from PIL import Image
+
+
+def make_exif():
+    exif = Image.Exif()
+    exif[0x010F] = "Quake"  # Make
+    return exif.tobytes()
+
+
+def capture(path, fmt, **options):
+    Image.effect_noise((640, 480), 64).convert("RGB").save(path, format=fmt, **options)
+    return path
+
+
+def test_jpeg_metadata_stripped_without_reencoding(tqd, tmp_path):
+    src = capture(tmp_path / "e1m1.jpg", "JPEG", quality=90, exif=make_exif(), icc_profile=b"\0" * 128,
+                  comment=b"shot")
+    with Image.open(src) as img:
+        pixels = img.tobytes()
+    dest = tqd.ingest_screenshot(str(src), "jpg", strip_metadata=True)
+    assert dest == str(src)
+    with Image.open(dest) as img:
+        assert "exif" not in img.info and "icc_profile" not in img.info and "comment" not in img.info
+        assert img.tobytes() == pixels  # same compressed data, not a re-encode
+    assert (tmp_path / "thumbs" / "e1m1.jpg").exists()
+
+
+def test_jpeg_kept_byte_for_byte(tqd, tmp_path):
+    src = capture(tmp_path / "e1m2.jpeg", "JPEG", quality=90, exif=make_exif())
+    data = src.read_bytes()
+    dest = tqd.ingest_screenshot(str(src), "jpg", strip_metadata=False)
+    assert dest == str(tmp_path / "e1m2.jpg")
+    assert (tmp_path / "e1m2.jpg").read_bytes() == data
+    assert not src.exists()
+
+
+def test_jpeg_without_metadata_unchanged(tqd, tmp_path):
+    src = capture(tmp_path / "e1m3.jpg", "JPEG", quality=90)
+    data = src.read_bytes()
+    tqd.ingest_screenshot(str(src), "jpg")
+    assert src.read_bytes() == data
+    assert tqd.strip_jpeg_metadata(data) == data
+
+
+def test_png_resaved_without_exif(tqd, tmp_path):
+    src = capture(tmp_path / "e1m4.png", "PNG", exif=make_exif())
+    with Image.open(src) as img:
+        pixels = img.tobytes()
+    tqd.ingest_screenshot(str(src), "png", strip_metadata=True)
+    with Image.open(src) as img:
+        assert "exif" not in img.info
+        assert img.tobytes() == pixels
+
+
+def test_tga_converted_to_jpg(tqd, tmp_path):
+    src = capture(tmp_path / "e1m5.tga", "TGA")
+    dest = tqd.ingest_screenshot(str(src), "jpg")
+    assert dest == str(tmp_path / "e1m5.jpg")
+    assert not src.exists()
+    with Image.open(dest) as img:
+        assert img.format == "JPEG"
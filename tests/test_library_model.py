@@ -0,0 +1,81 @@
+import pytest
+
+ROWS = [
+    # (mod, name, title, size, mtime_ns, monsters per skill, secrets)
+    ("id1", "e1m1", "the Slipgate Complex", 500, 10, [20, 25, 30, 30], 6),
+    ("id1", "e1m2", "Castle of the Damned", 900, 20, [40, 50, 60, 60], 4),
+    ("ad", "ad_swamp", "Swamp  of\nthe Damned", 3000, 30, [150, 180, 200, 200], 8),
+    ("ad", "start", "", 100, 40, None, None),
+]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def model(request, tqd, monkeypatch):
+    # Both query paths: the NumPy one and the pure Python fallback
+    if request.param == "python":
+        monkeypatch.setattr(tqd, "np", None)
+    elif tqd.np is None:
+        pytest.skip("NumPy not installed")
+    return tqd.LibraryModel.build(ROWS, {"id1": [["pak0.pak", 1, 2]]})
+
+
+def names(records):
+    return [(r.mod, r.name) for r in records]
+
+
+def test_build_sorts_by_mod_then_map(model):
+    assert len(model) == 4
+    assert [model.row_tuple(row)[:2] for row in range(4)] == \
+        [("ad", "ad_swamp"), ("ad", "start"), ("id1", "e1m1"), ("id1", "e1m2")]
+    assert model.title(0) == "Swamp of the Damned"  # one line per row
+    assert model.find("id1", "e1m2") == 3 and model.find("id1", "nope") is None
+    assert model.mod_range("ad") == range(0, 2) and model.mod_range("hipnotic") == range(0)
+
+
+def test_query_filters_and_sorts(model):
+    assert names(model.query("damned")) == [("ad", "ad_swamp"), ("id1", "e1m2")]
+    assert names(model.query("E1M", mod="id1")) == [("id1", "e1m1"), ("id1", "e1m2")]
+    assert names(model.query(min_monsters=50, skill=1)) == [("ad", "ad_swamp"), ("id1", "e1m2")]
+    assert names(model.query(min_monsters=50, skill=0)) == [("ad", "ad_swamp")]
+    # Maps whose counts are unknown never pass a maximum
+    assert names(model.query(max_monsters=30, skill=0)) == [("id1", "e1m1")]
+    assert names(model.query(sort="size", limit=2)) == [("ad", "ad_swamp"), ("id1", "e1m2")]
+    assert names(model.query(sort="monsters", skill=3))[0] == ("ad", "ad_swamp")
+
+
+def test_record_and_set_stats(tqd, model):
+    start = model.record(model.find("ad", "start"))
+    assert start.monsters() == tqd.UNKNOWN_COUNT
+    model.set_stats("ad", "start", {sk: (sk * 2, 1) for sk in range(4)})
+    assert start.monsters(3) == 6 and start.secrets == 1
+    assert model.record(model.find("id1", "e1m1")).as_dict(skill=2) == \
+        {"mod": "id1", "map": "e1m1", "title": "the Slipgate Complex", "monsters": 30,
+         "secrets": 6, "size": 500, "mtime_ns": 10}
+
+
+def test_with_mods_keeps_known_counts(tqd, model):
+    rescanned = [("id1", "e1m1", "the Slipgate Complex", 500, 10, None, None),  # unchanged
+                 ("id1", "e1m2", "Castle of the Damned", 901, 21, None, None),  # rebuilt
+                 ("id1", "e1m3", "The Necropolis", 700, 50, None, None)]
+    updated = model.with_mods({"id1": (rescanned, [["pak0.pak", 3, 4]]), "ad": ([], None)})
+    assert [updated.row_tuple(row)[:2] for row in range(len(updated))] == \
+        [("id1", "e1m1"), ("id1", "e1m2"), ("id1", "e1m3")]
+    assert updated.record(0).monsters(1) == 25
+    assert updated.record(1).monsters(1) == tqd.UNKNOWN_COUNT
+    assert updated.mod_fps == {"id1": [["pak0.pak", 3, 4]]}
+
+
+def test_save_load_round_trip(tqd, model, tmp_path):
+    path = str(tmp_path / "library.bin")
+    model.save(path, "/games/quake")
+    loaded = tqd.LibraryModel.load(path, "/games/quake")
+    assert [loaded.row_tuple(row) for row in range(len(loaded))] == \
+        [model.row_tuple(row) for row in range(len(model))]
+    assert loaded.mod_fps == model.mod_fps
+    assert names(loaded.query("damned", skill=0, min_monsters=100)) == [("ad", "ad_swamp")]
+    # Built for another Quake folder, or damaged: rebuilt from the scan caches
+    assert tqd.LibraryModel.load(path, "/other/quake") is None
+    with open(path, 'r+b') as f:
+        f.truncate(20)
+    assert tqd.LibraryModel.load(path, "/games/quake") is None
+    assert tqd.LibraryModel.load(str(tmp_path / "missing.bin"), "/games/quake") is None
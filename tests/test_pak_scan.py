@@ -0,0 +1,95 @@
+import os
+import struct
+
+from conftest import make_bsp, make_pak, map_entities
+
+
+def naive_scan(tqd, pak_path):
+    # The scan as it was before coalescing: one probe_bsp per entry, in directory order
+    maps = []
+    with open(pak_path, 'rb') as f:
+        off, size = struct.unpack('<II', f.read(12)[4:])
+        f.seek(off)
+        directory = f.read(size)
+        for i in range(0, len(directory), 64):
+            name = directory[i:i + 56].split(b"\0")[0].decode('latin-1').lower()
+            file_off, file_size = struct.unpack_from('<II', directory, i + 56)
+            if not name.endswith('.bsp') or name.startswith(('models/', 'progs/', 'textures/')):
+                continue
+            if file_size >= 40000 and tqd.probe_bsp(f, file_off, file_size)["valid"]:
+                maps.append(name.split('/')[-1][:-4])
+    return maps
+
+
+def build_pak(tqd, path):
+    zombies = "".join('{\n"classname" "monster_zombie"\n"spawnflags" "%d"\n}\n' % flags for flags in (0, 256, 0))
+    files = [
+        ("maps/e1m1.bsp", make_bsp(map_entities("Slipgate Complex") + zombies)),
+        ("maps/e1m2.bsp", make_bsp(map_entities("Castle of the Damned"))),
+        ("maps/huge.bsp", make_bsp(map_entities("Limit Breaker"), version=b"BSP2")),
+        ("maps/rmq.bsp", make_bsp(map_entities("Old Format"), version=b"2PSB")),
+        ("maps/nospawn.bsp", make_bsp('{\n"classname" "worldspawn"\n}\n')),
+        ("maps/garbage.bsp", b"\xff" * 50000),
+        ("maps/tiny.bsp", make_bsp(map_entities("Too Small"), pad=0)),
+        ("progs/ammo.bsp", make_bsp(map_entities("Not A Map"))),
+        ("gfx/filler.lmp", b"\0" * (tqd.PAK_COALESCE_GAP * 2)),  # forces a second span
+        ("maps/end.bsp", make_bsp(map_entities("Shub-Niggurath's Pit"))),
+        ("maps/dm1.bsp", make_bsp(map_entities("Place of Two Deaths"))),
+    ]
+    # Directory order is the reverse of the data order, with one pair swapped
+    order = [name for name, _ in reversed(files)]
+    order[0], order[5] = order[5], order[0]
+    return make_pak(path, files, order)
+
+
+def test_scan_matches_naive_scan(tqd, tmp_path):
+    pak_path = build_pak(tqd, tmp_path / "pak0.pak")
+    stats = {}
+    maps = tqd.scan_pak_maps(pak_path, stats)
+    assert maps == naive_scan(tqd, pak_path)
+    assert sorted(maps) == ["dm1", "e1m1", "e1m2", "end", "huge", "rmq"]
+    # Two clusters of entries: a few large reads instead of two seeks per map
+    assert stats["reads"] <= 4 < 2 * len(maps)
+    # ...and the filler between the clusters is never read
+    assert stats["bytes"] < os.path.getsize(pak_path) - 2 * tqd.PAK_COALESCE_GAP
+
+
+def test_scan_collects_entity_summaries(tqd, tmp_path):
+    pak_path = build_pak(tqd, tmp_path / "pak0.pak")
+    entities = {}
+    maps = tqd.scan_pak_maps(pak_path, entities=entities)
+    assert sorted(entities) == sorted(maps)
+    assert entities["e1m1"]["monsters"] == [2, 3, 3, 3]
+    assert entities["e1m1"]["classes"]["monster_zombie"] == 3
+
+
+def test_scan_rejects_non_pak(tqd, tmp_path):
+    path = tmp_path / "pak0.pak"
+    path.write_bytes(b"NOPE" + b"\0" * 100)
+    assert tqd.scan_pak_maps(str(path)) == []
+
+
+def test_coalesce_ranges(tqd):
+    ranges = [(1000, 10, "c"), (0, 10, "a"), (100, 10, "b")]
+    spans = tqd.coalesce_ranges(ranges, gap=100, max_read=1 << 20)
+    assert [(s, e, [m[0] for m in members]) for s, e, members in spans] == \
+        [(0, 110, ["a", "b"]), (1000, 1010, ["c"])]
+    # max_read splits ranges the gap would have merged
+    spans = tqd.coalesce_ranges(ranges, gap=1 << 20, max_read=500)
+    assert [(s, e) for s, e, _ in spans] == [(0, 110), (1000, 1010)]
+    # Overlapping ranges share a span
+    spans = tqd.coalesce_ranges([(0, 50, "x"), (20, 10, "y")], gap=0)
+    assert spans == [[0, 50, [("x", 0, 50), ("y", 20, 10)]]]
+
+
+def test_read_ranges_serves_from_buffers(tqd, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 4)
+    buffers, stats = [], {}
+    with open(path, 'rb') as f:
+        out = tqd.read_ranges(f, [(10, 4, "a"), (20, 4, "b")], stats, buffers)
+        assert out == {"a": bytes([10, 11, 12, 13]), "b": bytes([20, 21, 22, 23])}
+        assert stats["reads"] == 1
+        out = tqd.read_ranges(f, [(12, 2, "c")], stats, buffers)
+    assert out == {"c": bytes([12, 13])}
+    assert stats["reads"] == 1
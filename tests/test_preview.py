@@ -0,0 +1,38 @@
+from PIL import Image
+
+
+def test_decode_palette_png_reduced(tqd, tmp_path):
+    path = tmp_path / "e1m1.png"
+    Image.effect_noise((2000, 1000), 64).convert("P").save(path)
+    img, full_size = tqd.decode_preview(str(path), (400, 300))
+    assert full_size == (2000, 1000)
+    assert img.mode == "RGB"
+    assert img.width >= 400 and img.height >= 300 and img.width < 2000
+
+
+def test_decode_palette_transparency_keeps_alpha(tqd, tmp_path):
+    path = tmp_path / "e1m2.png"
+    img = Image.effect_noise((800, 600), 64).convert("P")
+    img.info["transparency"] = 0
+    img.save(path, transparency=0)
+    decoded, _ = tqd.decode_preview(str(path), (200, 150))
+    assert decoded.mode == "RGBA"
+    assert decoded.size == (200, 150)
+
+
+def test_decode_one_bit_image(tqd, tmp_path):
+    path = tmp_path / "e1m3.png"
+    Image.effect_noise((900, 600), 64).convert("1").save(path)
+    img, _ = tqd.decode_preview(str(path), (300, 200))
+    assert img.mode == "RGB" and img.size == (300, 200)
+
+
+def test_gallery_thumb_from_palette_preview(tqd, tmp_path):
+    previews = tmp_path / "previews"
+    previews.mkdir()
+    path = previews / "start.gif"
+    Image.effect_noise((1600, 1200), 64).convert("P").save(path)
+    thumb = tqd.load_gallery_thumb(str(path))
+    assert thumb.mode == "RGB"
+    assert thumb.width <= tqd.GALLERY_TILE[0] and thumb.height <= tqd.GALLERY_TILE[1]
+    assert (previews / "thumbs" / "start.jpg").exists()
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from conftest import make_pak
+
+
+def read(found):
+    path, offset, size = found
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+@pytest.fixture
+def quake(tqd, tmp_path):
+    # id1: pak0 with the base game; mod: pak0 and pak1 overriding each other, plus loose files
+    (tmp_path / "id1").mkdir()
+    make_pak(tmp_path / "id1" / "PAK0.PAK", [("maps/e1m1.bsp", b"id1 e1m1"), ("progs.dat", b"id1 progs"),
+                                             ("gfx/conback.lmp", b"id1 conback")])
+    mod = tmp_path / "mod"
+    (mod / "maps").mkdir(parents=True)
+    make_pak(mod / "pak0.pak", [("maps/a.bsp", b"pak0 a"), ("maps/b.bsp", b"pak0 b"), ("maps/c.bsp", b"pak0 c"),
+                                ("progs.dat", b"pak0 progs")])
+    make_pak(mod / "pak1.pak", [("maps/a.bsp", b"pak1 a"), ("maps/b.bsp", b"pak1 b"),
+                                ("sound/Misc/Secret.wav", b"pak1 secret")])
+    (mod / "maps" / "A.bsp").write_bytes(b"loose a")
+    core = tqd.LibraryCore()
+    core.init_library(str(tmp_path))
+    return core, str(mod)
+
+
+def test_loose_beats_pak1_beats_pak0(quake):
+    core, mod = quake
+    vfs = core.mod_vfs(mod)
+    assert read(vfs.resolve("maps/a.bsp")) == b"loose a"    # loose file, matched case-insensitively
+    assert vfs.resolve("maps/a.bsp")[1:] == (0, 7)
+    assert read(vfs.resolve("maps/b.bsp")) == b"pak1 b"
+    assert read(vfs.resolve("maps/c.bsp")) == b"pak0 c"
+    assert read(vfs.resolve("progs.dat")) == b"pak0 progs"  # the mod's own, over id1's
+    assert read(vfs.resolve("SOUND/misc/secret.wav")) == b"pak1 secret"
+
+
+def test_id1_is_the_fallback(quake):
+    core, mod = quake
+    vfs = core.mod_vfs(mod)
+    assert read(vfs.resolve("maps/e1m1.bsp")) == b"id1 e1m1"
+    assert read(vfs.resolve("gfx/conback.lmp")) == b"id1 conback"
+    assert vfs.resolve("maps/e1m1.bsp", fallback=False) is None
+    assert vfs.resolve("maps/missing.bsp") is None
+    base = core.mod_vfs(os.path.join(core.quake_root, "id1"))
+    assert base.base is None and base.resolve("maps/a.bsp") is None
+
+
+def test_find_basename_prefers_maps(quake):
+    core, mod = quake
+    vfs = core.mod_vfs(mod)
+    assert read(vfs.find_basename("B.bsp")) == b"pak1 b"
+    assert vfs.find_basename("secret.wav")[0].endswith("pak1.pak")
+    assert vfs.find_basename("nothing.bsp") is None
+
+
+def test_rebuilt_when_a_pak_changes(quake):
+    core, mod = quake
+    vfs = core.mod_vfs(mod)
+    assert core.mod_vfs(mod) is vfs
+    make_pak(os.path.join(mod, "pak2.pak"), [("maps/c.bsp", b"pak2 c")])
+    core.fs.invalidate(mod)
+    rebuilt = core.mod_vfs(mod)
+    assert rebuilt is not vfs
+    assert read(rebuilt.resolve("maps/c.bsp")) == b"pak2 c"
+
+
+def test_pak_precedence(tqd):
+    names = ["pak10.pak", "zzz.pak", "PAK2.PAK", "pak0.pak", "aaa.pak", "pak1.pak"]
+    assert sorted(names, key=tqd.pak_precedence) == \
+        ["pak0.pak", "pak1.pak", "PAK2.PAK", "pak10.pak", "aaa.pak", "zzz.pak"]
@@ -9,10 +9,34 @@ import threading
 import time
 import shutil
 import fnmatch
-from PIL import Image, ImageTk
+import io
+import filecmp
+import itertools
+import operator
+import queue
+import collections
+from PIL import Image, ImageTk, features
 import random
 import re
 import platform
+import shlex
+import socket
+import socketserver
+import struct
+import sys
+import select
+import ctypes
+import ctypes.util
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from array import array
+import bisect
+
+# NumPy is optional: library-wide filters and sorts are vectorized when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 try:
     from PIL import Image, ImageTk
@@ -34,6 +58,9 @@ except ImportError:
 VERSION = "1.1.6"
 CONFIG_FILE = "the-quaker-deliverance.json"
 
+# How often (ms) results from background jobs are applied to the UI (~60 fps)
+UI_FRAME_MS = 16
+
 
 # list of potential screenshot file names covering vkQuake, Ironwail, Quakespasm, DarkPlaces, and FTEQW
 SCREENSHOT_PATTERNS = [
@@ -45,7 +72,2673 @@ SCREENSHOT_PATTERNS = [
     "capture*.png"                        # Kex Engine (Enhanced re-release)
 ]
 
-class QuakeLauncher:
+# Launch telemetry (Settings > Record load times): one JSON line per launch
+LAUNCH_HISTORY_FILE = "the-quaker-deliverance-launches.jsonl"
+ENGINE_OUTPUT_LINES = 2000  # console lines kept in memory per launch
+
+# Extensions tried (in order) when looking for a map or mod preview
+PREVIEW_EXTS = ['.png', '.jpg', '.webp', '.tga']
+
+# Ingested screenshots: format name -> (Pillow format, extension)
+SCREENSHOT_FORMATS = {"jpg": ("JPEG", ".jpg"), "png": ("PNG", ".png"), "webp": ("WEBP", ".webp")}
+THUMB_DIR = "thumbs"      # previews/thumbs/<map>.jpg
+THUMB_SIZE = (480, 360)
+
+
+def write_json_atomic(path, data):
+    # Readers (and a crash mid-write) see the old file or the new one, never a
+    # truncated one; the temp name is per thread since writers may overlap
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class DirIndex:
+    # Case-insensitive directory listings.
+    # Each directory is read with a single os.scandir and kept until its mtime
+    # changes, so repeated "does previews/foo.png exist?" probes cost nothing
+    # (important on NFS, where every os.path.exists is a network round trip).
+    # Lookups ignore case, so MAPS/E1M1.BSP and previews/Foo.PNG are found too.
+    # File stats are never cached: a file rewritten in place (a save, a
+    # recompiled map) leaves its directory's mtime alone, and sizes/mtimes are
+    # used as fingerprints by the scan cache, the VFS and the levelshots.
+
+    # How long (seconds) a listing is trusted before the directory is re-stat'ed
+    REVALIDATE_SECS = 1.0
+
+    def __init__(self):
+        self._dirs = {}  # dir path -> [dir mtime_ns, checked_at, {lower name: entry}]
+        self._lock = threading.Lock()
+
+    def _listing(self, dir_path):
+        # Returns {lower name: [real name, is_dir]} or None if missing
+        now = time.monotonic()
+        with self._lock:
+            cached = self._dirs.get(dir_path)
+            if cached and now - cached[1] < self.REVALIDATE_SECS:
+                return cached[2]
+        try:
+            mtime = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._dirs.pop(dir_path, None)
+            return None
+        if cached and cached[0] == mtime:
+            cached[1] = now
+            return cached[2]
+
+        entries = {}
+        try:
+            with os.scandir(dir_path) as it:
+                for e in it:
+                    try:
+                        is_dir = e.is_dir()
+                    except OSError:
+                        is_dir = False
+                    # Keep the first spelling if a case-sensitive FS has duplicates
+                    entries.setdefault(e.name.lower(), [e.name, is_dir])
+        except OSError:
+            return None
+        with self._lock:
+            self._dirs[dir_path] = [mtime, now, entries]
+        return entries
+
+    def resolve(self, base, *parts):
+        # Case-insensitively resolves base/parts... to a real path, or None
+        path = base
+        for part in parts:
+            if not part:
+                continue
+            listing = self._listing(path)
+            if listing is None:
+                return None
+            entry = listing.get(part.lower())
+            if entry is None:
+                return None
+            path = os.path.join(path, entry[0])
+        return path
+
+    def find(self, base, stem, exts):
+        # First existing base/stem+ext for ext in exts (in order), or None
+        listing = self._listing(base)
+        if not listing:
+            return None
+        stem = stem.lower()
+        for ext in exts:
+            entry = listing.get(stem + ext)
+            if entry and not entry[1]:
+                return os.path.join(base, entry[0])
+        return None
+
+    def exists(self, path):
+        parent, name = os.path.split(path)
+        listing = self._listing(parent)
+        return bool(listing) and name.lower() in listing
+
+    def isdir(self, path):
+        parent, name = os.path.split(path)
+        listing = self._listing(parent)
+        entry = listing.get(name.lower()) if listing else None
+        return bool(entry and entry[1])
+
+    def listdir(self, dir_path):
+        # Real file names, like os.listdir (empty list if the dir is missing)
+        listing = self._listing(dir_path)
+        return [e[0] for e in listing.values()] if listing else []
+
+    def stat(self, path):
+        # Fresh os.stat of the (case-insensitively) named file, or None.
+        # The listing answers "missing" without a syscall.
+        parent, name = os.path.split(path)
+        listing = self._listing(parent)
+        entry = listing.get(name.lower()) if listing else None
+        if entry is None:
+            return None
+        try:
+            return os.stat(os.path.join(parent, entry[0]))
+        except OSError:
+            return None
+
+    def getsize(self, path):
+        st = self.stat(path)
+        return st.st_size if st else 0
+
+    def getmtime(self, path):
+        st = self.stat(path)
+        return st.st_mtime if st else 0
+
+    def invalidate(self, dir_path=None):
+        # Drop one directory listing (after we write to it) or everything
+        with self._lock:
+            if dir_path is None:
+                self._dirs.clear()
+            else:
+                self._dirs.pop(dir_path, None)
+
+
+def pak_precedence(name):
+    # Sort key, lowest precedence first: pak0 < pak1 < ... < pak10, then any
+    # other *.pak by name (loaded last by the ports that load them at all)
+    match = re.fullmatch(r'pak(\d+)\.pak', name.lower())
+    return (0, int(match.group(1)), "") if match else (1, 0, name.lower())
+
+
+class ModFileSystem:
+    # One mod's game paths as the engine sees them: loose files over pakN over
+    # ... over pak0, then the base game (id1) in the same order. The PAK
+    # directories are read once into a dict, so resolving any game path
+    # ("maps/e1m1.bsp", "progs.dat") to (file, offset, size) is a lookup.
+    # Paths match exactly (case-insensitive, as on the engines' PAKs).
+
+    def __init__(self, fs, mod_path, fingerprint, entries, base=None):
+        self.fs = fs
+        self.mod_path = mod_path
+        self.fingerprint = fingerprint  # [[pak name, size, mtime_ns], ...] it was built from
+        self.entries = entries          # lowercase game path -> (pak path, offset, size), winners only
+        self.base = base
+        self._basenames = None
+
+    def resolve(self, game_path, fallback=True):
+        # (file, offset, size) for a game path, or None
+        key = game_path.lower()
+        loose = self.fs.resolve(self.mod_path, *key.split('/'))
+        if loose and not self.fs.isdir(loose):
+            return loose, 0, self.fs.getsize(loose)
+        found = self.entries.get(key)
+        if found:
+            return found
+        return self.base.resolve(key) if fallback and self.base else None
+
+    def find_basename(self, file_name):
+        # A PAK entry named exactly file_name in any folder (maps/ preferred),
+        # for maps that map packs keep outside maps/
+        if self._basenames is None:
+            names = {}
+            for key in sorted(self.entries, key=lambda k: not k.startswith("maps/")):
+                names.setdefault(key.rsplit('/', 1)[-1], key)
+            self._basenames = names
+        key = self._basenames.get(file_name.lower())
+        return self.entries[key] if key else None
+
+
+# Job priorities for the JobScheduler (lower runs first)
+PRIORITY_SELECTION = 0   # whatever the user just clicked
+PRIORITY_PREFETCH = 1    # neighbours of the current selection
+PRIORITY_BACKGROUND = 2  # map scans and other bulk work
+
+
+class JobScheduler:
+    # Small priority thread pool for all disk/metadata I/O.
+    # Jobs belong to a "channel" (e.g. "mod", "map"). Bumping a channel's
+    # generation makes every queued or running job on it stale: stale jobs are
+    # skipped before they start and their results are dropped when they finish,
+    # so a slow scan of a mod you already left can never overwrite the UI.
+    # Results (and anything else posted from a thread) go through ui_queue,
+    # which the Tk thread drains once per frame via drain().
+
+    def __init__(self, workers=2):
+        self._jobs = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.ui_queue = queue.Queue()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"tqd-job-{i}", daemon=True).start()
+
+    def generation(self, channel):
+        with self._lock:
+            return self._generations.get(channel, 0)
+
+    def bump(self, channel):
+        # Invalidates all outstanding work on a channel and returns the new token
+        with self._lock:
+            token = self._generations.get(channel, 0) + 1
+            self._generations[channel] = token
+            return token
+
+    def is_current(self, channel, token):
+        return channel is None or self.generation(channel) == token
+
+    def submit(self, priority, channel, func, *args, on_done=None, on_error=None):
+        # Runs func(*args) on a worker; on_done(result) is called on the Tk thread,
+        # or on_error(exception) if func raised
+        token = self.generation(channel) if channel else None
+        self._jobs.put((priority, next(self._seq), channel, token, func, args, on_done, on_error))
+        return token
+
+    def post(self, func, *args, channel=None, token=None):
+        # Thread-safe: schedule func(*args) on the Tk thread
+        self.ui_queue.put((channel, token, func, args))
+
+    def _worker(self):
+        while True:
+            priority, _, channel, token, func, args, on_done, on_error = self._jobs.get()
+            if not self.is_current(channel, token):
+                continue
+            try:
+                result = func(*args)
+            except Exception as e:
+                print(f"Job error ({getattr(func, '__name__', func)}): {e}")
+                if on_error is not None:
+                    self.post(on_error, e, channel=channel, token=token)
+                continue
+            if on_done is not None:
+                self.post(on_done, result, channel=channel, token=token)
+
+    def drain(self):
+        # Tk thread only: run everything posted since the last frame
+        while True:
+            try:
+                channel, token, func, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                return
+            if not self.is_current(channel, token):
+                continue
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"UI update error ({getattr(func, '__name__', func)}): {e}")
+
+
+class LibraryWatcher:
+    # Watches the Quake root, every mod root and each mod's maps/ folder and
+    # reports map-related changes (mods added/removed, .bsp and .pak files
+    # written, moved or deleted) once per mod after a short quiet period.
+    # Uses inotify on Linux; elsewhere it polls directory mtimes and PAK stats
+    # (plus the loose BSPs of focus_mod, the mod on screen).
+    # on_change(mod_name) is called from the watcher thread; None = mod list.
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    SETTLE_SECS = 1.0  # wait for the engine/compiler to finish writing
+    POLL_SECS = 5.0
+
+    def __init__(self, root_dir, on_change):
+        self.root_dir = root_dir
+        self.on_change = on_change
+        self.focus_mod = None  # set by the UI; only used by the poll fallback
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="tqd-library-watch", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @staticmethod
+    def is_relevant(name, in_maps_dir):
+        name = name.lower()
+        if in_maps_dir:
+            return name.endswith('.bsp')
+        return name.endswith(('.bsp', '.pak')) or name == "maps"
+
+    def _run(self):
+        try:
+            self._run_inotify()
+        except Exception as e:
+            print(f"Library watcher: inotify unavailable ({e}), polling instead")
+            self._run_poll()
+
+    def _fire_settled(self, pending):
+        now = time.monotonic()
+        for key, when in list(pending.items()):
+            if now - when >= self.SETTLE_SECS:
+                del pending[key]
+                try:
+                    self.on_change(key)
+                except Exception as e:
+                    print(f"Library watcher callback error: {e}")
+
+    def _run_inotify(self):
+        if platform.system() != "Linux":
+            raise OSError("not Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        watches = {}  # wd -> (mod name or None, kind)
+
+        def add_watch(path, mod, kind):
+            wd = libc.inotify_add_watch(fd, os.fsencode(path), self.WATCH_MASK)
+            if wd >= 0:
+                watches[wd] = (mod, kind)
+
+        def watch_mod(mod):
+            mod_path = os.path.join(self.root_dir, mod)
+            add_watch(mod_path, mod, "mod")
+            try:
+                for e in os.scandir(mod_path):
+                    if e.name.lower() == "maps" and e.is_dir():
+                        add_watch(e.path, mod, "maps")
+            except OSError:
+                pass
+
+        try:
+            add_watch(self.root_dir, None, "root")
+            for e in os.scandir(self.root_dir):
+                if e.is_dir():
+                    watch_mod(e.name)
+
+            pending = {}
+            header = struct.Struct('iIII')
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], 0.5)
+                if ready:
+                    try:
+                        data = os.read(fd, 65536)
+                    except BlockingIOError:
+                        data = b""
+                    pos = 0
+                    while pos + header.size <= len(data):
+                        wd, mask, _, name_len = header.unpack_from(data, pos)
+                        name = data[pos + header.size:pos + header.size + name_len].split(b'\0')[0]
+                        name = name.decode('utf-8', errors='replace')
+                        pos += header.size + name_len
+
+                        if mask & self.IN_Q_OVERFLOW:
+                            pending[None] = time.monotonic()
+                            continue
+                        mod, kind = watches.get(wd, (None, None))
+                        created = mask & (self.IN_CREATE | self.IN_MOVED_TO)
+                        if kind == "root" and mask & self.IN_ISDIR:
+                            if created:
+                                watch_mod(name)
+                            pending[None] = time.monotonic()
+                        elif kind in ("mod", "maps") and self.is_relevant(name, kind == "maps"):
+                            if kind == "mod" and created and mask & self.IN_ISDIR and name.lower() == "maps":
+                                add_watch(os.path.join(self.root_dir, mod, name), mod, "maps")
+                            pending[mod] = time.monotonic()
+                self._fire_settled(pending)
+        finally:
+            os.close(fd)
+
+    def _run_poll(self):
+        # Cheap fallback: a few stats per mod per poll. Directory mtimes catch
+        # added/removed/renamed files; PAKs are stat'ed since they can be
+        # rewritten in place without touching their directory. Loose BSPs are
+        # too (a recompile), but only for the mod on screen: stat'ing every
+        # map of a large library every few seconds is not cheap.
+        def stat(path):
+            try:
+                st = os.stat(path)
+                return (st.st_size, st.st_mtime_ns)
+            except OSError:
+                return None
+
+        def stat_entry(e):
+            try:
+                st = e.stat()
+                return (st.st_size, st.st_mtime_ns)
+            except OSError:
+                return None
+
+        def snapshot_mod(mod):
+            mod_path = os.path.join(self.root_dir, mod)
+            snap = {mod_path: stat(mod_path)}
+            loose = mod == self.focus_mod
+            try:
+                for e in os.scandir(mod_path):
+                    if e.name.lower() == "maps" and e.is_dir():
+                        snap[e.path] = stat(e.path)
+                        if not loose:
+                            continue
+                        try:
+                            for m in os.scandir(e.path):
+                                if m.name.lower().endswith('.bsp'):
+                                    snap[m.path] = stat_entry(m)
+                        except OSError:
+                            pass
+                    elif e.name.lower().endswith('.pak') or (loose and e.name.lower().endswith('.bsp')):
+                        snap[e.path] = stat_entry(e)
+            except OSError:
+                pass
+            return snap
+
+        def list_mods():
+            try:
+                return {e.name for e in os.scandir(self.root_dir) if e.is_dir()}
+            except OSError:
+                return set()
+
+        root_stat = stat(self.root_dir)
+        mods = {m: snapshot_mod(m) for m in list_mods()}
+        focus = self.focus_mod
+        pending = {}
+        while not self._stop.wait(self.POLL_SECS):
+            if self.focus_mod != focus:
+                # Start (or stop) stat'ing loose BSPs from now on
+                for m in (focus, self.focus_mod):
+                    if m in mods:
+                        mods[m] = snapshot_mod(m)
+                focus = self.focus_mod
+                # A BSP recompiled while the mod was not on screen is newer than its last scan
+                scanned = stat(os.path.join(self.root_dir, focus or "", "previews", "scan_cache.json"))
+                if focus in mods and scanned and any(
+                        value and value[1] > scanned[1]
+                        for path, value in mods[focus].items() if path.lower().endswith('.bsp')):
+                    pending[focus] = time.monotonic()
+
+            now_root = stat(self.root_dir)
+            if now_root != root_stat:
+                root_stat = now_root
+                current = list_mods()
+                if current != set(mods):
+                    for m in current - set(mods):
+                        mods[m] = snapshot_mod(m)
+                    for m in set(mods) - current:
+                        del mods[m]
+                    pending[None] = time.monotonic()
+
+            for mod, snap in mods.items():
+                if any(stat(path) != value for path, value in snap.items()):
+                    mods[mod] = snapshot_mod(mod)
+                    pending[mod] = time.monotonic()
+            self._fire_settled(pending)
+
+
+def build_launch_command(exe, mod, skill=None, map_name=None, save_name=None, extra_args="", commands=None):
+    # Builds the engine command line shared by the LAUNCH button and --benchmark
+    # 1. Base Command
+    cmd = [exe, "-game", mod]
+
+    # 2. DECISION LOGIC: Save vs Map vs Default
+    if save_name:
+        # CASE A: Loading a Save (without the .sav extension)
+        cmd.extend(["+load", save_name])
+    elif map_name and map_name != "(Default)":
+        # CASE B: Starting a fresh Map.
+        cmd.extend(["+skill", str(skill if skill is not None else 1), "+map", map_name])
+    elif skill is not None:
+        # CASE C: Launching to Main Menu.
+        cmd.extend(["+skill", str(skill)])
+
+    # 3. Add extra CLI parameters
+    extra = (extra_args or "").strip()
+    if extra:
+        cmd.extend(shlex.split(extra))
+
+    # 4. Console commands that must run last (e.g. +timedemo)
+    if commands:
+        cmd.extend(commands)
+    return cmd
+
+
+# --- Usage history ---
+# Selections and launches per mod (kept in the config) rank the mods that are
+# prewarmed at idle after startup.
+USAGE_EVENTS_KEPT = 20      # newest events kept per mod
+USAGE_HALF_LIFE_DAYS = 14   # an event's weight halves every this many days
+USAGE_WEIGHTS = {"select": 1.0, "launch": 3.0}
+PREWARM_DELAY_MS = 1500     # wait for the startup restore to settle first
+
+
+def rank_mods_by_usage(usage, now=None):
+    # Mods most likely to be picked next: recency-weighted event counts
+    now = now or time.time()
+    half_life = USAGE_HALF_LIFE_DAYS * 86400
+    scores = {}
+    for mod, events in usage.items():
+        scores[mod] = sum(USAGE_WEIGHTS.get(kind, 1.0) * 0.5 ** (max(0, now - ts) / half_life)
+                          for ts, kind in events)
+    return sorted((m for m in scores if scores[m] > 0), key=lambda m: -scores[m])
+
+
+# --- Launch telemetry ---
+# The engine reports its own milestones: "echo" runs right after +map/+load has
+# spawned the server, and a few "wait" frames later the client is in the game.
+# (Quake's tokenizer splits on ':', hence the underscores.)
+SPAWN_MARKER = "tqd_spawned"
+INGAME_MARKER = "tqd_ingame"
+INGAME_WAIT_FRAMES = 8
+
+TELEMETRY_MILESTONES = [
+    ("map_spawn", re.compile(r"^\s*" + SPAWN_MARKER + r"\b")),
+    ("first_frame", re.compile(r"^\s*" + INGAME_MARKER + r"\b")),
+]
+HISTORY_FIELDS = ["time", "engine", "mod", "map", "args", "warmed", "load_seconds", "map_spawn",
+                  "first_frame", "session_seconds", "exit_code"]
+
+
+def telemetry_commands():
+    # Appended (last) to a launch that starts a map or loads a save
+    return ["+echo", SPAWN_MARKER] + ["+wait"] * INGAME_WAIT_FRAMES + ["+echo", INGAME_MARKER]
+
+
+class EngineSession:
+    # One launched engine with its console output captured. A reader thread
+    # drains stdout+stderr as fast as the engine writes (so it never blocks on
+    # a full pipe) into a bounded ring buffer, timestamping milestones.
+    # on_exit(record) is called from the reader thread when the engine quits.
+
+    def __init__(self, cmd, cwd=None, info=None, on_exit=None, max_lines=ENGINE_OUTPUT_LINES):
+        self.info = dict(info or {})  # engine/mod/map/args for the history record
+        self.lines = collections.deque(maxlen=max_lines)  # (seconds, text)
+        self.milestones = {}
+        self.on_exit = on_exit
+        self.exit_code = None
+        # Engines fully buffer stdout on a pipe; stdbuf makes glibc flush per line
+        if platform.system() == "Linux" and shutil.which("stdbuf"):
+            cmd = ["stdbuf", "-oL", "-eL"] + list(cmd)
+        self.start_time = time.time()
+        self.started = time.monotonic()
+        self.proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     stdin=subprocess.DEVNULL)
+        self.milestones["start"] = 0.0
+        threading.Thread(target=self._read, name="tqd-engine-output", daemon=True).start()
+
+    def _read(self):
+        for raw in iter(self.proc.stdout.readline, b""):
+            now = time.monotonic() - self.started
+            line = raw.decode('latin-1').rstrip("\r\n")
+            self.lines.append((now, line))
+            for name, pattern in TELEMETRY_MILESTONES:
+                if name not in self.milestones and pattern.search(line):
+                    self.milestones[name] = now
+        self.proc.stdout.close()
+        self.exit_code = self.proc.wait()
+        self.milestones["exit"] = time.monotonic() - self.started
+        if self.on_exit:
+            self.on_exit(self.record())
+
+    def record(self):
+        ms = self.milestones
+        rnd = lambda v: round(v, 3) if v is not None else None
+        return dict(self.info,
+                    time=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.start_time)),
+                    load_seconds=rnd(ms.get("first_frame", ms.get("map_spawn"))),
+                    map_spawn=rnd(ms.get("map_spawn")),
+                    first_frame=rnd(ms.get("first_frame")),
+                    session_seconds=rnd(ms.get("exit")),
+                    exit_code=self.exit_code)
+
+    def output_text(self):
+        # list() copies the deque atomically while the reader may still append
+        return "\n".join(f"[{t:8.3f}] {line}" for t, line in list(self.lines))
+
+
+_history_lock = threading.Lock()
+
+def append_launch_history(record, path=LAUNCH_HISTORY_FILE):
+    with _history_lock:
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def read_launch_history(path=LAUNCH_HISTORY_FILE):
+    # Newest first; damaged lines (e.g. a crash mid-write) are skipped
+    records = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                try: records.append(json.loads(line))
+                except ValueError: continue
+    except OSError:
+        pass
+    records.reverse()
+    return records
+
+
+def export_launch_history(records, path):
+    # Same conventions as --benchmark output: .json, anything else is CSV
+    if path.lower().endswith(".json"):
+        with open(path, 'w') as f:
+            json.dump(records, f, indent=4)
+    else:
+        import csv
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=HISTORY_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(records)
+
+
+# --- Page cache warming ---
+# As soon as a map is selected, the files the engine reads first (the BSP or
+# its byte range inside a PAK, .lit/.ent siblings, progs.dat) are handed to
+# the kernel with POSIX_FADV_WILLNEED, so a cold disk is read while you are
+# still picking a skill. Without posix_fadvise the ranges are read once.
+WARM_READ_CHUNK = 1024 * 1024
+WARM_MAX_BYTES = 512 * 1024 * 1024  # per launch; more would only evict itself
+
+
+def warm_page_cache(ranges, max_bytes=WARM_MAX_BYTES):
+    # [(path, offset, size)] -> bytes hinted (or read)
+    total = 0
+    for path, offset, size in ranges:
+        size = min(size, max_bytes - total)
+        if size <= 0:
+            break
+        try:
+            with open(path, 'rb') as f:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), offset, size, os.POSIX_FADV_WILLNEED)
+                else:
+                    f.seek(offset)
+                    remaining = size
+                    while remaining > 0:
+                        chunk = f.read(min(WARM_READ_CHUNK, remaining))
+                        if not chunk: break
+                        remaining -= len(chunk)
+        except OSError as e:
+            print(f"Cache warm error: {e}")
+            continue
+        total += size
+    return total
+
+
+def summarize_warm_loads(records):
+    # {True: (average load seconds, launches), False: (...)} for launches
+    # recorded with and without page cache warming
+    loads = {True: [], False: []}
+    for rec in records:
+        if rec.get("warmed") in loads and rec.get("load_seconds") is not None:
+            loads[rec["warmed"]].append(rec["load_seconds"])
+    return {k: (sum(v) / len(v), len(v)) for k, v in loads.items() if v}
+
+
+# --- Screenshot ingestion ---
+
+def thumbnail_path(image_path):
+    # previews/e1m1.png -> previews/thumbs/e1m1.jpg
+    folder, name = os.path.split(image_path)
+    return os.path.join(folder, THUMB_DIR, os.path.splitext(name)[0] + ".jpg")
+
+
+# JPEG segments dropped by strip_jpeg_metadata: APP1-APP13 (EXIF, XMP, ICC,
+# IPTC) and comments. APP0 (JFIF) and APP14 (Adobe colour transform) stay.
+JPEG_METADATA_MARKERS = set(range(0xE1, 0xEE)) | {0xFE}
+
+
+def strip_jpeg_metadata(data):
+    # Removes metadata segments from JPEG bytes without touching the image data
+    if data[:2] != b"\xff\xd8":
+        raise ValueError("not a JPEG")
+    out = [data[:2]]
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError("bad JPEG segment")
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0xDA:  # start of scan: the rest is image data
+            break
+        end = pos + 2 + struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker not in JPEG_METADATA_MARKERS:
+            out.append(data[pos:end])
+        pos = end
+    out.append(data[pos:])
+    return b"".join(out)
+
+
+def ingest_screenshot(src, fmt="jpg", quality=90, strip_metadata=True):
+    # Re-encodes a captured preview (TGA, 4K PNG, ...) to fmt next to itself,
+    # writes its display thumbnail and removes the original and any older
+    # preview of the same map in another format. Returns the new path.
+    # Captures already in a lossy fmt are not re-encoded (that only loses
+    # quality): a JPEG keeps its image data and only loses its metadata
+    # segments, a WebP is kept as is unless it has metadata to strip. PNGs
+    # are always re-saved, which is lossless and optimizes them.
+    stem = os.path.splitext(src)[0]
+    with Image.open(src) as img:
+        img.load()
+        source_format = img.format
+        has_metadata = any(k in img.info for k in ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp"))
+        exif = None if strip_metadata else img.info.get("exif")
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        format_name = SCREENSHOT_FORMATS[fmt][0] if fmt in SCREENSHOT_FORMATS else None
+        keep = format_name == source_format and (
+            format_name == "JPEG" or (format_name == "WEBP" and not (strip_metadata and has_metadata)))
+        rewritten = False  # keep: dest is written from the stripped bytes
+        if keep:
+            dest = stem + SCREENSHOT_FORMATS[fmt][1]
+            if format_name == "JPEG" and strip_metadata:
+                with open(src, 'rb') as f:
+                    data = f.read()
+                stripped = strip_jpeg_metadata(data)
+                rewritten = stripped != data
+        elif fmt in SCREENSHOT_FORMATS:
+            format_name, ext = SCREENSHOT_FORMATS[fmt]
+            dest = stem + ext
+            options = {"optimize": True} if format_name != "WEBP" else {"method": 4}
+            if format_name != "PNG":
+                options["quality"] = quality
+            if exif:
+                options["exif"] = exif
+            tmp = dest + ".tmp"
+            img.save(tmp, format=format_name, **options)
+            os.replace(tmp, dest)
+        else:
+            dest = src  # "keep": only generate the thumbnail
+
+        thumb = img.copy()
+        thumb.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+        thumb_file = thumbnail_path(dest)
+        os.makedirs(os.path.dirname(thumb_file), exist_ok=True)
+        thumb.save(thumb_file, format="JPEG", quality=80, optimize=True)
+
+    # src is closed now, so it can be replaced (Windows)
+    if rewritten:
+        tmp = dest + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(stripped)
+        os.replace(tmp, dest)
+    if keep and dest != src:
+        if rewritten:
+            os.remove(src)
+        else:
+            os.replace(src, dest)  # e.g. shot.jpeg -> shot.jpg
+    for ext in PREVIEW_EXTS:
+        old = stem + ext
+        if old != dest and os.path.exists(old):
+            os.remove(old)
+    return dest
+
+
+def decode_preview(path, target=None):
+    # Opens an image decoded close to target (w, h) instead of at full size.
+    # JPEGs use draft mode (the decoder scales by 1/2, 1/4 or 1/8 for free);
+    # other formats are decoded and then box-reduced by an integer factor.
+    # Palette and 1-bit images (GIF, PCX, some PNGs) are converted first:
+    # reduce() and the LANCZOS resizes downstream only take RGB(A)/L.
+    # Returns (image, original size); the image is never smaller than target.
+    img = Image.open(path)
+    full_size = img.size
+    if target and img.format == "JPEG":
+        img.draft(None, target)
+    img.load()
+    if img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    if target and target[0] > 0 and target[1] > 0:
+        factor = min(img.width // target[0], img.height // target[1])
+        if factor >= 2:
+            img = img.reduce(factor)
+    return img, full_size
+
+
+# --- Storage budget ---
+# Everything the launcher writes into a mod (previews/, its caches and thumbs,
+# oldscreenshots/) is accounted per directory in a small ledger kept in the
+# Quake folder. A directory is only re-listed when its mtime changes, so a
+# check costs a few stats per mod.
+STORAGE_LEDGER_FILE = "the-quaker-deliverance-storage.json"
+STORAGE_DIRS = ["previews", os.path.join("previews", THUMB_DIR), "oldscreenshots"]
+STORAGE_CHECK_DELAY_MS = 10000            # first check, after startup and prewarm
+STORAGE_CHECK_INTERVAL_MS = 10 * 60 * 1000
+STORAGE_CATEGORIES = ["previews", "thumbs", "overviews", "caches", "archived"]
+# Evicted first to last: only what the launcher regenerates on view ("overviews"
+# also covers levelshots extracted from PAKs). Previews may be recompressed;
+# archived screenshots are the user's own and are only counted.
+STORAGE_EVICTABLE = ["overviews", "thumbs"]
+RECOMPRESS_EXTS = ('.png', '.tga', '.bmp')
+RECOMPRESS_MIN_BYTES = 256 * 1024
+
+
+class StorageManager:
+    # Usage ledger and budget enforcement for launcher-owned files.
+    # Thread-safe: checks run on a background worker while the UI touches paths.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirs = {}       # dir path -> {"mod": mod path, "mtime": ns, "files": {name: [size, mtime]}}
+        self.last_used = {}  # file path -> when the launcher last showed it (LRU policy)
+        self.dirty = False
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.dirs = data.get("dirs", {})
+            self.last_used = data.get("last_used", {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"dirs": self.dirs, "last_used": self.last_used}
+            self.dirty = False
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Storage ledger error: {e}")
+
+    def touch(self, path):
+        with self.lock:
+            self.last_used[path] = round(time.time())
+            self.dirty = True
+
+    @staticmethod
+    def category(dir_path, name):
+        if os.path.basename(dir_path) == "oldscreenshots":
+            return "archived"
+        if os.path.basename(dir_path) == THUMB_DIR:
+            return "thumbs"
+        lower = name.lower()
+        if lower.endswith((OVERVIEW_SUFFIX, LEVELSHOT_SUFFIX)):
+            return "overviews"
+        if lower.endswith(tuple(PREVIEW_EXTS)):
+            return "previews"
+        return "caches"
+
+    def refresh(self, mod_paths, force=False):
+        # Re-lists only the directories whose mtime moved (all of them if force).
+        # Returns the number of directories read.
+        listed = 0
+        for mod_path in mod_paths:
+            for sub in STORAGE_DIRS:
+                dir_path = os.path.join(mod_path, sub)
+                try:
+                    mtime = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    with self.lock:
+                        if self.dirs.pop(dir_path, None) is not None:
+                            self.dirty = True
+                    continue
+                entry = self.dirs.get(dir_path)
+                if entry and entry["mtime"] == mtime and not force:
+                    continue
+                files = {}
+                try:
+                    with os.scandir(dir_path) as it:
+                        for e in it:
+                            if e.is_file(follow_symlinks=False):
+                                st = e.stat(follow_symlinks=False)
+                                files[e.name] = [st.st_size, round(st.st_mtime)]
+                except OSError as e:
+                    print(f"Storage scan error: {e}")
+                    continue
+                with self.lock:
+                    self.dirs[dir_path] = {"mod": mod_path, "mtime": mtime, "files": files}
+                    self.dirty = True
+                listed += 1
+        return listed
+
+    def usage(self, root):
+        # {"total": bytes, "categories": {category: bytes}, "mods": {mod name: bytes}}
+        cats = dict.fromkeys(STORAGE_CATEGORIES, 0)
+        mods = {}
+        with self.lock:
+            for dir_path, entry in self.dirs.items():
+                if os.path.dirname(entry["mod"]) != root:
+                    continue
+                mod = os.path.basename(entry["mod"])
+                for name, (size, _) in entry["files"].items():
+                    cats[self.category(dir_path, name)] += size
+                    mods[mod] = mods.get(mod, 0) + size
+        return {"total": sum(cats.values()), "categories": cats, "mods": mods}
+
+    def candidates(self, root, categories, policy):
+        # [(sort key, dir path, name, size, category)], least wanted first
+        found = []
+        with self.lock:
+            for dir_path, entry in self.dirs.items():
+                if os.path.dirname(entry["mod"]) != root:
+                    continue
+                for name, (size, mtime) in entry["files"].items():
+                    cat = self.category(dir_path, name)
+                    if cat not in categories:
+                        continue
+                    path = os.path.join(dir_path, name)
+                    key = self.last_used.get(path, mtime) if policy == "lru" else mtime
+                    found.append((categories.index(cat), key, dir_path, name, size))
+        found.sort()
+        return found
+
+    def forget(self, dir_path, name):
+        with self.lock:
+            entry = self.dirs.get(dir_path)
+            if entry:
+                entry["files"].pop(name, None)
+                try:
+                    # Our own change: keep the listing instead of re-reading it
+                    entry["mtime"] = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    pass
+            self.last_used.pop(os.path.join(dir_path, name), None)
+            self.dirty = True
+
+    def enforce(self, root, budget, policy="lru", recompress=False, quality=85):
+        # Brings the root's launcher data under budget bytes: optional
+        # recompression of the biggest PNG/TGA previews first, then eviction of
+        # overviews and thumbnails (both regenerable). Returns a report dict.
+        report = {"before": self.usage(root)["total"], "recompressed": 0, "removed": 0}
+        total = report["before"]
+        if budget and total > budget and recompress:
+            big = [(-size, d, n) for _, _, d, n, size in self.candidates(root, ["previews"], policy)
+                   if n.lower().endswith(RECOMPRESS_EXTS) and size >= RECOMPRESS_MIN_BYTES]
+            for _, dir_path, name in sorted(big):
+                if total <= budget:
+                    break
+                path = os.path.join(dir_path, name)
+                try:
+                    new = ingest_screenshot(path, "jpg", quality)
+                except Exception as e:
+                    print(f"Recompress error: {e}")
+                    continue
+                if new:
+                    report["recompressed"] += 1
+                    self.refresh([os.path.dirname(dir_path)])
+                    total = self.usage(root)["total"]
+
+        if budget and total > budget:
+            for _, _, dir_path, name, size in self.candidates(root, STORAGE_EVICTABLE, policy):
+                if total <= budget:
+                    break
+                try:
+                    os.remove(os.path.join(dir_path, name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Storage eviction error: {e}")
+                    continue
+                self.forget(dir_path, name)
+                total -= size
+                report["removed"] += 1
+        report["after"] = total
+        return report
+
+
+# --- Map titles ---
+TITLE_READ_BYTES = 8192  # worldspawn comes first in the entity lump; its keys fit easily
+
+
+def worldspawn_title(entity_text):
+    # The level name is worldspawn's "message"; other entities' messages are not titles
+    end = entity_text.find('}')
+    match = re.search(r'"message"\s+"([^"]*)"', entity_text[:end] if end >= 0 else entity_text)
+    if not match:
+        return ""
+    return " ".join(match.group(1).replace("\\n", " ").split())
+
+
+# --- BSP probing ---
+# Every Quake BSP variant starts with a magic/version word followed by the
+# entity lump's (offset, size), and the entity lump is all the launcher needs:
+# worldspawn + info_player_* make a map playable, worldspawn's "message" is its
+# title and the monster/secret entities are its stats. probe_bsp reads the
+# header and the entity lump once and answers all of those together.
+BSP_MAGICS = {b'BSP2': "BSP2", b'2PSB': "2PSB"}  # BSP2 and its RMQ predecessor
+BSP_VERSIONS = {29: "BSP29"}
+BSP_HEADER_BYTES = 124  # magic + 15 lumps of (offset, size)
+BSP_ENTITY_SCAN_BYTES = 1048576  # enough to find the spawns in huge maps (e.g. Something Wicked)
+
+
+def parse_bsp_header(header, file_size=None):
+    # (format, entity lump offset, size) from the first 12 bytes, or None if
+    # this is not a Quake BSP or the lump does not fit inside the file
+    if len(header) < 12:
+        return None
+    fmt = BSP_MAGICS.get(header[:4]) or BSP_VERSIONS.get(struct.unpack_from('<i', header)[0])
+    if not fmt:
+        return None
+    ent_off, ent_size = struct.unpack_from('<II', header, 4)
+    if not ent_size or ent_off < BSP_HEADER_BYTES:
+        return None
+    if file_size is not None and ent_off + ent_size > file_size:
+        return None
+    return fmt, ent_off, ent_size
+
+
+def bsp_probe_result(parsed, entity_chunk):
+    # The probe dict for a parsed header and (the start of) its entity lump
+    if not parsed:
+        return {"format": None, "valid": False, "ent_off": None, "ent_size": None,
+                "entities": "", "title": "", "has_spawn": False}
+    text = entity_chunk.decode('latin-1', errors='ignore')
+    lower = text.lower()
+    has_spawn = 'info_player' in lower  # relaxed: catches custom mod spawns
+    return {"format": parsed[0], "valid": 'worldspawn' in lower and has_spawn,
+            "ent_off": parsed[1], "ent_size": parsed[2],
+            "entities": text, "title": worldspawn_title(text), "has_spawn": has_spawn}
+
+
+def probe_bsp(f, offset=0, size=None, entity_limit=BSP_ENTITY_SCAN_BYTES):
+    # One header read + one entity lump read for a loose BSP (offset 0) or a
+    # BSP inside a PAK (offset/size of its directory entry).
+    # entity_limit=None reads the whole lump (needed for monster counts).
+    try:
+        f.seek(offset)
+        parsed = parse_bsp_header(f.read(12), size)
+        chunk = b""
+        if parsed:
+            f.seek(offset + parsed[1])
+            chunk = f.read(parsed[2] if entity_limit is None else min(parsed[2], entity_limit))
+        return bsp_probe_result(parsed, chunk)
+    except (OSError, struct.error):
+        return bsp_probe_result(None, b"")
+
+
+# --- Entity index ---
+# Built while a mod is scanned (the scan reads every entity lump anyway) and
+# kept in previews/entity_index.json: per map its classnames, key names and
+# per-skill monster counts, plus classname -> maps and key -> maps. Queries in
+# the map search box are answered from it without opening any BSP.
+ENTITY_INDEX_FILE = "entity_index.json"
+ENTITY_BLOCK = re.compile(r'\{[^{}]*\}')
+ENTITY_PAIR = re.compile(r'"([^"]*)"\s+"([^"]*)"')
+# spawnflags: 256 = Not on Easy, 512 = Not on Normal, 1024 = Not on Hard
+SKILL_EXCLUDE_BITS = {0: 256, 1: 512, 2: 1024, 3: 1024}
+QUERY_ALIASES = {"coop": "has:info_player_coop", "dm": "has:info_player_deathmatch",
+                 "deathmatch": "has:info_player_deathmatch"}
+QUERY_COMPARE = re.compile(r'^(monsters|secrets)(<=|>=|<|>|=)(\d+)$')
+QUERY_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "=": operator.eq}
+
+
+def entity_summary(entity_text, partial=False):
+    # Classname counts, key names, monsters per skill and secrets of one map.
+    # partial: the lump was cut off at BSP_ENTITY_SCAN_BYTES (counts are low).
+    classes = {}
+    keys = set()
+    monsters = [0, 0, 0, 0]
+    secrets = 0
+    for block in ENTITY_BLOCK.findall(entity_text):
+        ent = {k.lower(): v for k, v in ENTITY_PAIR.findall(block)}
+        cls = ent.get("classname", "").lower()
+        classes[cls] = classes.get(cls, 0) + 1
+        keys.update(ent)
+        if cls == "trigger_secret":
+            secrets += 1
+        elif cls.startswith("monster_"):
+            try: spawnflags = int(ent.get("spawnflags", 0))
+            except ValueError: spawnflags = 0
+            for sk, bit in SKILL_EXCLUDE_BITS.items():
+                if not spawnflags & bit:
+                    monsters[sk] += 1
+    keys.discard("classname")
+    summary = {"classes": classes, "keys": sorted(keys), "monsters": monsters, "secrets": secrets}
+    if partial:
+        summary["partial"] = True
+    return summary
+
+
+def skill_stats(summary):
+    # {skill: (monsters, secrets)}, the map info "stats" layout
+    return {sk: (summary["monsters"][sk], summary["secrets"]) for sk in SKILL_EXCLUDE_BITS}
+
+
+def build_entity_index(summaries):
+    classes, keys = {}, {}
+    for m, summary in summaries.items():
+        for cls in summary["classes"]:
+            classes.setdefault(cls, []).append(m)
+        for key in summary["keys"]:
+            keys.setdefault(key, []).append(m)
+    return {"maps": summaries, "classes": classes, "keys": keys}
+
+
+def parse_map_query(query):
+    # "has:monster_shambler monsters>150 coop castle" -> (text terms, filters).
+    # Filters are (negated, kind, arg): kind "has"/"key" with a (glob) name, or
+    # "monsters"/"secrets" with (op, number). A leading '-' negates a filter.
+    terms, filters = [], []
+    for word in query.lower().split():
+        negated = word.startswith("-") and len(word) > 1
+        token = QUERY_ALIASES.get(word[1:] if negated else word, word[1:] if negated else word)
+        compare = QUERY_COMPARE.match(token)
+        if compare:
+            filters.append((negated, compare.group(1), (compare.group(2), int(compare.group(3)))))
+        elif token.startswith(("has:", "key:")) and len(token) > 4:
+            filters.append((negated, token[:3], token[4:]))
+        else:
+            terms.append(word)
+    return terms, filters
+
+
+def query_entity_index(index, filters, skill=1):
+    # Set of maps in the index matching every filter
+    summaries = index["maps"]
+    result = set(summaries)
+    for negated, kind, arg in filters:
+        if kind in ("has", "key"):
+            inverted = index["classes" if kind == "has" else "keys"]
+            names = [n for n in inverted if fnmatch.fnmatchcase(n, arg)] if any(c in arg for c in "*?[") else [arg]
+            hits = set().union(*(inverted.get(n, ()) for n in names))
+        else:
+            op, number = arg
+            hits = {m for m, s in summaries.items()
+                    if QUERY_OPS[op](s["monsters"][skill] if kind == "monsters" else s["secrets"], number)}
+        result = result - hits if negated else result & hits
+    return result
+
+
+# --- Map overviews ---
+# Maps nobody has screenshotted yet get a generated top-down view: every
+# upward-facing face (floors, ledges, liquid surfaces) is triangulated and
+# rasterized with a z-buffer in a few large NumPy operations, coloured by
+# height, with height steps outlined. Needs NumPy; rendering runs in a
+# process pool so the UI never waits on it.
+OVERVIEW_SIZE = (800, 600)
+OVERVIEW_SUFFIX = ".overview.png"     # previews/e1m1.overview.png, beside e1m1.jpg
+OVERVIEW_MAX_CANDIDATES = 4000000     # pixel tests per batch (bounds memory use)
+OVERVIEW_LOW = (52, 40, 34)           # colour of the lowest floor...
+OVERVIEW_HIGH = (226, 196, 146)       # ...and of the highest
+OVERVIEW_LIQUIDS = {"*lava": (200, 70, 20), "*slime": (60, 140, 40), "*": (50, 90, 170)}
+OVERVIEW_HIDDEN = ("sky", "trigger", "clip", "skip", "hint")  # texture name prefixes never drawn
+
+
+def overview_path(mod_path, map_name):
+    return os.path.join(mod_path, "previews", map_name + OVERVIEW_SUFFIX)
+
+
+def bsp_floor_triangles(data):
+    # (triangles [n,3,3] float, colour class per triangle) for the upward-facing
+    # faces of every brush model in a BSP29/BSP2/2PSB. Class: 0 = solid, 1+ = liquid.
+    parsed = parse_bsp_header(data[:12], len(data))
+    if not parsed:
+        return None
+    lumps = struct.unpack_from('<30i', data, 4)
+    lump = lambda i: data[lumps[2 * i]:lumps[2 * i] + lumps[2 * i + 1]]
+    wide = parsed[0] != "BSP29"  # BSP2 and 2PSB widen edges and faces to 32 bits
+
+    planes = np.frombuffer(lump(1), dtype=[('normal', '<f4', 3), ('dist', '<f4'), ('type', '<i4')])
+    verts = np.frombuffer(lump(3), dtype='<f4').reshape(-1, 3)
+    texinfo = np.frombuffer(lump(6), dtype=[('vecs', '<f4', 8), ('miptex', '<i4'), ('flags', '<i4')])
+    edges = np.frombuffer(lump(12), dtype='<u4' if wide else '<u2').reshape(-1, 2).astype(np.int64)
+    surfedges = np.frombuffer(lump(13), dtype='<i4').astype(np.int64)
+    short = '<i4' if wide else '<i2'
+    faces = np.frombuffer(lump(7), dtype=[('plane', short), ('side', short), ('firstedge', '<i4'),
+                                          ('numedges', short), ('texinfo', short), ('styles', 'u1', 4),
+                                          ('lightofs', '<i4')])
+
+    # Texture names -> colour class (-1 = hidden) per texinfo
+    textures = lump(2)
+    tex_class = []
+    if len(textures) >= 4:
+        count = struct.unpack_from('<i', textures)[0]
+        for i in range(count):
+            off = struct.unpack_from('<i', textures, 4 + 4 * i)[0]
+            name = textures[off:off + 16].split(b'\0')[0].decode('latin-1').lower() if off >= 0 else ""
+            if name.startswith(OVERVIEW_HIDDEN): tex_class.append(-1)
+            elif name.startswith("*"):
+                liquid = next(k for k in OVERVIEW_LIQUIDS if name.startswith(k))
+                tex_class.append(1 + list(OVERVIEW_LIQUIDS).index(liquid))
+            else: tex_class.append(0)
+    tex_class = np.array(tex_class or [0], dtype=np.int64)
+    miptex = np.clip(texinfo['miptex'].astype(np.int64), 0, len(tex_class) - 1)
+    face_class = tex_class[miptex][np.clip(faces['texinfo'].astype(np.int64), 0, len(texinfo) - 1)]
+
+    # Floors: the face's outward normal (plane normal, flipped for back faces) points up
+    normal_z = planes['normal'][faces['plane'].astype(np.int64), 2] * np.where(faces['side'] != 0, -1.0, 1.0)
+    keep = (normal_z > 0.7) & (face_class >= 0) & (faces['numedges'] >= 3)
+    floors, classes = faces[keep], face_class[keep]
+    if not len(floors):
+        return None
+
+    # Corner vertex of every surfedge of every floor, then fan triangles per face
+    counts = floors['numedges'].astype(np.int64)
+    corner_start = np.cumsum(counts) - counts
+    se_index = np.repeat(floors['firstedge'].astype(np.int64) - corner_start, counts) + np.arange(counts.sum())
+    se = surfedges[se_index]
+    corners = np.where(se >= 0, edges[np.abs(se), 0], edges[np.abs(se), 1])
+    ntri = counts - 2
+    tri_start = np.cumsum(ntri) - ntri
+    k = np.arange(ntri.sum()) - np.repeat(tri_start, ntri)
+    base = np.repeat(corner_start, ntri)
+    tris = verts[np.stack([corners[base], corners[base + k + 1], corners[base + k + 2]], axis=1)]
+    return tris, np.repeat(classes, ntri)
+
+
+def rasterize_overview(tris, classes, size=OVERVIEW_SIZE):
+    # RGB uint8 image [h, w, 3] of the triangles seen from above
+    width, height = size
+    margin = 8
+    lo, hi = tris.reshape(-1, 3).min(axis=0), tris.reshape(-1, 3).max(axis=0)
+    scale = min((width - 2 * margin) / max(hi[0] - lo[0], 1), (height - 2 * margin) / max(hi[1] - lo[1], 1))
+    # Screen space: x right, world y up, centred
+    off_x = (width - (hi[0] - lo[0]) * scale) / 2
+    off_y = (height - (hi[1] - lo[1]) * scale) / 2
+    px = (tris[:, :, 0] - lo[0]) * scale + off_x
+    py = height - ((tris[:, :, 1] - lo[1]) * scale + off_y)
+    pz = tris[:, :, 2]
+
+    zbuf = np.full(width * height, -np.inf, dtype=np.float32)
+    cls = np.zeros(width * height, dtype=np.int64)
+
+    # Only triangles with some area on screen; pixel bounding boxes per triangle
+    area2 = (px[:, 1] - px[:, 0]) * (py[:, 2] - py[:, 0]) - (px[:, 2] - px[:, 0]) * (py[:, 1] - py[:, 0])
+    live = np.abs(area2) > 1e-6
+    px, py, pz, area2, classes = px[live], py[live], pz[live], area2[live], classes[live]
+    x0 = np.clip(np.floor(px.min(axis=1)), 0, width - 1).astype(np.int64)
+    x1 = np.clip(np.ceil(px.max(axis=1)), 0, width - 1).astype(np.int64)
+    y0 = np.clip(np.floor(py.min(axis=1)), 0, height - 1).astype(np.int64)
+    y1 = np.clip(np.ceil(py.max(axis=1)), 0, height - 1).astype(np.int64)
+    bw, bh = x1 - x0 + 1, y1 - y0 + 1
+    boxes = bw * bh
+
+    # Batches of triangles whose boxes add up to about OVERVIEW_MAX_CANDIDATES pixels
+    cum = np.cumsum(boxes)
+    start = 0
+    while start < len(boxes):
+        limit = (cum[start - 1] if start else 0) + OVERVIEW_MAX_CANDIDATES
+        end = max(int(np.searchsorted(cum, limit, side="right")), start + 1)
+        t = np.repeat(np.arange(start, end), boxes[start:end])
+        k = np.arange(len(t)) - np.repeat(np.cumsum(boxes[start:end]) - boxes[start:end], boxes[start:end])
+        xs = x0[t] + k % bw[t]
+        ys = y0[t] + k // bw[t]
+        cx, cy = xs + 0.5, ys + 0.5
+        # Barycentric weights from edge functions; inside when all agree in sign with the area
+        w0 = ((px[t, 1] - cx) * (py[t, 2] - cy) - (px[t, 2] - cx) * (py[t, 1] - cy)) / area2[t]
+        w1 = ((px[t, 2] - cx) * (py[t, 0] - cy) - (px[t, 0] - cx) * (py[t, 2] - cy)) / area2[t]
+        w2 = 1.0 - w0 - w1
+        inside = (w0 >= -1e-4) & (w1 >= -1e-4) & (w2 >= -1e-4)
+        t, xs, ys = t[inside], xs[inside], ys[inside]
+        z = (w0[inside] * pz[t, 0] + w1[inside] * pz[t, 1] + w2[inside] * pz[t, 2]).astype(np.float32)
+        # Highest surface per pixel: sort by (pixel, z) and keep each pixel's last entry
+        pix = ys * width + xs
+        order = np.lexsort((z, pix))
+        pix, z, t = pix[order], z[order], t[order]
+        top = np.append(pix[1:] != pix[:-1], True)
+        pix, z, t = pix[top], z[top], t[top]
+        better = z > zbuf[pix]
+        zbuf[pix[better]] = z[better]
+        cls[pix[better]] = classes[t[better]]
+        start = end
+
+    # Colour by height, liquids by type, then darken height steps (walls, ledges)
+    zbuf = zbuf.reshape(height, width)
+    cls = cls.reshape(height, width)
+    drawn = np.isfinite(zbuf)
+    img = np.full((height, width, 3), 16, dtype=np.float32)
+    if drawn.any():
+        zmin, zmax = zbuf[drawn].min(), zbuf[drawn].max()
+        f = ((np.where(drawn, zbuf, zmin) - zmin) / max(zmax - zmin, 1.0))[..., None]
+        ramp = np.array(OVERVIEW_LOW, dtype=np.float32) * (1 - f) + np.array(OVERVIEW_HIGH, dtype=np.float32) * f
+        img[drawn] = ramp[drawn]
+        for i, colour in enumerate(OVERVIEW_LIQUIDS.values(), start=1):
+            img[cls == i] = colour
+        filled = np.where(drawn, zbuf, zmin - 1000)
+        step = np.zeros_like(drawn)
+        step[:, 1:] |= np.abs(np.diff(filled, axis=1)) > 16
+        step[1:, :] |= np.abs(np.diff(filled, axis=0)) > 16
+        img[step & drawn] *= 0.45
+    return img.astype(np.uint8)
+
+
+def render_overview(bsp_path, offset, size, out_path, image_size=OVERVIEW_SIZE):
+    # Process pool entry point: BSP (loose, or at offset/size in a PAK) -> PNG.
+    # Returns out_path, or None if the map has no drawable floors.
+    with open(bsp_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(size) if size else f.read()
+    found = bsp_floor_triangles(data)
+    if not found:
+        return None
+    img = Image.fromarray(rasterize_overview(*found, size=image_size), "RGB")
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    img.save(tmp_path, "PNG")
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+# --- Levelshots ---
+# Preview art shipped inside a mod's PAKs. Only PAK directories are read to find
+# them; an image is extracted and converted on its first view and then served
+# from previews/<map>.levelshot.png.
+LEVELSHOT_DIRS = ["gfx/levelshots/", "levelshots/", "maps/"]   # best first
+LEVELSHOT_EXTS = [".png", ".jpg", ".tga", ".pcx", ".lmp"]      # best first
+LEVELSHOT_SUFFIX = ".levelshot.png"
+PALETTE_ENTRY = "gfx/palette.lmp"
+
+
+def levelshot_rank(entry_name):
+    # (map, rank) for a PAK entry that is a levelshot (lower rank is better), else None
+    for d, folder in enumerate(LEVELSHOT_DIRS):
+        if entry_name.startswith(folder):
+            stem, ext = os.path.splitext(entry_name[len(folder):])
+            if ext in LEVELSHOT_EXTS and stem and "/" not in stem:
+                return stem, d * len(LEVELSHOT_EXTS) + LEVELSHOT_EXTS.index(ext)
+    return None
+
+
+def palette_lut(data):
+    # gfx/palette.lmp (768 bytes of RGB) -> putpalette() list; grey ramp without one
+    if data and len(data) >= 768:
+        return list(data[:768])
+    return [i for i in range(256) for _ in range(3)]
+
+
+def decode_levelshot(data, ext, palette):
+    # Levelshot bytes -> RGB image. LMPs (and PCXs without a palette of their
+    # own) are 8-bit indices into the Quake palette.
+    if ext == ".lmp":
+        w, h = struct.unpack_from('<II', data)
+        if not (0 < w <= 4096 and 0 < h <= 4096) or len(data) < 8 + w * h:
+            raise ValueError("bad lmp header")
+        img = Image.frombytes("P", (w, h), data[8:8 + w * h])
+        img.putpalette(palette)
+        return img.convert("RGB")
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    if ext == ".pcx" and img.mode == "L":
+        img = Image.frombytes("P", img.size, img.tobytes())
+        img.putpalette(palette)
+    return img.convert("RGB")
+
+
+# --- PAK scanning ---
+# Reading every BSP header and entity lump in PAK directory order means one
+# random seek per map. Instead the candidates are sorted by offset and nearby
+# reads are merged into large sequential ones, with posix_fadvise hints so the
+# kernel can start fetching the whole batch at once.
+PAK_COALESCE_GAP = 256 * 1024          # merge reads separated by less than this
+PAK_MAX_READ = 16 * 1024 * 1024        # but never read more than this in one call
+SCAN_IO_WORKERS = 8                    # loose BSPs/PAKs of one mod validated at once
+
+
+def coalesce_ranges(ranges, gap=PAK_COALESCE_GAP, max_read=PAK_MAX_READ):
+    # [(offset, length, key)] -> [(span start, span end, members)] in offset order
+    spans = []
+    for off, length, key in sorted(ranges, key=lambda r: r[0]):
+        end = off + length
+        if spans and off - spans[-1][1] <= gap and end - spans[-1][0] <= max_read:
+            span = spans[-1]
+            span[1] = max(span[1], end)
+            span[2].append((key, off, length))
+        else:
+            spans.append([off, end, [(key, off, length)]])
+    return spans
+
+
+def read_ranges(f, ranges, stats=None, buffers=None):
+    # Reads many (offset, length, key) ranges from f with as few calls as possible.
+    # buffers is a list of (offset, bytes) already read: ranges inside them are
+    # served from memory, and the spans read here are appended to it.
+    out = {}
+    if buffers:
+        remaining = []
+        for off, length, key in ranges:
+            for start, buf in buffers:
+                if start <= off and off + length <= start + len(buf):
+                    out[key] = buf[off - start:off - start + length]
+                    break
+            else:
+                remaining.append((off, length, key))
+        ranges = remaining
+
+    spans = coalesce_ranges(ranges)
+    if hasattr(os, "posix_fadvise"):
+        for start, end, _ in spans:
+            try:
+                os.posix_fadvise(f.fileno(), start, end - start, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                break
+    for start, end, members in spans:
+        f.seek(start)
+        buf = f.read(end - start)
+        if buffers is not None:
+            buffers.append((start, buf))
+        if stats is not None:
+            stats["reads"] = stats.get("reads", 0) + 1
+            stats["bytes"] = stats.get("bytes", 0) + len(buf)
+        for key, off, length in members:
+            out[key] = buf[off - start:off - start + length]
+    return out
+
+
+def scan_pak_maps(pak_path, stats=None, entities=None):
+    # Playable maps in a PAK: same rules as the loose-file scan (size, path and
+    # worldspawn/info_player checks), but with the I/O batched by offset.
+    # entities (a dict) receives each map's entity_summary.
+    maps = []
+    try:
+        with open(pak_path, 'rb') as f:
+            # 1. Whole directory in one read
+            header = f.read(12)
+            if header[:4] != b'PACK': return []
+            off, sz = struct.unpack('<II', header[4:12])
+            f.seek(off)
+            directory = f.read(sz)
+
+            candidates = []
+            for i in range(0, len(directory) - 63, 64):
+                full_name = directory[i:i + 56].split(b'\0')[0].decode('latin-1').strip().lower()
+                if not full_name.endswith('.bsp'):
+                    continue
+                # Ensure we aren't in a models/ folder inside the PAK
+                if any(x in full_name for x in ['models/', 'progs/', 'textures/']):
+                    continue
+                file_off, file_size = struct.unpack_from('<II', directory, i + 56)
+                if file_size < 40000: continue
+                candidates.append((file_off, file_size, full_name))
+
+            # 2. All BSP headers, then all entity lumps, each in offset order
+            # (probe_bsp's checks, with the reads batched across maps)
+            buffers = []
+            headers = read_ranges(f, [(o, 12, o) for o, _, _ in candidates], stats, buffers)
+            parsed = {}
+            for file_off, file_size, _ in candidates:
+                parsed[file_off] = parse_bsp_header(headers.get(file_off, b''), file_size)
+            lumps = [(o + p[1], min(p[2], BSP_ENTITY_SCAN_BYTES), o) for o, p in parsed.items() if p]
+            lump_data = read_ranges(f, lumps, stats, buffers)
+
+            for file_off, _, full_name in candidates:
+                probe = bsp_probe_result(parsed[file_off], lump_data.get(file_off, b""))
+                if probe["valid"]:
+                    name = full_name.split('/')[-1].replace('.bsp', '')
+                    maps.append(name)
+                    if entities is not None:
+                        entities[name] = entity_summary(probe["entities"], probe["ent_size"] > BSP_ENTITY_SCAN_BYTES)
+    except Exception as e: print(f"PAK error: {e}")
+    return maps
+
+
+def pak_benchmark_main(argv):
+    # python3 the-quaker-deliverance.py --pak-benchmark <pak> [<pak> ...]
+    # Evicts each PAK from the page cache first (POSIX_FADV_DONTNEED), so the
+    # numbers are cold-cache throughput, then repeats warm for comparison.
+    if not argv:
+        print("usage: the-quaker-deliverance.py --pak-benchmark PAK [PAK ...]")
+        return 2
+    can_evict = hasattr(os, "posix_fadvise")
+    if not can_evict:
+        print("posix_fadvise unavailable: results below are warm-cache only")
+    for pak_path in argv:
+        size = os.path.getsize(pak_path)
+        for label in ("cold", "warm"):
+            if label == "cold" and can_evict:
+                with open(pak_path, 'rb') as f:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            stats = {}
+            started = time.perf_counter()
+            maps = scan_pak_maps(pak_path, stats)
+            elapsed = time.perf_counter() - started
+            mb = stats.get("bytes", 0) / 1048576
+            print(f"{os.path.basename(pak_path)} [{label}]: {len(maps)} maps, {stats.get('reads', 0)} reads, "
+                  f"{mb:.1f} MB of {size / 1048576:.1f} MB in {elapsed * 1000:.1f} ms "
+                  f"({mb / elapsed if elapsed else 0:.1f} MB/s)")
+    return 0
+
+
+# --- Demo (.dem) headers ---
+# A demo is an ASCII CD-track line ("-1\n") followed by messages of
+# [int32 length][3 x float32 view angles][length bytes of server messages].
+# The first messages carry svc_serverinfo, whose first model precache is the
+# world model ("maps/e1m1.bsp"); later frames start with svc_time.
+DEMO_HEADER_BYTES = 65536
+DEMO_MAX_MSGLEN = 1 << 20
+SVC_TIME = 7
+SVC_SERVERINFO = 11
+DEMO_PROTOCOLS = (15, 666, 999)  # NetQuake, FitzQuake, RMQ
+DEMO_MAP_RE = re.compile(rb'maps/([^\x00/]+)\.bsp\x00', re.IGNORECASE)
+
+
+def _read_cstring(data, pos):
+    end = data.find(b'\x00', pos)
+    if end < 0:
+        return None, len(data)
+    return data[pos:end].decode('latin-1', errors='ignore'), end + 1
+
+
+def _parse_serverinfo(msg):
+    # Returns (map name, level title) from an svc_serverinfo in msg, or None
+    i = msg.find(bytes([SVC_SERVERINFO]))
+    while 0 <= i and i + 5 <= len(msg):
+        protocol = struct.unpack_from('<i', msg, i + 1)[0]
+        if protocol in DEMO_PROTOCOLS:
+            pos = i + 5 + (4 if protocol == 999 else 0) + 2  # [flags], maxclients, gametype
+            title, pos = _read_cstring(msg, pos)
+            model, pos = _read_cstring(msg, pos)
+            if model and model.lower().startswith("maps/") and model.lower().endswith(".bsp"):
+                return model[5:-4].lower(), title or ""
+        i = msg.find(bytes([SVC_SERVERINFO]), i + 1)
+    return None
+
+
+def parse_demo_header(data, file_size):
+    # Map name, title and an estimated duration from the first bytes of a demo.
+    # Duration is extrapolated from the svc_time rate of the frames we did read,
+    # which is exact when the whole demo fits in data.
+    nl = data.find(b'\n', 0, 16)
+    if nl < 0 or not re.match(rb'^\s*-?\d*\s*$', data[:nl]):
+        return None
+
+    info = {"map": None, "title": "", "duration": None}
+    pos = nl + 1
+    first = last = None  # (game time, byte offset)
+    while pos + 16 <= len(data):
+        length = struct.unpack_from('<i', data, pos)[0]
+        if length < 0 or length > DEMO_MAX_MSGLEN:
+            break
+        msg_start = pos + 16
+        msg = data[msg_start:msg_start + length]
+        if len(msg) < length:
+            break
+        if info["map"] is None:
+            found = _parse_serverinfo(msg)
+            if found:
+                info["map"], info["title"] = found
+        if length >= 5 and msg[0] == SVC_TIME:
+            t = struct.unpack_from('<f', msg, 1)[0]
+            if first is None:
+                first = (t, pos)
+            last = (t, msg_start + length)
+        pos = msg_start + length
+
+    if info["map"] is None:
+        # Unknown protocol: fall back to the world model string itself
+        m = DEMO_MAP_RE.search(data)
+        if not m:
+            return None
+        info["map"] = m.group(1).decode('latin-1').lower()
+
+    if first and last and last[0] > first[0]:
+        elapsed = last[0] - first[0]
+        remaining = max(0, file_size - last[1])
+        rate = (last[1] - first[1]) / elapsed  # bytes per game second
+        info["duration"] = round(elapsed + (remaining / rate if rate > 0 else 0), 1)
+    return info
+
+# --- Library model ---
+# The whole library (every map of every mod) as a handful of flat columns
+# instead of per-map dicts: map names and titles are each one big string with
+# an offset array, and numbers live in typed arrays (viewed as NumPy arrays
+# when NumPy is available). Rows are sorted by (mod, map), so a mod is a
+# contiguous row range. 100k maps take a few MB and a search is a single
+# str.find sweep over the lowercased name/title blobs.
+LIBRARY_CACHE_FILE = "the-quaker-deliverance-library.bin"
+LIBRARY_CACHE_VERSION = 1
+UNKNOWN_COUNT = -1  # monsters/secrets not read yet
+
+
+class MapRecord:
+    # Read-only view of one row of a LibraryModel
+    __slots__ = ("model", "row")
+
+    def __init__(self, model, row):
+        self.model = model
+        self.row = row
+
+    @property
+    def mod(self): return self.model.mod_names[self.model.mod_idx[self.row]]
+    @property
+    def name(self): return self.model.name(self.row)
+    @property
+    def title(self): return self.model.title(self.row)
+    @property
+    def size(self): return self.model.size[self.row]
+    @property
+    def mtime_ns(self): return self.model.mtime[self.row]
+    @property
+    def secrets(self): return self.model.secrets[self.row]
+
+    def monsters(self, skill=1):
+        return self.model.monsters[self.row * 4 + int(skill)]
+
+    def as_dict(self, skill=1):
+        return {"mod": self.mod, "map": self.name, "title": self.title,
+                "monsters": self.monsters(skill), "secrets": self.secrets,
+                "size": self.size, "mtime_ns": self.mtime_ns}
+
+
+class LibraryModel:
+    # Columns (all of length n, except monsters: 4 per row, one per skill)
+    COLUMNS = [("mod_idx", "I"), ("name_off", "I"), ("title_off", "I"), ("size", "Q"),
+               ("mtime", "q"), ("monsters", "h"), ("secrets", "h")]
+
+    def __init__(self):
+        self.mod_names = []        # mod_idx -> name
+        self.mod_fps = {}          # mod -> fingerprint of the caches it was built from
+        self.names = ""            # "name\n" per row
+        self.titles = ""           # "title\n" per row
+        for col, code in self.COLUMNS:
+            setattr(self, col, array(code))
+        self.name_off.append(0)
+        self.title_off.append(0)
+        self._lower = None         # (names, titles) lowercased, built on first search
+
+    def __len__(self):
+        return len(self.mod_idx)
+
+    def name(self, row):
+        return self.names[self.name_off[row]:self.name_off[row + 1] - 1]
+
+    def title(self, row):
+        return self.titles[self.title_off[row]:self.title_off[row + 1] - 1]
+
+    def record(self, row):
+        return MapRecord(self, row)
+
+    def nbytes(self):
+        cols = sum(getattr(self, col).itemsize * len(getattr(self, col)) for col, _ in self.COLUMNS)
+        return cols + len(self.names) + len(self.titles)
+
+    # --- Building ---
+
+    @classmethod
+    def build(cls, rows, mod_fps=None):
+        # rows: (mod, name, title, size, mtime_ns, monsters[4] or None, secrets or None)
+        model = cls()
+        model.mod_fps = dict(mod_fps or {})
+        mod_pos = {}
+        names, titles = [], []
+        name_len = title_len = 0
+        for mod, name, title, size, mtime, monsters, secrets in sorted(rows, key=lambda r: (r[0], r[1])):
+            if mod not in mod_pos:
+                mod_pos[mod] = len(model.mod_names)
+                model.mod_names.append(sys.intern(mod))
+            model.mod_idx.append(mod_pos[mod])
+            title = " ".join((title or "").split())  # one line per row
+            names.append(name)
+            titles.append(title)
+            name_len += len(name) + 1
+            title_len += len(title) + 1
+            model.name_off.append(name_len)
+            model.title_off.append(title_len)
+            model.size.append(size or 0)
+            model.mtime.append(mtime or 0)
+            model.monsters.extend(monsters if monsters else [UNKNOWN_COUNT] * 4)
+            model.secrets.append(UNKNOWN_COUNT if secrets is None else secrets)
+        model.names = "".join(n + "\n" for n in names)
+        model.titles = "".join(t + "\n" for t in titles)
+        return model
+
+    def row_tuple(self, row):
+        # One row back in build() form
+        counts = list(self.monsters[row * 4:row * 4 + 4])
+        return (self.mod_names[self.mod_idx[row]], self.name(row), self.title(row),
+                self.size[row], self.mtime[row],
+                None if counts[0] == UNKNOWN_COUNT else counts,
+                None if self.secrets[row] == UNKNOWN_COUNT else self.secrets[row])
+
+    def with_mods(self, changes):
+        # New model with some mods' rows replaced, in one rebuild.
+        # changes: {mod: (rows, fp)}; empty rows and fp None drop the mod.
+        # Counts already known for an unchanged map (same size/mtime) are kept.
+        replaced = set()
+        merged = []
+        for mod, (mod_rows, _) in changes.items():
+            old_rows = self.mod_range(mod)
+            replaced.update(old_rows)
+            known = {}
+            for row in old_rows:
+                r = self.row_tuple(row)
+                known[r[1]] = r
+            for r in mod_rows:
+                old = known.get(r[1])
+                if r[5] is None and old and old[3:5] == tuple(r[3:5]):
+                    r = tuple(r[:5]) + old[5:]
+                merged.append(r)
+        others = (self.row_tuple(row) for row in range(len(self)) if row not in replaced)
+        fps = {m: f for m, f in self.mod_fps.items() if m not in changes}
+        fps.update((mod, fp) for mod, (_, fp) in changes.items() if fp is not None)
+        return LibraryModel.build(itertools.chain(others, merged), fps)
+
+    # --- Lookups ---
+
+    def mod_range(self, mod):
+        # Rows of one mod (contiguous because rows are sorted by mod)
+        try:
+            idx = self.mod_names.index(mod)
+        except ValueError:
+            return range(0)
+        lo = bisect.bisect_left(self.mod_idx, idx)
+        return range(lo, bisect.bisect_right(self.mod_idx, idx, lo))
+
+    def find(self, mod, name):
+        rows = self.mod_range(mod)
+        lo, hi = rows.start, rows.stop
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name(mid) < name: lo = mid + 1
+            else: hi = mid
+        return lo if lo < rows.stop and self.name(lo) == name else None
+
+    def set_stats(self, mod, name, stats):
+        # stats: {skill: (monsters, secrets)} as computed by load_map_info
+        row = self.find(mod, name)
+        if row is None or not stats: return
+        for skill in range(4):
+            self.monsters[row * 4 + skill] = stats[skill][0]
+        self.secrets[row] = stats[0][1]
+
+    def search_rows(self, text):
+        # Sorted rows whose name or title contains text (case-insensitive)
+        if not text:
+            return list(range(len(self)))
+        if self._lower is None:
+            self._lower = (self.names.lower(), self.titles.lower())
+        text = text.lower()
+        positions = [[], []]
+        for blob, found in zip(self._lower, positions):
+            pos = blob.find(text)
+            while pos != -1:
+                found.append(pos)
+                pos = blob.find(text, pos + 1)
+        if np is not None:
+            hits = [np.searchsorted(np.frombuffer(offs, dtype=np.uint32), np.array(found, dtype=np.int64), "right") - 1
+                    for offs, found in zip((self.name_off, self.title_off), positions)]
+            return np.unique(np.concatenate(hits)).tolist()
+        rows = {bisect.bisect_right(self.name_off, p) - 1 for p in positions[0]}
+        rows.update(bisect.bisect_right(self.title_off, p) - 1 for p in positions[1])
+        return sorted(rows)
+
+    def query(self, text="", mod=None, skill=1, min_monsters=None, max_monsters=None,
+              sort="name", limit=None):
+        # Filter and sort the whole library; returns MapRecords
+        rows = self.search_rows(text)
+        skill = int(skill)
+        if np is not None and rows:
+            idx = np.array(rows, dtype=np.int64)
+            monsters = np.frombuffer(self.monsters, dtype=np.int16).reshape(-1, 4)[:, skill]
+            keep = np.ones(len(idx), dtype=bool)
+            if mod is not None:
+                in_mod = self.mod_range(mod)
+                keep &= (idx >= in_mod.start) & (idx < in_mod.stop)
+            if min_monsters is not None:
+                keep &= monsters[idx] >= min_monsters
+            if max_monsters is not None:
+                keep &= (monsters[idx] <= max_monsters) & (monsters[idx] != UNKNOWN_COUNT)
+            idx = idx[keep]
+            column = {"monsters": monsters, "size": np.frombuffer(self.size, dtype=np.uint64),
+                      "mtime": np.frombuffer(self.mtime, dtype=np.int64)}.get(sort)
+            if column is not None:
+                idx = idx[np.argsort(-column[idx].astype(np.int64), kind="stable")]
+            rows = idx.tolist()
+        else:
+            in_mod = self.mod_range(mod) if mod is not None else None
+            def wanted(row):
+                count = self.monsters[row * 4 + skill]
+                if in_mod is not None and row not in in_mod: return False
+                if min_monsters is not None and count < min_monsters: return False
+                if max_monsters is not None and not (UNKNOWN_COUNT < count <= max_monsters): return False
+                return True
+            rows = [row for row in rows if wanted(row)]
+            column = {"monsters": lambda row: self.monsters[row * 4 + skill],
+                      "size": self.size.__getitem__, "mtime": self.mtime.__getitem__}.get(sort)
+            if column is not None:
+                rows.sort(key=column, reverse=True)
+        # sort="name" keeps row order: by mod, then map
+        if limit is not None:
+            rows = rows[:limit]
+        return [MapRecord(self, row) for row in rows]
+
+    # --- Persistence: one header line, then raw columns and text, read in one call ---
+
+    def save(self, path, root):
+        header = {"version": LIBRARY_CACHE_VERSION, "root": root, "mods": self.mod_names,
+                  "mod_fps": self.mod_fps, "byteorder": sys.byteorder,
+                  "columns": [[col, code, len(getattr(self, col))] for col, code in self.COLUMNS]}
+        names, titles = self.names.encode('utf-8'), self.titles.encode('utf-8')
+        header["text"] = [len(names), len(titles)]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b"\n")
+            for col, _ in self.COLUMNS:
+                getattr(self, col).tofile(f)
+            f.write(names)
+            f.write(titles)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, root):
+        # None if missing, unreadable or built for another Quake folder
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            end = data.index(b"\n")
+            header = json.loads(data[:end])
+            if (header.get("version") != LIBRARY_CACHE_VERSION or header.get("root") != root
+                    or header.get("byteorder") != sys.byteorder):
+                return None
+            model = cls()
+            model.mod_names = [sys.intern(m) for m in header["mods"]]
+            model.mod_fps = header["mod_fps"]
+            pos = end + 1
+            for col, code, count in header["columns"]:
+                column = array(code)
+                size = column.itemsize * count
+                column.frombytes(data[pos:pos + size])
+                setattr(model, col, column)
+                pos += size
+            names_len, titles_len = header["text"]
+            model.names = data[pos:pos + names_len].decode('utf-8')
+            model.titles = data[pos + names_len:pos + names_len + titles_len].decode('utf-8')
+            return model
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Library cache error: {e}")
+            return None
+
+
+class LibraryCore:
+    # Disk-side knowledge of a Quake install: map scans, PAK/BSP parsing,
+    # titles, stats, saves and previews. Nothing here touches Tk, so the
+    # launcher (which inherits it), its worker threads and the library daemon
+    # all share the same code.
+
+    def init_library(self, quake_root):
+        self.quake_root = quake_root
+        self.fs = DirIndex()
+        self.map_info = {}  # (mod, map) -> {"title": str, "stats": {skill: (monsters, secrets)}}
+        self.title_cache_lock = threading.Lock()
+        self.scan_workers = SCAN_IO_WORKERS
+        self.scan_locks = {}  # mod path -> lock held while that mod is scanned
+        self.scan_locks_guard = threading.Lock()
+        self.vfs = {}         # mod path -> ModFileSystem
+        self.levelshots = {}  # mod path -> (ModFileSystem, pak_levelshots() result)
+        # Added missing original_maps to prevent is_blacklisted from crashing
+        self.original_maps = ["base", "start", "exit"] 
+
+    def list_mods(self):
+        # Every folder in the Quake root is a mod (id1 included)
+        base = self.quake_root
+        if not base or not self.fs.isdir(base): return []
+        return sorted(d for d in self.fs.listdir(base) if self.fs.isdir(os.path.join(base, d)))
+
+    def read_map_cache(self, mod_path):
+        # Map list saved by the last scan, or None if the mod was never scanned
+        cache_path = self.fs.resolve(mod_path, "previews", "map_cache.json")
+        if cache_path:
+            try:
+                with open(cache_path, 'r') as f: return json.load(f)
+            except Exception as e:
+                print(f"Map cache error: {e}")
+        return None
+
+    def read_title_cache(self, mod_path):
+        title_cache = self.fs.resolve(mod_path, "previews", "title_cache.json")
+        if title_cache:
+            try:
+                with open(title_cache, 'r') as f: return json.load(f)
+            except Exception as e:
+                print(f"Title cache error: {e}")
+        return {}
+
+    def read_entity_index(self, mod_path):
+        # The entity index written by the last scan, or None (never scanned, or
+        # scanned before the index existed)
+        index_path = self.fs.resolve(mod_path, "previews", ENTITY_INDEX_FILE)
+        if index_path:
+            try:
+                with open(index_path, 'r') as f: return json.load(f)
+            except Exception as e:
+                print(f"Entity index error: {e}")
+        return None
+
+    def mod_cache_fp(self, mod_path):
+        # Changes whenever the mod's map or title cache is rewritten
+        p_dir = os.path.join(mod_path, "previews")
+        self.fs.invalidate(p_dir)
+        fp = []
+        for name in ["map_cache.json", "title_cache.json"]:
+            st = self.fs.stat(os.path.join(p_dir, name))
+            fp.append(st.st_mtime_ns if st else 0)
+        return fp
+
+    def library_rows(self, mod_name, mod_path, maps=None):
+        # LibraryModel rows for one mod, from its map, title and scan caches
+        if maps is None:
+            maps = self.read_map_cache(mod_path) or []
+        titles = self.read_title_cache(mod_path)
+        file_fps = {}  # map -> [size, mtime_ns] of the BSP or PAK it lives in
+        try:
+            with open(os.path.join(mod_path, "previews", "scan_cache.json"), 'r') as f:
+                for entry in json.load(f).values():
+                    for m in entry["maps"]:
+                        file_fps.setdefault(m, entry["fp"])
+        except (OSError, ValueError, KeyError):
+            pass
+        # Counts from the scan's entity index where it read the whole lump
+        indexed = (self.read_entity_index(mod_path) or {}).get("maps", {})
+        rows = []
+        for m in maps:
+            if m == "(Default)": continue
+            size, mtime = file_fps.get(m, (0, 0))
+            stats = (self.map_info.get((mod_name, m)) or {}).get("stats")
+            if not stats and m in indexed and not indexed[m].get("partial"):
+                stats = skill_stats(indexed[m])
+            rows.append((mod_name, m, titles.get(m, ""), size, mtime,
+                         [stats[sk][0] for sk in range(4)] if stats else None,
+                         stats[0][1] if stats else None))
+        return rows
+
+    def invalidate_mod(self, mod_name):
+        # Forget cached listings and map info after files changed on disk;
+        # mod_name None means the set of mods itself changed
+        base = self.quake_root
+        self.fs.invalidate(base)
+        if mod_name is None: return
+        mod_path = os.path.join(base, mod_name)
+        self.fs.invalidate(mod_path)
+        for sub in ["maps", "previews"]:
+            sub_dir = self.fs.resolve(mod_path, sub)
+            if sub_dir:
+                self.fs.invalidate(sub_dir)
+        for key in [k for k in self.map_info if k[0] == mod_name]:
+            self.map_info.pop(key, None)
+
+    def read_titles_batch(self, mod_path, names):
+        # Worker thread: worldspawn titles for many maps, opening each PAK only once
+        titles = {}
+
+        # 1. Where each map lives (see mod_vfs), then one open per file with
+        # the maps read in offset order
+        by_file = {}
+        for name, (path, offset, size) in self.map_locations(mod_path, names).items():
+            by_file.setdefault(path, []).append((offset, size, name))
+        for path, maps in by_file.items():
+            try:
+                with open(path, 'rb') as f:
+                    for offset, size, name in sorted(maps):
+                        titles[name] = probe_bsp(f, offset, size, TITLE_READ_BYTES)["title"]
+            except OSError: pass
+
+        for name in names:
+            titles.setdefault(name, "")
+
+        # 3. Persist alongside the map cache
+        cache_path = os.path.join(mod_path, "previews", "title_cache.json")
+        with self.title_cache_lock:
+            try:
+                with open(cache_path, 'r') as f: cached = json.load(f)
+            except (OSError, ValueError):
+                cached = {}
+            cached.update(titles)
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                write_json_atomic(cache_path, cached)
+            except OSError as e:
+                print(f"Title cache error: {e}")
+        return titles
+
+    def is_blacklisted(self, filename, mod_name):
+        fn = filename.lower()
+        if mod_name == "id1" and fn.replace('.bsp', '') in self.original_maps:
+            return True
+        # If it starts with b_, it's a brush model (junk)
+        if fn.startswith('b_'):
+            return True
+        return False
+
+    def scan_mod_files_worker(self, mod_name, mod_path):
+        # A watcher rescan, a daemon rescan and a click may scan the same mod at
+        # once: they run one after the other, the later one mostly from cache
+        with self.scan_locks_guard:
+            lock = self.scan_locks.setdefault(os.path.normcase(mod_path), threading.Lock())
+        with lock:
+            return self.scan_mod_files(mod_name, mod_path)
+
+    def scan_mod_files(self, mod_name, mod_path):
+        found_maps = set()
+        #if mod_name == "id1": 
+        found_maps.add("(Default)")
+
+        # Per-file results from the last scan, keyed by size/mtime fingerprint,
+        # so a rescan only re-validates BSPs and PAKs that actually changed
+        p_dir = os.path.join(mod_path, "previews")
+        scan_cache_path = os.path.join(p_dir, "scan_cache.json")
+        try:
+            with open(scan_cache_path, 'r') as f: old_cache = json.load(f)
+        except (OSError, ValueError):
+            old_cache = {}
+        new_cache = {}
+
+        def scan_bsp(full_path, entities, stats):
+            try:
+                with open(full_path, 'rb') as bsp_file:
+                    probe = probe_bsp(bsp_file, size=os.fstat(bsp_file.fileno()).st_size)
+                    if probe["ent_size"]:
+                        stats["bytes"] = 12 + min(probe["ent_size"], BSP_ENTITY_SCAN_BYTES)
+                    if probe["valid"]:
+                        name = os.path.basename(full_path).lower().replace('.bsp', '')
+                        entities[name] = entity_summary(probe["entities"], probe["ent_size"] > BSP_ENTITY_SCAN_BYTES)
+                        return [name]
+            except Exception: pass
+            return []
+
+        # Candidate files in a fixed order: (cache key, path, scan function, is a PAK)
+        tasks = []
+
+        # 1. Search the Mod Root (e.g., /ad/start.bsp)
+        try:
+            for f in self.fs.listdir(mod_path):
+                if f.lower().endswith('.bsp'):
+                    full_path = os.path.join(mod_path, f)
+                    if self.fs.getsize(full_path) < 40000: continue
+                    tasks.append((f.lower(), full_path, scan_bsp, False))
+        except Exception: pass
+
+        # 2. Search ONLY the /maps folder (No subfolders)
+        # This stops the "unplayable subfolder maps" issue entirely
+        maps_subdir = self.fs.resolve(mod_path, "maps")
+        if maps_subdir:
+            try:
+                for f in self.fs.listdir(maps_subdir):
+                    if f.lower().endswith('.bsp'):
+                        full_path = os.path.join(maps_subdir, f)
+                        
+                        # Size filter
+                        if self.fs.getsize(full_path) < 40000: continue
+                        
+                        # Blacklist (binary validation happens below)
+                        if not self.is_blacklisted(f, mod_name):
+                            tasks.append(("maps/" + f.lower(), full_path, scan_bsp, False))
+            except Exception: pass
+
+        # 3. PAK Search (Already handles internal size/path filtering)
+        if self.fs.isdir(mod_path):
+            for f in sorted(self.fs.listdir(mod_path), key=pak_precedence):
+                if f.lower().endswith('.pak'):
+                    tasks.append((f.lower(), os.path.join(mod_path, f), self.get_maps_from_pak, True))
+
+        # 4. Unchanged files come from the cache; the rest are validated by a
+        # bounded pool (the work is waiting on the disk or network, so threads
+        # overlap it). new_cache keeps task order, so the results are the same
+        # as a one-by-one scan.
+        stale = []
+        for rel_path, full_path, scan, _ in tasks:
+            st = self.fs.stat(full_path)
+            if st is None: continue
+            fp = [st.st_size, st.st_mtime_ns]
+            entry = old_cache.get(rel_path)
+            if entry and entry.get("fp") == fp and "entities" in entry:
+                new_cache[rel_path] = entry
+            else:
+                new_cache[rel_path] = None
+                stale.append((rel_path, full_path, scan, fp))
+
+        def validate(task):
+            _, full_path, scan, fp = task
+            entities, stats = {}, {}
+            maps = scan(full_path, entities, stats)
+            return {"fp": fp, "maps": maps, "entities": entities}, stats.get("bytes", 0)
+
+        started = time.perf_counter()
+        workers = max(1, min(self.scan_workers, len(stale)))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tqd-scan") as pool:
+                results = list(pool.map(validate, stale))
+        else:
+            results = [validate(task) for task in stale]
+        read_bytes = 0
+        for (rel_path, _, _, _), (entry, nbytes) in zip(stale, results):
+            new_cache[rel_path] = entry
+            read_bytes += nbytes
+        if stale:
+            elapsed = max(time.perf_counter() - started, 1e-6)
+            print(f"Scan {mod_name}: {len(stale)} files validated ({len(new_cache) - len(stale)} cached) "
+                  f"in {elapsed * 1000:.0f} ms, {len(stale) / elapsed:.0f} files/s, "
+                  f"{read_bytes / 1048576 / elapsed:.1f} MB/s ({workers} threads)")
+
+        for rel_path, _, _, is_pak in tasks:
+            entry = new_cache.get(rel_path)
+            if not entry: continue
+            for m in entry["maps"]:
+                if not is_pak or not self.is_blacklisted(m + ".bsp", mod_name):
+                    found_maps.add(m)
+
+        # Results are returned, not written to self.all_maps: the scheduler drops
+        # them if the user has moved on to another mod in the meantime
+        all_maps = sorted(list(found_maps))
+        if not all_maps: all_maps = ["(Default)"]
+        
+        # Cache results to Disk
+        os.makedirs(p_dir, exist_ok=True)
+        write_json_atomic(os.path.join(p_dir, "map_cache.json"), all_maps)
+        write_json_atomic(scan_cache_path, new_cache)
+        # Index each map's entities from the file the engine would load it from
+        summaries = {}
+        for m, (path, _, _) in self.map_locations(mod_path, [m for m in all_maps if m != "(Default)"]).items():
+            entry = new_cache.get(os.path.relpath(path, mod_path).replace(os.sep, '/').lower())
+            if entry and m in entry["entities"]:
+                summaries[m] = entry["entities"][m]
+        write_json_atomic(os.path.join(p_dir, ENTITY_INDEX_FILE), build_entity_index(summaries))
+        self.fs.invalidate(mod_path)
+        self.fs.invalidate(p_dir)
+        
+        return all_maps
+
+    def read_pak_directory(self, f):
+        # [(lowercase name, offset, size)] from an open PAK, read in one call
+        f.seek(0)
+        header = f.read(12)
+        if header[:4] != b'PACK': return []
+        off, sz = struct.unpack('<II', header[4:12])
+        f.seek(off)
+        directory = f.read(sz)
+        entries = []
+        for i in range(0, len(directory) - 63, 64):
+            name = directory[i:i + 56].split(b'\0')[0].decode('latin-1').strip().lower()
+            file_off, file_size = struct.unpack_from('<II', directory, i + 56)
+            entries.append((name, file_off, file_size))
+        return entries
+
+    def list_pak_entries(self, pak_path):
+        # [(lowercase name, offset, size)] from a PAK file
+        try:
+            with open(pak_path, 'rb') as f:
+                return self.read_pak_directory(f)
+        except Exception as e: print(f"PAK error: {e}")
+        return []
+
+    def index_demos(self, mod_path):
+        # Worker thread: {map: [demo, ...]} for .dem files in the mod root, demos/
+        # and PAKs. Only the first DEMO_HEADER_BYTES of a demo are ever read, and
+        # results are cached in previews/demo_cache.json by size/mtime fingerprint.
+        cache_file = os.path.join(mod_path, "previews", "demo_cache.json")
+        try:
+            with open(cache_file, 'r') as f: cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+        fresh = {}
+        seen_paths = set()
+
+        def index(key, fp, game_path, container, offset, size):
+            # Loose demos shadow PAK demos with the same game path, as in the engine
+            if game_path.lower() in seen_paths:
+                return
+            seen_paths.add(game_path.lower())
+            entry = cache.get(key)
+            if entry is None or entry.get("fp") != fp:
+                try:
+                    with open(container, 'rb') as f:
+                        f.seek(offset)
+                        data = f.read(min(size, DEMO_HEADER_BYTES))
+                except OSError:
+                    return
+                header = parse_demo_header(data, size) or {}
+                entry = {"fp": fp, "path": game_path, "size": size, "map": header.get("map"),
+                         "title": header.get("title", ""), "duration": header.get("duration")}
+            fresh[key] = entry
+
+        # 1. Loose demos (root and demos/)
+        for folder in ["", "demos"]:
+            dir_path = self.fs.resolve(mod_path, folder) if folder else mod_path
+            if not dir_path: continue
+            for f in sorted(self.fs.listdir(dir_path)):
+                if not f.lower().endswith('.dem'): continue
+                st = self.fs.stat(os.path.join(dir_path, f))
+                if not st: continue
+                game_path = (folder + "/" if folder else "") + f[:-4]
+                index(game_path.lower(), [st.st_size, st.st_mtime_ns], game_path,
+                      os.path.join(dir_path, f), 0, st.st_size)
+
+        # 2. Demos inside PAKs (only the copy the engine would play)
+        for name, (pak_path, off, size) in self.mod_vfs(mod_path).entries.items():
+            if not name.endswith('.dem'): continue
+            st = self.fs.stat(pak_path)
+            if not st: continue
+            index(f"{os.path.basename(pak_path).lower()}:{name}", [st.st_size, st.st_mtime_ns, off],
+                  name[:-4], pak_path, off, size)
+
+        if fresh != cache:
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                write_json_atomic(cache_file, fresh)
+                self.fs.invalidate(os.path.dirname(cache_file))
+            except OSError as e:
+                print(f"Demo cache error: {e}")
+
+        by_map = {}
+        for entry in fresh.values():
+            if entry["map"]:
+                by_map.setdefault(entry["map"], []).append(entry)
+        for demos in by_map.values():
+            demos.sort(key=lambda e: e["path"].lower())
+        return by_map
+
+    def get_maps_from_pak(self, pak_path, entities=None, stats=None):
+        # Offset-ordered, coalesced scan (see scan_pak_maps)
+        return scan_pak_maps(pak_path, stats, entities)
+
+    def find_mod_image(self, mod_name, mod_path):
+        # Look for mod.png or random preview
+        p = self.fs.find(mod_path, mod_name, PREVIEW_EXTS)
+        if p:
+            return p
+        
+        pre = self.fs.resolve(mod_path, "previews")
+        if pre:
+            imgs = [f for f in self.fs.listdir(pre) if f.lower().endswith(tuple(PREVIEW_EXTS))]
+            if imgs:
+                return os.path.join(pre, random.choice(imgs))
+
+        # Nothing on disk yet: one of the levelshots shipped in the PAKs
+        shots = list(self.pak_levelshots(mod_path)["shots"])
+        if shots:
+            return self.extract_levelshot(mod_path, random.choice(shots))
+        return None
+
+    def find_map_image(self, mod_path, map_name, extract=True):
+        for folder in ["previews", "maps"]:
+            folder_path = self.fs.resolve(mod_path, folder)
+            p = self.fs.find(folder_path, map_name, PREVIEW_EXTS) if folder_path else None
+            if p:
+                return p
+
+        # A levelshot from the PAKs (without extract, just whether one exists)
+        if extract:
+            p = self.extract_levelshot(mod_path, map_name)
+        else:
+            loc = self.pak_levelshots(mod_path)["shots"].get(map_name.lower())
+            p = loc[0] if loc else None
+        if p:
+            return p
+
+        # A generated top-down overview only until a real screenshot exists
+        return self.fs.resolve(mod_path, "previews", map_name + OVERVIEW_SUFFIX)
+
+    def pak_levelshots(self, mod_path):
+        # {"shots": {map: (pak, offset, size, ext)}, "palette": (file, offset, size) or None}
+        # from the mod's PAK entries (see mod_vfs); rebuilt only when a PAK changes
+        vfs = self.mod_vfs(mod_path)
+        cached = self.levelshots.get(mod_path)
+        if cached and cached[0] is vfs:
+            return cached[1]
+        best = {}
+        for name, location in vfs.entries.items():
+            found = levelshot_rank(name)
+            if found and (found[0] not in best or found[1] < best[found[0]][0]):
+                best[found[0]] = (found[1], location + (os.path.splitext(name)[1],))
+        # The mod's own gfx/palette.lmp, else the base game's
+        index = {"shots": {m: loc for m, (_, loc) in best.items()}, "palette": vfs.resolve(PALETTE_ENTRY)}
+        self.levelshots[mod_path] = (vfs, index)
+        return index
+
+    def quake_palette(self, mod_path):
+        loc = self.pak_levelshots(mod_path)["palette"]
+        if loc:
+            try:
+                with open(loc[0], 'rb') as f:
+                    f.seek(loc[1])
+                    return palette_lut(f.read(loc[2]))
+            except OSError as e:
+                print(f"Palette error: {e}")
+        return palette_lut(None)
+
+    def extract_levelshot(self, mod_path, map_name):
+        # Worker thread: previews/<map>.levelshot.png converted from the PAK on
+        # first use (and again if the PAK is newer). None if the mod has none.
+        loc = self.pak_levelshots(mod_path)["shots"].get(map_name.lower())
+        if not loc:
+            return None
+        pak_path, off, size, ext = loc
+        out = os.path.join(mod_path, "previews", map_name + LEVELSHOT_SUFFIX)
+        st, pak_st = self.fs.stat(out), self.fs.stat(pak_path)
+        if st and pak_st and st.st_mtime_ns >= pak_st.st_mtime_ns:
+            return out
+        try:
+            with open(pak_path, 'rb') as f:
+                f.seek(off)
+                data = f.read(size)
+            palette = self.quake_palette(mod_path) if ext in (".lmp", ".pcx") else None
+            img = decode_levelshot(data, ext, palette)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            tmp = f"{out}.{threading.get_ident()}.tmp"  # two workers may extract the same shot
+            img.save(tmp, "PNG")
+            os.replace(tmp, out)
+        except Exception as e:
+            print(f"Levelshot error ({map_name}): {e}")
+            return None
+        self.fs.invalidate(os.path.dirname(out))
+        return out
+
+    def load_map_info(self, mod_name, map_name):
+        # Worker thread: title and per-skill monster/secret counts, cached per map
+        key = (mod_name, map_name)
+        info = self.map_info.get(key)
+        if info is not None:
+            return info
+
+        # One probe gives both the title and the full entity lump for the stats
+        probe = None
+        if map_name != "(Default)":
+            probe = self.probe_map(os.path.join(self.quake_root, mod_name), map_name, entity_limit=None)
+        entity_text = probe["entities"] if probe else ""
+        info = {
+            "title": self.get_map_title(mod_name, map_name, entity_text),
+            "stats": skill_stats(entity_summary(entity_text)) if entity_text else {},
+        }
+        self.map_info[key] = info
+        return info
+
+    def get_map_stats(self, entity_data, skill):
+        # (monsters, secrets) for one skill level (see entity_summary)
+        try:
+            skill = int(skill)
+        except:
+            skill = 1
+        summary = entity_summary(entity_data)
+        return summary["monsters"][skill if skill in SKILL_EXCLUDE_BITS else 1], summary["secrets"]
+
+    def mod_vfs(self, mod_path):
+        # The mod's ModFileSystem, rebuilt only when one of its PAKs changes
+        paks = sorted((f for f in self.fs.listdir(mod_path) if f.lower().endswith('.pak')), key=pak_precedence)
+        fp = []
+        for f in paks:
+            st = self.fs.stat(os.path.join(mod_path, f))
+            fp.append([f, st.st_size, st.st_mtime_ns] if st else [f])
+        vfs = self.vfs.get(mod_path)
+        if vfs is None or vfs.fingerprint != fp:
+            entries = {}
+            for f in paks:  # later (higher) PAKs overwrite earlier ones
+                pak_path = os.path.join(mod_path, f)
+                for name, offset, size in self.list_pak_entries(pak_path):
+                    entries[name] = (pak_path, offset, size)
+            vfs = ModFileSystem(self.fs, mod_path, fp, entries)
+            self.vfs[mod_path] = vfs
+        base_path = os.path.join(self.quake_root, "id1")
+        if os.path.normcase(mod_path) != os.path.normcase(base_path) and self.fs.isdir(base_path):
+            vfs.base = self.mod_vfs(base_path)
+        else:
+            vfs.base = None
+        return vfs
+
+    def map_locations(self, mod_path, names):
+        # {map: (file, offset, size)} for the named maps: maps/<map>.bsp in the
+        # mod (loose, then PAKs by precedence), a loose <map>.bsp in the mod
+        # root, a PAK map outside maps/, and finally the base game's maps/
+        vfs = self.mod_vfs(mod_path)
+        found = {}
+        for name in names:
+            game_path = f"maps/{name}.bsp"
+            root_bsp = self.fs.resolve(mod_path, f"{name}.bsp")
+            location = (vfs.resolve(game_path, fallback=False)
+                        or (root_bsp and (root_bsp, 0, self.fs.getsize(root_bsp)))
+                        or vfs.find_basename(f"{name}.bsp")
+                        or (vfs.base and vfs.base.resolve(game_path)))
+            if location:
+                found[name] = location
+        return found
+
+    def game_file_locations(self, mod_path, game_paths):
+        # {game path: (file, offset, size)}, e.g. "maps/e1m1.lit" (see mod_vfs)
+        vfs = self.mod_vfs(mod_path)
+        found = {}
+        for game_path in game_paths:
+            location = vfs.resolve(game_path)
+            if location:
+                found[game_path] = location
+        return found
+
+    def launch_files(self, mod_path, map_name):
+        # [(file, offset, size)] the engine reads first when starting map_name
+        ranges = []
+        if map_name and map_name != "(Default)":
+            location = self.map_locations(mod_path, [map_name]).get(map_name)
+            if location:
+                ranges.append(location)
+        paths = [f"maps/{map_name}.lit", f"maps/{map_name}.ent"] if map_name and map_name != "(Default)" else []
+        ranges.extend(self.game_file_locations(mod_path, paths + ["progs.dat"]).values())
+        return ranges
+
+    def probe_map(self, mod_path, map_name, entity_limit=BSP_ENTITY_SCAN_BYTES):
+        # probe_bsp for a map by name: loose files first, then PAKs. None if not found.
+        location = self.map_locations(mod_path, [map_name]).get(map_name)
+        if not location:
+            return None
+        path, offset, size = location
+        try:
+            with open(path, 'rb') as f:
+                return probe_bsp(f, offset, size, entity_limit)
+        except OSError as e:
+            print(f"Map read error: {e}")
+            return None
+
+    def missing_overviews(self, mod_path, maps):
+        # [(map, file, offset, size, overview path)] for maps with no preview at all
+        names = [m for m in maps if m != "(Default)" and not self.find_map_image(mod_path, m, extract=False)]
+        locations = self.map_locations(mod_path, names)
+        return [(m,) + locations[m] + (overview_path(mod_path, m),) for m in names if m in locations]
+
+    def get_map_title(self, mod_name, map_name, entity_text=None):
+        # Attempts to find the 'message' (title) of the map from its entity data.
+        if map_name == "(Default)":
+            return f"Mod: {mod_name}"
+
+        # 1. Read the entities unless the caller already has them
+        if entity_text is None:
+            probe = self.probe_map(os.path.join(self.quake_root, mod_name), map_name, TITLE_READ_BYTES)
+            entity_text = probe["entities"] if probe else ""
+
+        # 2. Extract worldspawn's 'message' field
+        title = worldspawn_title(entity_text) if entity_text else ""
+        if title:
+            return title
+
+        # 3. Fallback to cleaned-up filename
+        return map_name.replace('_', ' ').title()
+
+    def scan_saves(self, mod_path):
+        #Finds .sav files (newest first) as (display name, real filename) pairs
+        saves = []
+        if self.fs.isdir(mod_path):
+            found_files = [f for f in self.fs.listdir(mod_path) if f.lower().endswith('.sav')]
+            # Sort newest first
+            found_files.sort(key=lambda x: self.fs.getmtime(os.path.join(mod_path, x)), reverse=True)
+
+            for f in found_files:
+                f_path = os.path.join(mod_path, f)
+                mtime = self.fs.getmtime(f_path)
+                date_str = time.strftime('%Y-%m-%d', time.localtime(mtime))
+                saves.append((f"{f}  ({date_str})", f))
+        return saves
+
+
+# --- Map gallery ---
+GALLERY_TILE = (192, 144)
+GALLERY_PAD = 8
+GALLERY_LABEL_H = 20
+GALLERY_CACHE_TILES = 300  # decoded tiles kept (about 33 MB as Tk images)
+
+
+def load_gallery_thumb(path):
+    # Worker thread: a preview scaled to a gallery tile. Previews get a saved
+    # previews/thumbs/ JPEG the first time, so later opens decode a small file.
+    thumb = thumbnail_path(path)
+    try:
+        fresh = os.path.getmtime(thumb) >= os.path.getmtime(path)
+    except OSError:
+        fresh = False
+    if fresh:
+        img, _ = decode_preview(thumb, GALLERY_TILE)
+    else:
+        img, _ = decode_preview(path, THUMB_SIZE)
+        img = img.convert("RGB")
+        if os.path.basename(os.path.dirname(path)).lower() == "previews":
+            saved = img.copy()
+            saved.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+            try:
+                os.makedirs(os.path.dirname(thumb), exist_ok=True)
+                saved.save(thumb, format="JPEG", quality=80, optimize=True)
+            except OSError as e:
+                print(f"Thumbnail error: {e}")
+    img = img.convert("RGB")
+    img.thumbnail(GALLERY_TILE, Image.Resampling.BILINEAR)
+    return img
+
+
+class MapGallery:
+    # Grid of thumbnails for the maps in the list. Only tiles in view have
+    # canvas items (recycled while scrolling); thumbnails are decoded on the
+    # job workers and the decoded tiles are kept in a bounded LRU cache.
+
+    def __init__(self, app):
+        self.app = app
+        self.mod_path = None
+        self.maps = []
+        self.cols = 1
+        self.tiles = {}    # index -> [image item, text item, frame item]
+        self.spare = []    # recycled tiles
+        self.cache = collections.OrderedDict()  # (mod path, map) -> PhotoImage
+        self.pending = set()
+        self.wanted = set()  # keys still in view (read by the workers)
+        self.selected = None
+        self._frame_id = None
+
+        colors = app.current_theme
+        self.win = tk.Toplevel(app.root)
+        self.win.title("Gallery")
+        self.win.geometry("900x600")
+        self.canvas = tk.Canvas(self.win, bg=colors["bg"], highlightthickness=0)
+        scroll = tk.Scrollbar(self.win, command=self.canvas.yview)
+        scroll.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.config(yscrollcommand=lambda *a: (scroll.set(*a), self.schedule_layout()),
+                           yscrollincrement=(GALLERY_TILE[1] + GALLERY_LABEL_H + GALLERY_PAD) // 4)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_layout())
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-2, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.canvas.yview_scroll(2, "units"))
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.app.launch_game())
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+    def set_maps(self, mod_name, mod_path, maps):
+        self.win.title(f"Gallery - {mod_name}")
+        self.mod_path = mod_path
+        self.maps = [m for m in maps if m != "(Default)"]
+        for index in list(self.tiles):
+            self.recycle(index)
+        self.canvas.yview_moveto(0)
+        self.schedule_layout()
+
+    def close(self):
+        if self._frame_id:
+            self.app.root.after_cancel(self._frame_id)
+        self.wanted = set()
+        self.app.gallery = None
+        self.win.destroy()
+
+    def cell(self):
+        return GALLERY_TILE[0] + GALLERY_PAD, GALLERY_TILE[1] + GALLERY_LABEL_H + GALLERY_PAD
+
+    def schedule_layout(self):
+        # Scrolling fires far more often than the screen refreshes: lay out at most once per frame
+        if not self._frame_id:
+            self._frame_id = self.app.root.after(UI_FRAME_MS, self.layout)
+
+    def layout(self):
+        self._frame_id = None
+        cell_w, cell_h = self.cell()
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        cols = max(1, (width - GALLERY_PAD) // cell_w)
+        if cols != self.cols:
+            self.cols = cols
+            for index in list(self.tiles):
+                self.recycle(index)
+        rows = (len(self.maps) + cols - 1) // cols
+        self.canvas.config(scrollregion=(0, 0, width, rows * cell_h + GALLERY_PAD))
+
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // cell_h)) * cols
+        last = min(len(self.maps), (int((top + height) // cell_h) + 1) * cols)
+        visible = range(first, last)
+        for index in [i for i in self.tiles if i not in visible]:
+            self.recycle(index)
+        for index in visible:
+            if index not in self.tiles:
+                self.place(index)
+        self.wanted = {(self.mod_path, self.maps[i]) for i in visible}
+        for index in visible:
+            self.request(self.maps[index])
+
+    def place(self, index):
+        cell_w, cell_h = self.cell()
+        x = GALLERY_PAD + (index % self.cols) * cell_w
+        y = GALLERY_PAD + (index // self.cols) * cell_h
+        map_name = self.maps[index]
+        fg = self.app.current_theme["fg"]
+        if self.spare:
+            tile = self.spare.pop()
+        else:
+            tile = [self.canvas.create_image(0, 0, anchor="center"),
+                    self.canvas.create_text(0, 0, anchor="n", fill=fg),
+                    self.canvas.create_rectangle(0, 0, 0, 0, width=2)]
+        image_item, text_item, frame_item = tile
+        key = (self.mod_path, map_name)
+        photo = self.cache.get(key)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        self.canvas.coords(image_item, x + GALLERY_TILE[0] // 2, y + GALLERY_TILE[1] // 2)
+        self.canvas.itemconfig(image_item, image=photo or "", state="normal")
+        self.canvas.coords(text_item, x + GALLERY_TILE[0] // 2, y + GALLERY_TILE[1] + 2)
+        label = map_name if photo or key not in self.cache else f"{map_name}\n(no preview)"
+        self.canvas.itemconfig(text_item, text=label, fill=fg, state="normal")
+        self.canvas.coords(frame_item, x - 2, y - 2, x + GALLERY_TILE[0] + 2, y + GALLERY_TILE[1] + 2)
+        self.canvas.itemconfig(frame_item, state="normal",
+                               outline=self.app.current_theme["select"] if map_name == self.selected else "")
+        self.tiles[index] = tile
+
+    def recycle(self, index):
+        tile = self.tiles.pop(index)
+        for item in tile:
+            self.canvas.itemconfig(item, state="hidden")
+        self.canvas.itemconfig(tile[0], image="")
+        self.spare.append(tile)
+
+    def request(self, map_name):
+        key = (self.mod_path, map_name)
+        if key in self.cache or key in self.pending:
+            return
+        self.pending.add(key)
+        self.app.jobs.submit(PRIORITY_PREFETCH, None, self.load_tile, key, on_done=self.show_tile,
+                             on_error=lambda e: self.pending.discard(key))
+
+    def load_tile(self, key):
+        # Worker thread; tiles scrolled out of view before their turn are skipped
+        if key not in self.wanted:
+            return key, None, False
+        path = self.app.find_map_image(*key)
+        return key, load_gallery_thumb(path) if path else None, True
+
+    def show_tile(self, result):
+        key, img, loaded = result
+        self.pending.discard(key)
+        if not self.win.winfo_exists():
+            return
+        if not loaded:
+            return  # requested again if it scrolls back into view
+        photo = ImageTk.PhotoImage(img) if img else None
+        self.cache[key] = photo
+        while len(self.cache) > GALLERY_CACHE_TILES:
+            self.cache.popitem(last=False)
+        if key[0] != self.mod_path:
+            return
+        for index, tile in self.tiles.items():
+            if self.maps[index] == key[1]:
+                self.canvas.itemconfig(tile[0], image=photo or "")
+                if not photo:
+                    self.canvas.itemconfig(tile[1], text=f"{key[1]}\n(no preview)")
+
+    def on_click(self, event):
+        cell_w, cell_h = self.cell()
+        x, y = self.canvas.canvasx(event.x) - GALLERY_PAD, self.canvas.canvasy(event.y) - GALLERY_PAD
+        col, row = int(x // cell_w), int(y // cell_h)
+        index = row * self.cols + col
+        if x < 0 or y < 0 or col >= self.cols or index >= len(self.maps):
+            return
+        self.select(self.maps[index])
+        self.app.select_map(self.maps[index], event)
+
+    def select(self, map_name):
+        # Highlights map_name's tile (also called when the list selection changes)
+        self.selected = map_name
+        for index, tile in self.tiles.items():
+            self.canvas.itemconfig(tile[2], outline=self.app.current_theme["select"]
+                                   if self.maps[index] == map_name else "")
+
+
+class QuakeLauncher(LibraryCore):
     def __init__(self, root):
         self.root = root
         self.root.title(f"The Quaker Deliverance v{VERSION}")
@@ -63,7 +2756,10 @@ class QuakeLauncher:
 
         # 1. Load Data
         self.config = self.load_config()
-        self._after_id = None
+        self._after_id = None        # pending high-quality render after a resize
+        self._resize_frame_id = None # pending live render (at most one per UI frame)
+        self.photo = None            # Tk image shown in img_label, reused while the size matches
+        self.photo_key = None        # (size, mode) of self.photo
         self.active_theme_name = self.config.get("theme_name", "Quake Dark")
        
         self.save_game = tk.StringVar(value="(None)")
@@ -85,6 +2781,11 @@ class QuakeLauncher:
         self.ui_font = ("Arial", self.font_size)
         self.exe_path = tk.StringVar(value=self.config.get("exe", ""))
         self.base_dir = tk.StringVar(value=self.config.get("base_dir", ""))
+        # quake_root is a plain copy of base_dir for worker threads, which must not touch Tk variables
+        self.init_library(self.base_dir.get())
+        # Usage ledger of the launcher's files in that Quake folder (see check_storage)
+        self.storage = StorageManager(os.path.join(self.base_dir.get(), STORAGE_LEDGER_FILE))
+        self.base_dir.trace_add("write", lambda *args: self.on_base_dir_change())
         self.skill_level = tk.StringVar(value=self.config.get("skill", "1"))
         self.mod_search_var = tk.StringVar()
         self.map_search_var = tk.StringVar()
@@ -94,14 +2795,84 @@ class QuakeLauncher:
        
         self.all_mods = []
         self.all_maps = []
-        self.map_titles = {}
+        self.visible_maps = []  # map names in map_listbox row order
+        self.map_titles = {}    # map -> worldspawn title, for the selected mod
+        self.titles_pending = set()
+        self._titles_after_id = None
+        self.entity_index = None  # selected mod's entity index, loaded by the first entity query
+        self.entity_index_pending = False
+        self.gallery = None       # MapGallery window, if open
+        self.show_map_titles = self.config.get("show_map_titles", False)
         self.save_lookup = {"(None)": "(None)"}
 
-        # Added missing original_maps to prevent is_blacklisted from crashing
-        self.original_maps = ["base", "start", "exit"] 
         self.blacklist_from_config = self.config.get("blacklist", ["b_*", "*_h_", "wooden-*"])
         self.stop_screenshot_watch = threading.Event()
         self.current_img_path = None
+        self.cached_image = None           # reduced decode of current_img_path
+        self.cached_image_path = None
+        self.cached_image_full_size = None # original (width, height)
+        self.cached_proxy = None           # small copy for NEAREST live resizes
+
+        # All disk/metadata I/O runs on the job scheduler; results come back to
+        # the Tk thread through its UI queue, drained once per frame
+        self.jobs = JobScheduler()
+        self.current_mod_name = None
+        self.current_map_name = None
+        self.demo_index = {}  # map name -> demos for the selected mod (see index_demos)
+
+        # New screenshots are converted/thumbnailed by a small pool so a burst
+        # of F12 presses never backs up the watcher or the UI
+        self.screenshot_format = self.config.get("screenshot_format", "jpg")
+        self.strip_screenshot_metadata = self.config.get("strip_screenshot_metadata", True)
+        self.ingest_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tqd-ingest")
+        self.ingest_locks = {}
+        self.ingest_locks_guard = threading.Lock()
+
+        # Keeps mod and map lists current without manual refreshes
+        self.watch_library = self.config.get("watch_library", True)
+        self.library_watcher = None
+
+        # Optional --daemon: mods, maps, titles and map info come from its warm
+        # in-memory index instead of being re-read here (falls back silently)
+        self.use_daemon = self.config.get("use_daemon", False)
+        self.library_client = LibraryClient(self.config.get("daemon_socket") or None)
+        self.daemon_root = None  # Quake root the daemon reported, checked against ours
+        self.daemon_up = None
+
+        # Usage history drives an idle-time prewarm of the usual mods, limited
+        # by a time and I/O budget; each warm result is used by one click
+        self.usage = self.config.get("usage", {})  # mod -> [[timestamp, "select" | "launch"], ...]
+        self.prewarm_mods = self.config.get("prewarm_mods", 5)
+        self.prewarm_seconds = self.config.get("prewarm_seconds", 3.0)
+        self.prewarm_mb = self.config.get("prewarm_mb", 64)
+        self.warm_mods = {}  # mod -> read_mod_selection result
+        self.prewarm_queue = []
+        self.prewarm_started = 0.0
+        self.prewarm_bytes = 0
+
+        # Top-down overviews for maps without screenshots (needs NumPy)
+        self.generate_overviews = self.config.get("generate_overviews", True)
+        self.overview_pool = None
+        self.overview_futures = []
+
+        # Optional capture of engine output for per-launch load times
+        self.record_launches = self.config.get("record_launches", False)
+        self.last_session = None
+
+        # Page cache warming of the selected map's files, ahead of LAUNCH
+        self.warm_before_launch = self.config.get("warm_before_launch", True)
+        self.cache_warm = None  # (mod, map) whose files were last handed to the kernel
+
+        # Loose BSPs/PAKs of one mod validated in parallel during a scan
+        self.scan_workers = max(1, int(self.config.get("scan_workers", SCAN_IO_WORKERS)))
+
+        # Disk budget for previews, caches and old screenshots (0 = no limit),
+        # checked in the background every few minutes
+        self.storage_budget_mb = self.config.get("storage_budget_mb", 0)
+        self.storage_policy = self.config.get("storage_policy", "lru")  # "lru" | "age"
+        self.storage_recompress = self.config.get("storage_recompress", False)
+        self.storage_status = tk.StringVar(self.root, value="Not checked yet")
+        self.storage_mods = {}  # mod -> bytes, from the last check
 
         # 3. Setup UI
         self.setup_ui()
@@ -115,14 +2886,17 @@ class QuakeLauncher:
         self.mod_context_menu = tk.Menu(self.root, tearoff=0)
         self.mod_context_menu.add_command(label="Force Maps Rescan  (Clear Cache)", command=self.force_rescan_mod)
         self.mod_context_menu.add_command(label="Refresh Mods List", command=self.load_mods)
+        self.map_context_menu = tk.Menu(self.root, tearoff=0)  # filled per map with its demos
 
-        self.skill_level.trace_add("write", lambda *args: self.on_map_select(None))
+        self.skill_level.trace_add("write", lambda *args: self.on_skill_change())
 
         # 5. Bindings
         self.img_label.bind("<Button-3>", self.show_context_menu)
         self.img_label.bind("<Button-2>", self.show_context_menu)
         self.mod_listbox.bind("<Button-3>", self.show_mod_context_menu)
         self.mod_listbox.bind("<Button-2>", self.show_mod_context_menu)
+        self.map_listbox.bind("<Button-3>", self.show_map_context_menu)
+        self.map_listbox.bind("<Button-2>", self.show_map_context_menu)
         
         # Search listeners
         self.mod_search_var.trace_add("write", lambda *args: self.filter_mods())
@@ -130,13 +2904,17 @@ class QuakeLauncher:
 
         # 6. Finalize
         self.apply_theme_to_ui()
+        # Last mod/map are restored from the "mods loaded" / "maps ready" events,
+        # not from timers, so they come back as soon as the data exists
+        self.restore_on_load = bool(self.base_dir.get())
+        self.pending_restore = None
         if self.base_dir.get():
             self.load_mods()
-            self.root.after(200, self.restore_last_selection)
         
         self.root.geometry(self.config.get("window_size", "1200x800"))
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.root.after(100, self.restore_sashes)
+        self.root.after(UI_FRAME_MS, self.pump_ui_queue)
         self.extra_args.trace_add("write", self.save_mod_cli)
 
     def setup_ui(self):
@@ -174,10 +2952,11 @@ class QuakeLauncher:
         map_col = tk.Frame(self.paned)
         tk.Label(map_col, text="Maps", font=("Arial", 12, "bold")).pack()
         tk.Entry(map_col, textvariable=self.map_search_var).pack(fill="x")
-        self.map_listbox = tk.Listbox(map_col, exportselection=False)
+        self.map_listbox = tk.Listbox(map_col, exportselection=False, yscrollcommand=self.request_visible_titles)
         self.map_listbox.pack(fill="both", expand=True, pady=5)
         self.map_listbox.bind('<<ListboxSelect>>', self.on_map_select)
         self.map_listbox.bind("<Double-Button-1>", self.on_double_click_launch)
+        tk.Button(map_col, text="Gallery", command=self.open_gallery).pack(fill="x")
 
         # Preview Column
         preview_col = tk.Frame(self.paned)
@@ -284,57 +3063,309 @@ class QuakeLauncher:
             if self._after_id: 
                 self.root.after_cancel(self._after_id)
 
-            # Perform an instant low-quality resize so it tracks your mouse smoothly
-            self.render_image(self.current_img_path, fast=True)
+            # Drags fire <Configure> far more often than the screen refreshes:
+            # render the low-quality preview at most once per UI frame
+            if not self._resize_frame_id:
+                self._resize_frame_id = self.root.after(UI_FRAME_MS, self.render_resize_frame)
         
             # Schedule the high-quality render for 300ms after you STOP resizing
             self._after_id = self.root.after(300, lambda: self.render_image(self.current_img_path, fast=False))
 
+    def render_resize_frame(self):
+        self._resize_frame_id = None
+        # Perform an instant low-quality resize so it tracks your mouse smoothly
+        self.render_image(self.current_img_path, fast=True)
+
+    def preview_target(self):
+        # Current drawable size of the preview area (Tk thread only)
+        return (self.img_container.winfo_width() - 10, self.img_container.winfo_height() - 10)
+
     def render_image(self, full_path, fast=False):
 
         # 0. Safety: If path is empty or file missing, exit early
-        if not full_path or not os.path.exists(full_path):
+        if not full_path or not self.fs.exists(full_path):
             return
 
         try:
             # 1. Get container dimensions
-            cont_w = self.img_container.winfo_width() - 10
-            cont_h = self.img_container.winfo_height() - 10
+            cont_w, cont_h = self.preview_target()
             if cont_w < 50 or cont_h < 50: return
         
-            # 2. Use cached image if available to save Disk I/O
-            if hasattr(self, 'cached_image') and self.cached_image_path == full_path:
+            # 2. Use cached image if available to save Disk I/O.
+            # The cache holds a reduced decode (see decode_preview), not the full image
+            if getattr(self, 'cached_image', None) is not None and self.cached_image_path == full_path:
                 img = self.cached_image
             else:
-                img = Image.open(full_path)
+                img, self.cached_image_full_size = decode_preview(full_path, (cont_w, cont_h))
                 self.cached_image = img  # Store in memory
                 self.cached_image_path = full_path
+                self.cached_proxy = None
+
+            # 3. Target size: fit the original into the container, never upscale
+            full_w, full_h = self.cached_image_full_size
+            scale = min(cont_w / full_w, cont_h / full_h, 1.0)
+            fit = (max(1, int(full_w * scale)), max(1, int(full_h * scale)))
 
-            # 3. Choose resampling quality
-            # NEAREST is instant; LANCZOS is high quality but slow
-            resample_type = Image.Resampling.NEAREST if fast else Image.Resampling.LANCZOS
-        
             # 4. Resize and display
-            img_copy = img.copy()
-            img_copy.thumbnail((cont_w, cont_h), resample_type)
-            photo = ImageTk.PhotoImage(img_copy)
-        
-            self.img_label.config(image=photo, text="")
-            self.img_label.image = photo # Keep reference
+            if fast:
+                # NEAREST from the small proxy is instant while dragging
+                proxy = self.cached_proxy if self.cached_proxy is not None else img
+                out = proxy.resize(fit, Image.Resampling.NEAREST)
+            else:
+                if img.width < fit[0] or img.height < fit[1]:
+                    # Window grew past the reduced decode: decode again at the new size
+                    img, self.cached_image_full_size = decode_preview(full_path, (cont_w, cont_h))
+                    self.cached_image = img
+                # LANCZOS is high quality; reducing_gap box-shrinks first to keep it fast
+                out = img.resize(fit, Image.Resampling.LANCZOS, reducing_gap=2.0) if img.size != fit else img
+                # Keep a proxy at ~2x display size for the next live resize
+                factor = min(img.width // (2 * fit[0]), img.height // (2 * fit[1]))
+                self.cached_proxy = img.reduce(factor) if factor >= 2 else img
+            self.show_photo(out)
         except Exception as e:
             print(f"Render error: {e}")
 
-    def load_mods(self):
+    def show_photo(self, out):
+        # Paste into the existing Tk image when size and mode match (a pixel
+        # copy); only a new size or mode allocates a new PhotoImage
+        if self.photo is not None and self.photo_key == (out.size, out.mode):
+            self.photo.paste(out)
+        else:
+            self.photo = ImageTk.PhotoImage(out)
+            self.photo_key = (out.size, out.mode)
+        photo = self.photo
+        self.img_label.config(image=photo, text="")
+        self.img_label.image = photo # Keep reference
+
+    def load_mods(self, then=None):
+        # The daemon may be slow to answer (30 s socket timeout), so the list is
+        # fetched by the scheduler; then() runs once it is on screen
         self.mod_listbox.delete(0, tk.END)
         base = self.base_dir.get()
         if not os.path.exists(base): return
-        
-        found = []
-        for d in os.listdir(base):
-            if os.path.isdir(os.path.join(base, d)):
-                found.append(d)
-        self.all_mods = sorted(found)
+        self.jobs.bump("mods")
+        self.jobs.submit(PRIORITY_SELECTION, "mods", self.read_mods_list,
+                         on_done=lambda mods: self.show_mods(base, mods, then),
+                         on_error=lambda e: self.show_mods(base, [], then))
+
+    def read_mods_list(self):
+        # Worker thread
+        found = self.daemon_call("mods")
+        return found if found is not None else self.list_mods()
+
+    def show_mods(self, base, mods, then=None):
+        self.all_mods = mods
         self.filter_mods()
+        self.start_library_watcher(base)
+        self.on_mods_loaded()
+        if then:
+            then()
+
+    def start_library_watcher(self, base):
+        if self.library_watcher and (self.library_watcher.root_dir == base and self.watch_library):
+            return
+        if self.library_watcher:
+            self.library_watcher.stop()
+            self.library_watcher = None
+        if self.watch_library:
+            self.library_watcher = LibraryWatcher(base, self.on_library_change)
+            self.library_watcher.focus_mod = self.current_mod_name
+            self.library_watcher.start()
+
+    def on_library_change(self, mod_name):
+        # Watcher thread: forget cached listings for what changed, then let the UI react
+        if not self.library_watcher or self.library_watcher.root_dir != self.quake_root:
+            return
+        self.invalidate_mod(mod_name)
+        self.jobs.post(self.on_library_changed, mod_name)
+
+    def on_library_changed(self, mod_name):
+        # Tk thread: refresh the mod list, or incrementally rescan one mod
+        if mod_name is None:
+            self.warm_mods.clear()
+            self.refresh_mods_list()
+            return
+        self.warm_mods.pop(mod_name, None)
+        self.clear_title_cache(mod_name)
+        mod_path = os.path.join(self.base_dir.get(), mod_name)
+        self.jobs.submit(PRIORITY_BACKGROUND, None, self.scan_mod_files_worker, mod_name, mod_path,
+                         on_done=lambda maps: self.on_rescan_done(mod_name, maps))
+
+    def refresh_mods_list(self):
+        # Reload mods but keep the current selection and scroll position
+        scroll = self.mod_listbox.yview()[0]
+
+        def reselect():
+            for i in range(self.mod_listbox.size()):
+                if self.mod_listbox.get(i) == self.current_mod_name:
+                    self.mod_listbox.selection_set(i)
+                    self.mod_listbox.activate(i)
+                    break
+            self.mod_listbox.yview_moveto(scroll)
+        self.load_mods(then=reselect)
+
+    def on_rescan_done(self, mod_name, maps):
+        # Background rescan finished; only the selected mod's list is on screen
+        if mod_name != self.current_mod_name:
+            return
+        if maps != self.all_maps:
+            scroll = self.map_listbox.yview()[0]
+            self.all_maps = maps
+            self.filter_maps()
+            for i in range(self.map_listbox.size()):
+                if self.map_at(i) == self.current_map_name:
+                    self.map_listbox.selection_set(i)
+                    self.map_listbox.activate(i)
+                    break
+            self.map_listbox.yview_moveto(scroll)
+        # Title/stats were invalidated with the rest of the mod
+        if self.map_listbox.curselection():
+            self.on_map_select(None)
+
+    def on_mods_loaded(self):
+        # Event: the mod list has been (re)populated
+        if self.restore_on_load:
+            self.restore_on_load = False
+            self.restore_last_selection()
+            self.root.after(PREWARM_DELAY_MS, self.start_prewarm)
+            self.root.after(STORAGE_CHECK_DELAY_MS, self.check_storage)
+
+    def record_usage(self, mod_name, kind):
+        events = self.usage.setdefault(mod_name, [])
+        events.append([round(time.time()), kind])
+        del events[:-USAGE_EVENTS_KEPT]
+
+    def start_prewarm(self):
+        # Idle after startup: load the most used mods the way a click would
+        ranked = [m for m in rank_mods_by_usage(self.usage) if m in self.all_mods and m != self.current_mod_name]
+        self.prewarm_queue = ranked[:self.prewarm_mods]
+        self.prewarm_started = time.monotonic()
+        self.prewarm_bytes = 0
+        self.prewarm_next()
+
+    def prewarm_next(self):
+        # One mod at a time, so clicks are never queued behind the prewarm
+        if not self.prewarm_queue:
+            return
+        elapsed = time.monotonic() - self.prewarm_started
+        if elapsed > self.prewarm_seconds or self.prewarm_bytes > self.prewarm_mb * 1048576:
+            print(f"Prewarm stopped after {elapsed:.1f}s / {self.prewarm_bytes / 1048576:.1f} MB; "
+                  f"skipped {', '.join(self.prewarm_queue)}")
+            self.prewarm_queue = []
+            return
+        m_name = self.prewarm_queue.pop(0)
+        m_path = os.path.join(self.base_dir.get(), m_name)
+        budget = self.prewarm_mb * 1048576 - self.prewarm_bytes
+        self.jobs.submit(PRIORITY_BACKGROUND, None, self.read_mod_selection, m_name, m_path,
+                         self.preview_target(), budget,
+                         on_done=lambda result: self.on_prewarmed(m_name, result),
+                         on_error=lambda e: self.prewarm_next())
+
+    def on_prewarmed(self, m_name, result):
+        if result is None:
+            print(f"Prewarm stopped at {m_name}: over the {self.prewarm_mb} MB budget")
+            self.prewarm_queue = []
+            return
+        self.prewarm_bytes += result["bytes"]
+        if result["mod"] != self.current_mod_name:
+            self.warm_mods[result["mod"]] = result
+        self.prewarm_next()
+
+    def check_storage(self, force=False, periodic=True):
+        root = self.base_dir.get()
+        mod_paths = [os.path.join(root, m) for m in self.all_mods]
+        self.jobs.submit(PRIORITY_BACKGROUND, None, self.run_storage_check, root, mod_paths, force,
+                         on_done=self.on_storage_checked,
+                         on_error=lambda e: self.storage_status.set(f"Storage check failed: {e}"))
+        if periodic:
+            self.root.after(STORAGE_CHECK_INTERVAL_MS, self.check_storage)
+
+    def run_storage_check(self, root, mod_paths, force):
+        # Worker thread: update the ledger, enforce the budget, report usage
+        listed = self.storage.refresh(mod_paths, force)
+        report = self.storage.enforce(root, self.storage_budget_mb * 1048576, self.storage_policy,
+                                      self.storage_recompress)
+        self.storage.save()
+        report["listed"] = listed
+        report["usage"] = self.storage.usage(root)
+        return report
+
+    def on_storage_checked(self, report):
+        if report["removed"] or report["recompressed"]:
+            print(f"Storage: {report['before'] / 1048576:.1f} MB -> {report['after'] / 1048576:.1f} MB "
+                  f"({report['recompressed']} recompressed, {report['removed']} removed)")
+        usage = report["usage"]
+        cats = usage["categories"]
+        budget = f"{self.storage_budget_mb} MB" if self.storage_budget_mb else "no limit"
+        self.storage_status.set(f"{usage['total'] / 1048576:.1f} MB used ({budget})\n"
+                                f"previews {cats['previews'] / 1048576:.1f} MB, "
+                                f"archived {cats['archived'] / 1048576:.1f} MB,\n"
+                                f"thumbs {(cats['thumbs'] + cats['overviews']) / 1048576:.1f} MB, "
+                                f"caches {cats['caches'] / 1048576:.1f} MB")
+        self.storage_mods = usage["mods"]
+
+    def on_maps_ready(self, mod_name):
+        # Event: the map list for mod_name is populated (from cache or a scan)
+        self.queue_overviews(mod_name)
+        restore = self.pending_restore
+        if not restore or restore["mod"] != mod_name:
+            return
+        self.pending_restore = None
+
+        if restore["map"]:
+            for i in range(self.map_listbox.size()):
+                if self.map_at(i) == restore["map"]:
+                    self.map_listbox.selection_set(i)
+                    self.map_listbox.activate(i)
+                    self.on_map_select(None)
+                    break
+
+        # Restore map scroll
+        self.map_listbox.yview_moveto(restore["map_scroll"])
+
+    def queue_overviews(self, mod_name):
+        # Render overviews for every map of the mod that has no preview yet
+        for fut in self.overview_futures:
+            fut.cancel()
+        self.overview_futures = []
+        if np is None or not self.generate_overviews:
+            return
+        mod_path = os.path.join(self.base_dir.get(), mod_name)
+        self.jobs.submit(PRIORITY_BACKGROUND, "mod", self.missing_overviews, mod_path, list(self.all_maps),
+                         on_done=lambda jobs: self.start_overviews(mod_name, jobs))
+
+    def start_overviews(self, mod_name, jobs):
+        if not jobs:
+            return
+        if self.overview_pool is None:
+            # spawn, not fork: forking a process that runs Tk and threads is unsafe
+            workers = max(1, min(4, (os.cpu_count() or 2) - 1))
+            self.overview_pool = ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+        for map_name, path, offset, size, out_path in jobs:
+            fut = self.overview_pool.submit(render_overview, path, offset, size, out_path)
+            fut.add_done_callback(lambda fut, m=map_name: self.on_overview_done(mod_name, m, fut))
+            self.overview_futures.append(fut)
+
+    def on_overview_done(self, mod_name, map_name, fut):
+        # Pool callback thread
+        if fut.cancelled():
+            return
+        try:
+            out_path = fut.result()
+        except Exception as e:
+            print(f"Overview error ({map_name}): {e}")
+            return
+        if out_path:
+            self.jobs.post(self.show_overview, mod_name, map_name, out_path)
+
+    def show_overview(self, mod_name, map_name, out_path):
+        # Tk thread: show the new overview if its map is selected and has no preview
+        self.fs.invalidate(os.path.dirname(out_path))
+        if (mod_name, map_name) != (self.current_mod_name, self.current_map_name) or self.current_img_path:
+            return
+        self.jobs.submit(PRIORITY_SELECTION, "map", self.load_preview, out_path, self.preview_target(),
+                         on_done=lambda loaded: self.show_preview(loaded, "No Map Preview"))
 
     def filter_mods(self):
         query = self.mod_search_var.get().lower()
@@ -344,20 +3375,201 @@ class QuakeLauncher:
 
     def filter_maps(self):
         query = self.map_search_var.get().lower()
+        titles = self.map_titles if self.show_map_titles else {}
+        maps = self.all_maps
+
+        # has:, key:, monsters>N, secrets>=N, coop... come from the entity index
+        terms, filters = parse_map_query(query)
+        if filters:
+            if self.entity_index is None:
+                self.request_entity_index()
+                maps = []
+            else:
+                hits = query_entity_index(self.entity_index, filters, int(self.skill_level.get()))
+                maps = [m for m in maps if m in hits]
+            query = " ".join(terms)
+
+        self.visible_maps = [m for m in maps
+                             if query in m.lower() or query in titles.get(m, "").lower()]
         self.map_listbox.delete(0, tk.END)
-        for m in self.all_maps:
-            if query in m.lower(): self.map_listbox.insert(tk.END, m)
+        if self.visible_maps:
+            self.map_listbox.insert(tk.END, *[self.map_row_text(m) for m in self.visible_maps])
+        elif filters and self.entity_index is None:
+            self.map_listbox.insert(tk.END, "Indexing...")
+        self.request_visible_titles()
+        if self.gallery:
+            self.gallery.set_maps(self.current_mod_name or "", os.path.join(self.base_dir.get(),
+                                  self.current_mod_name or ""), self.visible_maps)
+
+    def open_gallery(self):
+        if self.gallery:
+            self.gallery.win.lift()
+            return
+        self.gallery = MapGallery(self)
+        self.gallery.set_maps(self.current_mod_name or "", os.path.join(self.base_dir.get(),
+                              self.current_mod_name or ""), self.visible_maps)
+        self.gallery.select(self.current_map_name)
+
+    def select_map(self, map_name, event=None):
+        # Selects map_name in the list as a click on its row would
+        if map_name not in self.visible_maps:
+            return
+        i = self.visible_maps.index(map_name)
+        self.map_listbox.selection_clear(0, tk.END)
+        self.map_listbox.selection_set(i)
+        self.map_listbox.activate(i)
+        self.map_listbox.see(i)
+        self.on_map_select(event)
+
+    def request_entity_index(self):
+        if self.entity_index_pending or not self.current_mod_name:
+            return
+        self.entity_index_pending = True
+        m_name = self.current_mod_name
+        self.jobs.submit(PRIORITY_SELECTION, "mod", self.load_entity_index, m_name,
+                         os.path.join(self.base_dir.get(), m_name), on_done=self.show_entity_index,
+                         on_error=self.on_entity_index_failed)
+
+    def load_entity_index(self, m_name, m_path):
+        # Worker thread: a mod scanned before the index existed is rescanned once
+        index = self.read_entity_index(m_path)
+        if index is None:
+            self.scan_mod_files_worker(m_name, m_path)
+            index = self.read_entity_index(m_path) or build_entity_index({})
+        return index
+
+    def show_entity_index(self, index):
+        self.entity_index = index
+        self.entity_index_pending = False
+        self.filter_maps()
+
+    def on_entity_index_failed(self, error):
+        # Left unset: the next query edit retries
+        self.entity_index_pending = False
+        self.map_listbox.delete(0, tk.END)
+        self.map_listbox.insert(tk.END, "Index failed")
+
+    def map_at(self, index):
+        # Map name for a listbox row (rows may show "name — title")
+        if 0 <= index < len(self.visible_maps):
+            return self.visible_maps[index]
+        return self.map_listbox.get(index)
+
+    def map_row_text(self, map_name):
+        title = self.map_titles.get(map_name) if self.show_map_titles else None
+        return f"{map_name} — {title}" if title else map_name
+
+    def request_visible_titles(self, *args):
+        # Called on every scroll of the map list; fetch at most once per 50 ms
+        if not self.show_map_titles:
+            return
+        if self._titles_after_id:
+            self.root.after_cancel(self._titles_after_id)
+        self._titles_after_id = self.root.after(50, self.fetch_visible_titles)
+
+    def fetch_visible_titles(self):
+        # Queue one batch for the visible rows (plus a screenful either side)
+        self._titles_after_id = None
+        if not self.visible_maps or not self.current_mod_name:
+            return
+        first = self.map_listbox.nearest(0)
+        last = self.map_listbox.nearest(self.map_listbox.winfo_height())
+        margin = max(10, last - first)
+        rows = range(max(0, first - margin), min(len(self.visible_maps), last + margin + 1))
+        names = [self.visible_maps[i] for i in rows
+                 if self.visible_maps[i] not in self.map_titles
+                 and self.visible_maps[i] not in self.titles_pending
+                 and self.visible_maps[i] != "(Default)"]
+        if not names:
+            return
+        self.titles_pending.update(names)
+        mod_path = os.path.join(self.base_dir.get(), self.current_mod_name)
+        self.jobs.submit(PRIORITY_PREFETCH, "mod", self.load_titles_batch, mod_path, names,
+                         on_done=self.show_titles_batch,
+                         on_error=lambda e: self.titles_pending.difference_update(names))
+
+    def daemon_call(self, cmd, **args):
+        # Ask the library daemon; None means "not available, do it locally"
+        if not self.use_daemon:
+            return None
+        try:
+            if self.daemon_root is None:
+                self.daemon_root = self.library_client.call("ping")["root"]
+            if os.path.normpath(self.daemon_root) != os.path.normpath(self.quake_root):
+                return None
+            result = self.library_client.call(cmd, **args)
+        except (OSError, ValueError, RuntimeError) as e:
+            self.daemon_root = None
+            if self.daemon_up is not False:
+                print(f"Library daemon unavailable, reading files directly: {e}")
+            self.daemon_up = False
+            return None
+        self.daemon_up = True
+        return result
+
+    def load_map_info(self, mod_name, map_name):
+        # Worker thread: map info from the daemon's cache, else parsed here
+        key = (mod_name, map_name)
+        if key not in self.map_info:
+            info = self.daemon_call("map_info", mod=mod_name, map=map_name)
+            if info is not None:
+                # JSON turned the skill keys into strings and the counts into lists
+                info["stats"] = {int(sk): tuple(v) for sk, v in info["stats"].items()}
+                self.map_info[key] = info
+        return super().load_map_info(mod_name, map_name)
+
+    def load_titles_batch(self, mod_path, names):
+        # Worker thread: titles from the daemon if it runs, else read them here
+        titles = self.daemon_call("titles", mod=os.path.basename(mod_path), maps=names)
+        return titles if titles is not None else self.read_titles_batch(mod_path, names)
+
+    def show_titles_batch(self, titles):
+        # Rewrite only the rows whose titles just arrived, keeping the selection
+        self.map_titles.update(titles)
+        self.titles_pending.difference_update(titles)
+        selected = set(self.map_listbox.curselection())
+        for i, m in enumerate(self.visible_maps):
+            if titles.get(m):
+                self.map_listbox.delete(i)
+                self.map_listbox.insert(i, self.map_row_text(m))
+                if i in selected:
+                    self.map_listbox.selection_set(i)
+
+    def clear_title_cache(self, mod_name):
+        # Titles are re-read lazily after a mod's files change
+        cache = self.fs.resolve(os.path.join(self.base_dir.get(), mod_name), "previews", "title_cache.json")
+        if cache:
+            try: os.remove(cache)
+            except OSError: pass
+        if mod_name == self.current_mod_name:
+            self.map_titles = {}
+            self.titles_pending = set()
+
+    def pump_ui_queue(self):
+        # Applies background job results once per frame
+        self.jobs.drain()
+        self.root.after(UI_FRAME_MS, self.pump_ui_queue)
 
     def on_mod_select(self, event):
         sel = self.mod_listbox.curselection()
         if not sel: return
         m_name = self.mod_listbox.get(sel[0])
         m_path = os.path.join(self.base_dir.get(), m_name)
+
+        # A real click overrides any startup restore still waiting for its maps
+        if event is not None:
+            self.pending_restore = None
+            self.record_usage(m_name, "select")
+
+        # Anything still in flight for the previous mod/map is now stale
+        self.jobs.bump("mod")
+        self.jobs.bump("map")
+        self.current_mod_name = m_name
+        if self.library_watcher:
+            self.library_watcher.focus_mod = m_name
+        self.current_map_name = None
         
         self.save_game.set("(None)")
-        
-        self.archive_existing_screenshots(m_path)
-        self.update_save_list(m_path)
 
         # Clear the image cache so we don't show the old mod's image
         self.cached_image = None
@@ -366,157 +3578,129 @@ class QuakeLauncher:
         # self.preview_title.config(text=f"Mod: {m_name}")
         self.preview_title.config(text=f"Mod: {m_name}")
         self.map_info_label.config(text="Monsters: -- | Secrets: --")
-        
-        cache_path = os.path.join(m_path, "previews", "map_cache.json")
-        if os.path.exists(cache_path):
-            with open(cache_path, 'r') as f: self.all_maps = json.load(f)
-            self.filter_maps()
-        else:
-            self.start_new_scan(m_name, m_path)
-        self.update_mod_image(m_name, m_path)
+        self.map_titles = {}
+        self.titles_pending = set()
+        self.entity_index = None
+        self.entity_index_pending = False
+        self.visible_maps = []
+        self.map_listbox.delete(0, tk.END)
+        self.map_listbox.insert(tk.END, "Loading...")
         self.extra_args.set(self.mod_extra_args.get(m_name, ""))
-        
-        #self.save_game.set("(None)")
-        
+
+        # Prewarmed at startup: nothing left to read, only the screenshot
+        # housekeeping that prewarming leaves for mods the user actually opens
+        warm = self.warm_mods.pop(m_name, None)
+        if warm:
+            self.show_mod_selection(warm)
+            self.jobs.submit(PRIORITY_BACKGROUND, None, self.tidy_mod_files, m_path)
+            return
+
+        # Screenshot archiving, saves, map cache and mod image are all disk work
+        self.jobs.submit(PRIORITY_SELECTION, "mod", self.load_mod_selection, m_name, m_path,
+                         self.preview_target(), on_done=self.show_mod_selection,
+                         on_error=lambda e: self.show_list_error("Load failed"))
+
+    def load_mod_selection(self, m_name, m_path, target=None):
+        # Worker thread: everything on_mod_select needs from disk
+        self.tidy_mod_files(m_path)
+        return self.read_mod_selection(m_name, m_path, target)
+
+    def tidy_mod_files(self, m_path):
+        # Moves and re-encodes the user's screenshots, so only for opened mods
+        self.archive_existing_screenshots(m_path)
+        self.ingest_leftover_previews(m_path)
+
+    def read_mod_selection(self, m_name, m_path, target=None, budget=None):
+        # Worker thread: the read-only part of load_mod_selection (prewarm uses
+        # it directly). With a byte budget, None is returned before anything is
+        # decoded if this mod's files would exceed it.
+        result = {"mod": m_name, "path": m_path, "saves": self.scan_saves(m_path)}
+
+        # The daemon already holds this mod's maps and titles in memory
+        result["maps"] = self.daemon_call("maps", mod=m_name)
+        if result["maps"] is None:
+            result["maps"] = self.read_map_cache(m_path)
+        result["titles"] = self.daemon_call("titles", mod=m_name)
+        if result["titles"] is None:
+            result["titles"] = self.read_title_cache(m_path)
+
+        image = self.find_mod_image(m_name, m_path)
+        read = [os.path.join(m_path, "previews", c) for c in ["map_cache.json", "title_cache.json"]]
+        result["bytes"] = sum(self.fs.getsize(p) for p in read + [image] if p)
+        if budget is not None and result["bytes"] > budget:
+            return None
+        result["image"] = self.load_preview(image, target)
+        return result
+
+    def show_mod_selection(self, result):
+        # Tk thread: apply load_mod_selection results
+        self.update_save_list(result["path"], result["saves"])
+        self.demo_index = {}
+        self.jobs.submit(PRIORITY_BACKGROUND, "mod", self.index_demos, result["path"],
+                         on_done=self.show_demo_index)
+
+        self.show_preview(result["image"], "No Preview")
+
         # Clear map selection and focus ring
         self.map_listbox.selection_clear(0, tk.END)
         self.map_listbox.activate(0) # Moves the 'focus' line to the top or hidden
 
+        self.map_titles = result["titles"]
+        if result["maps"] is not None:
+            self.all_maps = result["maps"]
+            self.filter_maps()
+            self.on_maps_ready(result["mod"])
+        else:
+            self.start_new_scan(result["mod"], result["path"])
+
     def start_new_scan(self, mod_name, mod_path):
+        self.visible_maps = []
         self.map_listbox.delete(0, tk.END)
         self.map_listbox.insert(tk.END, "Scanning...")
-        threading.Thread(target=self.scan_mod_files_worker, args=(mod_name, mod_path), daemon=True).start()
-
-    def is_blacklisted(self, filename, mod_name):
-        fn = filename.lower()
-        if mod_name == "id1" and fn.replace('.bsp', '') in self.original_maps:
-            return True
-        # If it starts with b_, it's a brush model (junk)
-        if fn.startswith('b_'):
-            return True
-        return False
-
-    def scan_mod_files_worker(self, mod_name, mod_path):
-        found_maps = set()
-        #if mod_name == "id1": 
-        found_maps.add("(Default)")
-        
-        # 1. Search the Mod Root (e.g., /ad/start.bsp)
-        try:
-            for f in os.listdir(mod_path):
-                if f.lower().endswith('.bsp'):
-                    full_path = os.path.join(mod_path, f)
-                    if os.path.getsize(full_path) < 40000: continue
-                    with open(full_path, 'rb') as bsp_file:
-                        if self.is_valid_bsp(bsp_file):
-                            found_maps.add(f.lower().replace('.bsp', ''))
-        except Exception: pass
+        self.jobs.submit(PRIORITY_BACKGROUND, "mod", self.scan_mod_files_worker, mod_name, mod_path,
+                         on_done=lambda maps: self.show_scanned_maps(mod_name, maps),
+                         on_error=lambda e: self.show_list_error("Scan failed"))
 
-        # 2. Search ONLY the /maps folder (No subfolders)
-        # This stops the "unplayable subfolder maps" issue entirely
-        maps_subdir = os.path.join(mod_path, "maps")
-        if os.path.exists(maps_subdir):
-            try:
-                for f in os.listdir(maps_subdir):
-                    if f.lower().endswith('.bsp'):
-                        full_path = os.path.join(maps_subdir, f)
-                        
-                        # Size filter
-                        if os.path.getsize(full_path) < 40000: continue
-                        
-                        # Blacklist and Binary validation
-                        if not self.is_blacklisted(f, mod_name):
-                            try:
-                                with open(full_path, 'rb') as bsp_file:
-                                    if self.is_valid_bsp(bsp_file):
-                                        found_maps.add(f.lower().replace('.bsp', ''))
-                            except Exception: continue
-            except Exception: pass
-
-        # 3. PAK Search (Already handles internal size/path filtering)
-        if os.path.exists(mod_path):
-            for f in os.listdir(mod_path):
-                if f.lower().endswith('.pak'):
-                    pak_maps = self.get_maps_from_pak(os.path.join(mod_path, f))
-                    for m in pak_maps:
-                        if not self.is_blacklisted(m + ".bsp", mod_name):
-                            found_maps.add(m)
-
-        self.all_maps = sorted(list(found_maps))
-        if not self.all_maps: self.all_maps = ["(Default)"]
-        
-        # Cache results to Disk
-        p_dir = os.path.join(mod_path, "previews")
-        os.makedirs(p_dir, exist_ok=True)
-        with open(os.path.join(p_dir, "map_cache.json"), 'w') as f:
-            json.dump(self.all_maps, f)
-        
-        self.root.after(0, self.filter_maps)
-
-    def is_valid_map(self, f, base_offset=0):
-        try:
-            import struct
-            f.seek(base_offset)
-            header = f.read(160)
-            ent_off = struct.unpack('<I', header[4:8])[0]
-            ent_size = struct.unpack('<I', header[8:12])[0]
-            f.seek(base_offset + ent_off)
-            chunk = f.read(ent_size).decode('ascii', errors='ignore')
-            return any(x in chunk for x in ['info_player_start', 'info_player_deathmatch'])
-        except: return False
-
-    def get_maps_from_pak(self, pak_path):
-        maps = []
+    def show_list_error(self, text):
+        # A mod load or scan raised: replace the placeholder row (reselect the mod to retry)
+        self.visible_maps = []
+        self.map_listbox.delete(0, tk.END)
+        self.map_listbox.insert(tk.END, text)
+
+    def show_scanned_maps(self, mod_name, maps):
+        # Only reached if the scanned mod is still the selected one
+        self.all_maps = maps
+        self.entity_index = None  # rewritten by the scan
+        self.filter_maps()
+        self.on_maps_ready(mod_name)
+
+    def show_demo_index(self, by_map):
+        self.demo_index = by_map
+
+    def load_preview(self, path, target=None):
+        # Worker thread: decode an image (near target size) so the Tk thread only has to scale it
+        if not path:
+            return None
         try:
-            import struct
-            with open(pak_path, 'rb') as f:
-                header = f.read(12)
-                if header[:4] != b'PACK': return []
-                off, sz = struct.unpack('<II', header[4:12])
-                f.seek(off)
-                for _ in range(sz // 64):
-                    ent = f.read(64)
-                    
-                    #full_name = ent[:56].split(b'\0')[0].decode('ascii', errors='ignore').lower()
-                    # In get_maps_from_pak:
-                    full_name = ent[:56].split(b'\0')[0].decode('latin-1').strip().lower()
-                    
-                    if full_name.endswith('.bsp'):
-                        # Ensure we aren't in a models/ folder inside the PAK
-                        if any(x in full_name for x in ['models/', 'progs/', 'textures/']):
-                            continue
-
-                        file_off = struct.unpack('<I', ent[56:60])[0]
-                        file_size = struct.unpack('<I', ent[60:64])[0]
-                        
-                        if file_size < 40000: continue 
-
-                        back_pos = f.tell() 
-                        if self.is_valid_bsp(f, file_off):
-                            file_only = full_name.split('/')[-1].replace('.bsp', '')
-                            maps.append(file_only)
-                        f.seek(back_pos)
-        except Exception as e: print(f"PAK error: {e}")
-        return maps
-    
-    def update_mod_image(self, mod_name, mod_path):
-        # Look for mod.png or random preview
-        for ext in ['.png', '.jpg']:
-            p = os.path.join(mod_path, mod_name + ext)
-            if os.path.exists(p):
-                self.current_img_path = p
-                self.render_image(p)
-                return
-        
-        pre = os.path.join(mod_path, "previews")
-        if os.path.exists(pre):
-            imgs = [f for f in os.listdir(pre) if f.lower().endswith(('.png', '.jpg'))]
-            if imgs:
-                self.current_img_path = os.path.join(pre, random.choice(imgs))
-                self.render_image(self.current_img_path)
-                return
-        self.img_label.config(image="", text="No Preview")
-        self.current_img_path = None
+            img, full_size = decode_preview(path, target)
+            return path, img, full_size
+        except Exception as e:
+            print(f"Preview load error: {e}")
+            return None
+
+    def show_preview(self, loaded, empty_text):
+        # Tk thread: display a (path, image, full size) tuple from load_preview
+        if loaded:
+            self.current_img_path, self.cached_image, self.cached_image_full_size = loaded
+            self.cached_image_path = self.current_img_path
+            self.cached_proxy = None
+            self.storage.touch(self.current_img_path)
+            self.render_image(self.current_img_path)
+        else:
+            self.img_label.config(image="", text=empty_text)
+            self.img_label.image = None
+            self.photo = None
+            self.current_img_path = None
 
     def on_map_select(self, event):
 
@@ -534,35 +3718,72 @@ class QuakeLauncher:
         sel = self.map_listbox.curselection()
         if not sel: 
             return
-        map_name = self.map_listbox.get(sel[0])
+        map_name = self.map_at(sel[0])
+        if map_name in ("Loading...", "Scanning...", "Indexing...", "Load failed", "Scan failed", "Index failed"):
+            return
 
         # 2. Get the selected mod name (or default to id1)
         mod_sel = self.mod_listbox.curselection()
         mod_name = self.mod_listbox.get(mod_sel[0]) if mod_sel else "id1"
-        mod_path = os.path.join(self.base_dir.get(), mod_name)
-
-        # 3. Now it is safe to use those variables
-        title = self.get_map_title(mod_name, map_name)
-        self.preview_title.config(text=title)
-
-        # 4. Update the rest of the UI
-        self.update_map_stats_display(mod_path, map_name)
-
-        # Try finding image
-        img_found = False
-        for folder in ["previews", "maps"]:
-            p_no_ext = os.path.join(mod_path, folder, map_name.lower())
-            for ext in ['.png', '.jpg']:
-                if os.path.exists(p_no_ext + ext):
-                    self.current_img_path = p_no_ext + ext
-                    self.render_image(self.current_img_path)
-                    img_found = True
-                    break
-            if img_found: break
-        
-        if not img_found:
-            self.img_label.config(image="", text="No Map Preview")
-            self.current_img_path = None
+        self.current_map_name = map_name
+        if self.gallery:
+            self.gallery.select(map_name)
+
+        # 3. Title, stats and preview are read by the scheduler; a newer click
+        # makes this job stale so only the latest selection reaches the UI
+        self.jobs.bump("map")
+        info = self.map_info.get((mod_name, map_name))
+        if info:
+            self.show_map_info(info)
+        else:
+            self.preview_title.config(text=map_name)
+            self.map_info_label.config(text="Monsters: -- | Secrets: --")
+        self.jobs.submit(PRIORITY_SELECTION, "map", self.load_map_selection, mod_name, map_name,
+                         self.preview_target(), on_done=self.show_map_selection,
+                         on_error=lambda e: self.show_preview(None, "No Map Preview"))
+        if self.warm_before_launch:
+            self.jobs.submit(PRIORITY_BACKGROUND, "map", self.warm_map_files, mod_name, map_name,
+                             on_done=self.on_map_warmed)
+
+        # 4. Warm the neighbours so arrowing through the list is instant
+        for i in (sel[0] + 1, sel[0] - 1):
+            if 0 <= i < self.map_listbox.size():
+                self.jobs.submit(PRIORITY_PREFETCH, "mod", self.load_map_info, mod_name, self.map_at(i))
+
+    def warm_map_files(self, mod_name, map_name):
+        # Worker thread: hint the kernel to read what the engine will load first
+        ranges = self.launch_files(os.path.join(self.quake_root, mod_name), map_name)
+        return mod_name, map_name, warm_page_cache(ranges)
+
+    def on_map_warmed(self, result):
+        mod_name, map_name, _ = result
+        self.cache_warm = (mod_name, map_name)
+
+    def load_map_selection(self, mod_name, map_name, target=None):
+        # Worker thread: title/stats plus the decoded preview for one map
+        mod_path = os.path.join(self.quake_root, mod_name)
+        info = self.load_map_info(mod_name, map_name)
+        return info, self.load_preview(self.find_map_image(mod_path, map_name), target)
+
+    def show_map_selection(self, result):
+        info, loaded = result
+        self.show_map_info(info)
+        self.show_preview(loaded, "No Map Preview")
+
+    def show_map_info(self, info):
+        self.preview_title.config(text=info["title"])
+        self.update_map_stats_display(info)
+
+    def on_skill_change(self):
+        # Entity queries like monsters>150 count for the selected skill
+        if parse_map_query(self.map_search_var.get())[1]:
+            self.filter_maps()
+        # Per-skill counts are cached with the map info, so no disk access here
+        info = self.map_info.get((self.current_mod_name, self.current_map_name))
+        if info:
+            self.update_map_stats_display(info)
+        else:
+            self.on_map_select(None)
 
     def show_context_menu(self, event):
         if self.current_img_path: self.context_menu.tk_popup(event.x_root, event.y_root)
@@ -573,6 +3794,66 @@ class QuakeLauncher:
         self.mod_listbox.selection_set(idx)
         self.mod_context_menu.tk_popup(event.x_root, event.y_root)
 
+    def show_map_context_menu(self, event):
+        idx = self.map_listbox.nearest(event.y)
+        if idx < 0: return
+        if idx not in self.map_listbox.curselection():
+            self.map_listbox.selection_clear(0, tk.END)
+            self.map_listbox.selection_set(idx)
+            self.on_map_select(None)
+        map_name = self.map_at(idx).lower()
+
+        # One Play/Timedemo entry per demo recorded on this map
+        menu = self.map_context_menu
+        menu.delete(0, "end")
+        demos = self.demo_index.get(map_name, [])
+        if not demos:
+            menu.add_command(label="No demos for this map", state="disabled")
+        for demo in demos:
+            label = demo["path"]
+            if demo["duration"]:
+                label += f"  ({int(demo['duration']) // 60}:{int(demo['duration']) % 60:02d})"
+            menu.add_command(label=f"Play Demo: {label}", command=lambda d=demo: self.launch_demo(d))
+            menu.add_command(label=f"Timedemo: {label}", command=lambda d=demo: self.launch_demo(d, timedemo=True))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def launch_demo(self, demo, timedemo=False):
+        exe = self.exe_path.get()
+        if not os.path.exists(exe):
+            messagebox.showerror("Error", "Engine executable not found!")
+            return
+        sel_mod = self.mod_listbox.curselection()
+        mod = self.mod_listbox.get(sel_mod[0]) if sel_mod else "id1"
+
+        verb = "+timedemo" if timedemo else "+playdemo"
+        cmd = build_launch_command(exe, mod, extra_args=self.mod_extra_args.get(mod, ""),
+                                   commands=[verb, demo["path"]])
+        print("Command line:", " ".join(cmd))
+
+        if not timedemo:
+            subprocess.Popen(cmd, cwd=os.path.dirname(exe))
+            return
+
+        # Timedemo: run through the benchmark runner and report the fps. It
+        # blocks for the whole engine run, so it gets its own thread rather
+        # than one of the scheduler's I/O workers
+        log_path = os.path.join(self.base_dir.get(), mod, "qconsole.log")
+        threading.Thread(target=self.run_demo_benchmark, args=(demo["path"], cmd, os.path.dirname(exe), log_path),
+                         name="tqd-timedemo", daemon=True).start()
+
+    def run_demo_benchmark(self, demo_path, cmd, cwd, log_path):
+        # Timedemo thread
+        try:
+            r = run_timedemo(cmd, cwd, log_path)
+        except Exception as e:
+            self.jobs.post(messagebox.showerror, "Timedemo", f"{demo_path}: {e}")
+            return
+        if r["status"] == "ok":
+            text = f"{demo_path}: {r['fps']} fps ({r['frames']} frames, {r['seconds']} s)"
+        else:
+            text = f"{demo_path}: {r['status']}"
+        self.jobs.post(messagebox.showinfo, "Timedemo", text)
+
     def load_config(self):
         if os.path.exists(CONFIG_FILE):
             with open(CONFIG_FILE, 'r') as f: return json.load(f)
@@ -589,7 +3870,7 @@ class QuakeLauncher:
         last_mod = self.mod_listbox.get(sel_mod[0]) if sel_mod else None
 
         sel_map = self.map_listbox.curselection()
-        last_map = self.map_listbox.get(sel_map[0]) if sel_map else None
+        last_map = self.map_at(sel_map[0]) if sel_map else None
 
         # Scroll positions (top fraction)
         mod_scroll = self.mod_listbox.yview()[0]
@@ -607,8 +3888,26 @@ class QuakeLauncher:
             "last_map": last_map,
             "mod_scroll": mod_scroll,
             "map_scroll": map_scroll,
-            "mod_extra_args": self.mod_extra_args
+            "mod_extra_args": self.mod_extra_args,
+            "screenshot_format": self.screenshot_format,
+            "strip_screenshot_metadata": self.strip_screenshot_metadata,
+            "watch_library": self.watch_library,
+            "show_map_titles": self.show_map_titles,
+            "use_daemon": self.use_daemon,
+            "record_launches": self.record_launches,
+            "generate_overviews": self.generate_overviews,
+            "usage": self.usage,
+            "prewarm_mods": self.prewarm_mods,
+            "prewarm_seconds": self.prewarm_seconds,
+            "prewarm_mb": self.prewarm_mb,
+            "storage_budget_mb": self.storage_budget_mb,
+            "storage_policy": self.storage_policy,
+            "storage_recompress": self.storage_recompress,
+            "warm_before_launch": self.warm_before_launch,
+            "scan_workers": self.scan_workers
         }
+        if self.config.get("daemon_socket"):
+            data["daemon_socket"] = self.config["daemon_socket"]
 
 
         with open(CONFIG_FILE, 'w') as f:
@@ -618,7 +3917,7 @@ class QuakeLauncher:
     def open_settings(self):
         settings_win = tk.Toplevel(self.root)
         settings_win.title("Settings")
-        settings_win.geometry("300x400")
+        settings_win.geometry("300x870")
         settings_win.configure(bg="#f0f0f0") # Standard light grey
         settings_win.grab_set()
 
@@ -634,6 +3933,42 @@ class QuakeLauncher:
         size_var = tk.StringVar(settings_win, value=str(self.font_size))
         tk.OptionMenu(settings_win, size_var, "10", "12", "14", "16", "18", "20", command=self.change_font_size).pack()
 
+        # Screenshot ingestion
+        tk.Label(settings_win, text="Screenshot Format", bg="#f0f0f0", fg="black", font=("Arial", 10, "bold")).pack(pady=10)
+        formats = ["jpg", "png"] + (["webp"] if features.check("webp") else []) + ["keep"]
+        format_var = tk.StringVar(settings_win, value=self.screenshot_format)
+        tk.OptionMenu(settings_win, format_var, *formats, command=self.change_screenshot_format).pack()
+        strip_var = tk.BooleanVar(settings_win, value=self.strip_screenshot_metadata)
+        tk.Checkbutton(settings_win, text="Strip screenshot metadata", variable=strip_var, bg="#f0f0f0",
+                       command=lambda: self.change_strip_metadata(strip_var.get())).pack(pady=5)
+        watch_var = tk.BooleanVar(settings_win, value=self.watch_library)
+        tk.Checkbutton(settings_win, text="Watch library for changes", variable=watch_var, bg="#f0f0f0",
+                       command=lambda: self.change_watch_library(watch_var.get())).pack(pady=5)
+        titles_var = tk.BooleanVar(settings_win, value=self.show_map_titles)
+        tk.Checkbutton(settings_win, text="Show map titles in list", variable=titles_var, bg="#f0f0f0",
+                       command=lambda: self.change_show_map_titles(titles_var.get())).pack(pady=5)
+        daemon_var = tk.BooleanVar(settings_win, value=self.use_daemon)
+        tk.Checkbutton(settings_win, text="Use library daemon (--daemon)", variable=daemon_var, bg="#f0f0f0",
+                       command=lambda: self.change_use_daemon(daemon_var.get())).pack(pady=5)
+        if np is not None:
+            overview_var = tk.BooleanVar(settings_win, value=self.generate_overviews)
+            tk.Checkbutton(settings_win, text="Generate map overviews", variable=overview_var, bg="#f0f0f0",
+                           command=lambda: self.change_generate_overviews(overview_var.get())).pack(pady=5)
+        record_var = tk.BooleanVar(settings_win, value=self.record_launches)
+        tk.Checkbutton(settings_win, text="Record load times (engine output)", variable=record_var, bg="#f0f0f0",
+                       command=lambda: self.change_record_launches(record_var.get())).pack(pady=5)
+        warm_var = tk.BooleanVar(settings_win, value=self.warm_before_launch)
+        tk.Checkbutton(settings_win, text="Warm map files before launch", variable=warm_var, bg="#f0f0f0",
+                       command=lambda: self.change_warm_before_launch(warm_var.get())).pack(pady=5)
+        tk.Button(settings_win, text="Launch History", bg="#ddd", fg="black",
+                  command=self.open_launch_history).pack(pady=5)
+
+        # Launcher data on disk
+        tk.Label(settings_win, text="Launcher Data", bg="#f0f0f0", fg="black", font=("Arial", 10, "bold")).pack(pady=5)
+        tk.Label(settings_win, textvariable=self.storage_status, bg="#f0f0f0", fg="black").pack()
+        tk.Button(settings_win, text="Storage...", bg="#ddd", fg="black",
+                  command=self.open_storage).pack(pady=5)
+
         # THE BUTTON
         tk.Button(settings_win, text="CLOSE", width=15, bg="#ddd", fg="black", 
                   command=settings_win.destroy).pack(pady=30)
@@ -644,6 +3979,45 @@ class QuakeLauncher:
         self.apply_theme_to_ui()  # This updates the UI colors
         self.save_config()        # This writes it to the JSON
 
+    def change_screenshot_format(self, fmt):
+        self.screenshot_format = fmt
+        self.save_config()
+
+    def change_strip_metadata(self, strip):
+        self.strip_screenshot_metadata = strip
+        self.save_config()
+
+    def change_show_map_titles(self, enabled):
+        self.show_map_titles = enabled
+        self.filter_maps()
+        self.save_config()
+
+    def change_watch_library(self, enabled):
+        self.watch_library = enabled
+        self.start_library_watcher(self.base_dir.get())
+        self.save_config()
+
+    def change_use_daemon(self, enabled):
+        self.use_daemon = enabled
+        self.daemon_root = None
+        self.daemon_up = None
+        self.save_config()
+
+    def change_generate_overviews(self, enabled):
+        self.generate_overviews = enabled
+        if enabled and self.current_mod_name:
+            self.queue_overviews(self.current_mod_name)
+        self.save_config()
+
+    def change_record_launches(self, enabled):
+        self.record_launches = enabled
+        self.save_config()
+
+    def change_warm_before_launch(self, enabled):
+        self.warm_before_launch = enabled
+        self.cache_warm = None
+        self.save_config()
+
     def change_font_size(self, size):
         self.font_size = int(size)
         self.ui_font = ("Arial", self.font_size)
@@ -658,6 +4032,14 @@ class QuakeLauncher:
         p = filedialog.askdirectory()
         if p: self.base_dir.set(p); self.load_mods(); self.save_config()
 
+    def on_base_dir_change(self):
+        # Browse or typing in the entry: workers and the storage ledger follow
+        self.quake_root = self.base_dir.get()
+        ledger = os.path.join(self.quake_root, STORAGE_LEDGER_FILE)
+        if self.storage.path != ledger:
+            self.storage.save()
+            self.storage = StorageManager(ledger)
+
     def restore_sashes(self):
         s = self.config.get("sashes")
         if s:
@@ -665,6 +4047,11 @@ class QuakeLauncher:
             except: pass
 
     def on_close(self):
+        if self.library_watcher:
+            self.library_watcher.stop()
+        if self.overview_pool:
+            self.overview_pool.shutdown(wait=False, cancel_futures=True)
+        self.storage.save()
         self.save_config()
         self.root.destroy()
 
@@ -680,7 +4067,7 @@ class QuakeLauncher:
 
         # 2. Get current Map
         sel_map = self.map_listbox.curselection()
-        map_n = self.map_listbox.get(sel_map[0]) if sel_map else "(Default)"    
+        map_n = self.map_at(sel_map[0]) if sel_map else "(Default)"    
 
         # 3. Start screenshot watcher
         self.stop_screenshot_watch.clear()
@@ -690,40 +4077,161 @@ class QuakeLauncher:
             daemon=True
         ).start()
 
-        # 4. Base Command
-        cmd = [exe, "-game", mod]
-
-        # 5. DECISION LOGIC: Save vs Map vs Default
+        # 4. Save vs Map vs Default
+        save_name = None
         display_selection = self.save_game.get()
-        
         if display_selection != "(None)":
-            # CASE A: Loading a Save.
             # Get the real filename from our lookup table (e.g., "s0.sav")
             real_save_file = self.save_lookup.get(display_selection, "")
-            
             # Remove .sav extension for the +load command
             save_name = real_save_file.lower().replace('.sav', '')
-            cmd.extend(["+load", save_name])
-        
-        elif map_n != "(Default)":
-            # CASE B: Starting a fresh Map.
-            cmd.extend(["+skill", self.skill_level.get(), "+map", map_n])
-        
-        else:
-            # CASE C: Launching to Main Menu.
-            cmd.extend(["+skill", self.skill_level.get()])
 
-        # 6. Add extra CLI parameters
-        import shlex
-        extra = self.mod_extra_args.get(mod, "").strip()
-        if extra:
-            cmd.extend(shlex.split(extra))
+        # 5. Build the command line (plus milestone markers when recording)
+        extra = self.mod_extra_args.get(mod, "")
+        loads_map = save_name or map_n != "(Default)"
+        commands = telemetry_commands() if self.record_launches and loads_map else None
+        cmd = build_launch_command(exe, mod, skill=self.skill_level.get(), map_name=map_n,
+                                   save_name=save_name, extra_args=extra, commands=commands)
 
         print("Command line:", " ".join(cmd))
 
-        # 7. Save state and Launch
+        # 6. Save state and Launch (the game may write saves and screenshots,
+        # so prewarmed mods are read again on their next click)
+        self.record_usage(mod, "launch")
+        self.warm_mods.clear()
         self.save_config()
-        subprocess.Popen(cmd, cwd=os.path.dirname(exe))
+
+        # Whether the map's files were warmed before launch goes with its load
+        # time, so launches with and without warming can be compared. A warm
+        # that hasn't finished is not started now: it would only compete with
+        # the engine's own reads.
+        warmed = None
+        if self.warm_before_launch and not save_name:
+            warmed = self.cache_warm == (mod, map_n)
+
+        if not self.record_launches:
+            subprocess.Popen(cmd, cwd=os.path.dirname(exe))
+            return
+        info = {"engine": exe, "mod": mod, "map": f"save:{save_name}" if save_name else map_n, "args": extra,
+                "warmed": warmed}
+        try:
+            self.last_session = EngineSession(cmd, cwd=os.path.dirname(exe), info=info,
+                                              on_exit=self.on_session_exit)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not start engine: {e}")
+
+    def on_session_exit(self, record):
+        # Reader thread: the engine quit; keep its timings
+        try:
+            append_launch_history(record)
+        except OSError as e:
+            print(f"Launch history error: {e}")
+        load = record["load_seconds"]
+        print(f"Session {record['mod']}/{record['map']}: load "
+              f"{f'{load:.2f}s' if load is not None else 'n/a'}"
+              f"{' (cache warmed)' if record.get('warmed') else ''}, played {record['session_seconds']:.0f}s")
+
+    def open_launch_history(self):
+        hist_win = tk.Toplevel(self.root)
+        hist_win.title("Launch History")
+        hist_win.geometry("900x400")
+        records = read_launch_history()
+
+        header = f"{'time':<19}  {'engine':<14} {'mod':<12} {'map':<16} {'load':>8} {'spawn':>8} {'played':>8}  args"
+        tk.Label(hist_win, text=header, font=("Courier", 10), anchor="w").pack(fill="x", padx=5)
+        frame = tk.Frame(hist_win)
+        frame.pack(fill="both", expand=True, padx=5)
+        scroll = tk.Scrollbar(frame)
+        scroll.pack(side="right", fill="y")
+        rows = tk.Listbox(frame, font=("Courier", 10), yscrollcommand=scroll.set)
+        rows.pack(side="left", fill="both", expand=True)
+        scroll.config(command=rows.yview)
+
+        secs = lambda v: f"{v:7.2f}s" if v is not None else f"{'-':>8}"
+        for rec in records:
+            engine = os.path.basename(rec.get("engine") or "")
+            rows.insert(tk.END, f"{rec.get('time', ''):<19}  {engine[:14]:<14} {str(rec.get('mod'))[:12]:<12} "
+                                f"{str(rec.get('map'))[:16]:<16} {secs(rec.get('load_seconds'))} "
+                                f"{secs(rec.get('map_spawn'))} {secs(rec.get('session_seconds'))}  {rec.get('args') or ''}")
+
+        # Average load time with and without page cache warming
+        averages = summarize_warm_loads(records)
+        if averages:
+            text = "   ".join(f"{'Warmed' if k else 'Not warmed'}: {avg:.2f}s average over {n} launches"
+                               for k, (avg, n) in sorted(averages.items(), reverse=True))
+            tk.Label(hist_win, text=text, anchor="w").pack(fill="x", padx=5)
+
+        buttons = tk.Frame(hist_win)
+        buttons.pack(fill="x", pady=5)
+        tk.Button(buttons, text="Export...", command=lambda: self.export_history(records)).pack(side="left", padx=5)
+        tk.Button(buttons, text="Last Engine Output", command=self.show_last_output).pack(side="left", padx=5)
+        tk.Button(buttons, text="Close", command=hist_win.destroy).pack(side="right", padx=5)
+
+    def open_storage(self):
+        store_win = tk.Toplevel(self.root)
+        store_win.title("Storage")
+        store_win.geometry("420x460")
+
+        tk.Label(store_win, textvariable=self.storage_status, justify="left", anchor="w").pack(fill="x", padx=5, pady=5)
+        frame = tk.Frame(store_win)
+        frame.pack(fill="both", expand=True, padx=5)
+        scroll = tk.Scrollbar(frame)
+        scroll.pack(side="right", fill="y")
+        rows = tk.Listbox(frame, font=("Courier", 10), yscrollcommand=scroll.set)
+        rows.pack(side="left", fill="both", expand=True)
+        scroll.config(command=rows.yview)
+
+        def fill():
+            rows.delete(0, tk.END)
+            for mod, size in sorted(self.storage_mods.items(), key=lambda kv: -kv[1]):
+                rows.insert(tk.END, f"{mod[:28]:<28} {size / 1048576:9.1f} MB")
+        fill()
+
+        options = tk.Frame(store_win)
+        options.pack(fill="x", pady=5)
+        tk.Label(options, text="Budget").pack(side="left", padx=5)
+        budgets = {"No limit": 0, "500 MB": 500, "1 GB": 1024, "2 GB": 2048, "5 GB": 5120, "10 GB": 10240}
+        current = next((k for k, v in budgets.items() if v == self.storage_budget_mb), f"{self.storage_budget_mb} MB")
+        budget_var = tk.StringVar(store_win, value=current)
+        tk.OptionMenu(options, budget_var, *budgets,
+                      command=lambda k: self.change_storage(budget_mb=budgets[k])).pack(side="left")
+        policy_var = tk.StringVar(store_win, value=self.storage_policy)
+        tk.OptionMenu(options, policy_var, "lru", "age",
+                      command=lambda p: self.change_storage(policy=p)).pack(side="left", padx=5)
+        recompress_var = tk.BooleanVar(store_win, value=self.storage_recompress)
+        tk.Checkbutton(options, text="Recompress", variable=recompress_var,
+                       command=lambda: self.change_storage(recompress=recompress_var.get())).pack(side="left")
+
+        buttons = tk.Frame(store_win)
+        buttons.pack(fill="x", pady=5)
+        tk.Button(buttons, text="Clean Up Now", command=lambda: self.check_storage(force=True, periodic=False)).pack(side="left", padx=5)
+        tk.Button(buttons, text="Refresh", command=fill).pack(side="left", padx=5)
+        tk.Button(buttons, text="Close", command=store_win.destroy).pack(side="right", padx=5)
+
+    def change_storage(self, budget_mb=None, policy=None, recompress=None):
+        if budget_mb is not None: self.storage_budget_mb = budget_mb
+        if policy is not None: self.storage_policy = policy
+        if recompress is not None: self.storage_recompress = recompress
+        self.save_config()
+
+    def export_history(self, records):
+        path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")])
+        if not path: return
+        try:
+            export_launch_history(records, path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Export failed: {e}")
+
+    def show_last_output(self):
+        session = self.last_session
+        out_win = tk.Toplevel(self.root)
+        out_win.title("Engine Output")
+        out_win.geometry("800x500")
+        text = tk.Text(out_win, font=("Courier", 10), wrap="none")
+        text.pack(fill="both", expand=True)
+        text.insert("1.0", session.output_text() if session else "No engine launched with recording on.")
+        text.config(state="disabled")
 
 
     def force_rescan_mod(self):
@@ -731,14 +4239,23 @@ class QuakeLauncher:
         if not sel: return
         m_name = self.mod_listbox.get(sel[0])
         m_path = os.path.join(self.base_dir.get(), m_name)
-        cache = os.path.join(m_path, "previews", "map_cache.json")
-        if os.path.exists(cache): os.remove(cache)
+        self.clear_title_cache(m_name)
+        for cache_name in ["map_cache.json", "scan_cache.json"]:
+            cache = self.fs.resolve(m_path, "previews", cache_name)
+            if cache:
+                os.remove(cache)
+                self.fs.invalidate(os.path.dirname(cache))
+        for key in [k for k in self.map_info if k[0] == m_name]:
+            del self.map_info[key]
+        self.jobs.bump("mod")
+        self.jobs.submit(PRIORITY_BACKGROUND, None, lambda: self.daemon_call("rescan", mod=m_name))
         self.start_new_scan(m_name, m_path)
 
     def delete_current_screenshot(self):
         if self.current_img_path and os.path.exists(self.current_img_path):
             if messagebox.askyesno("Delete", "Delete this screenshot?"):
                 os.remove(self.current_img_path)
+                self.fs.invalidate(os.path.dirname(self.current_img_path))
                 self.on_map_select(None)
 
     def open_previews_folder(self):
@@ -749,55 +4266,6 @@ class QuakeLauncher:
                 if platform.system() == "Windows": os.startfile(p)
                 else: subprocess.Popen(["xdg-open", p])
 
-    def is_valid_map_data(self, data_chunk):
-        #Helper to check a byte chunk for playable spawn points.
-        try:
-            # decode with latin-1 to avoid any UnicodeDecodeErrors from binary junk
-            content = data_chunk.decode('latin-1', errors='ignore')
-            # Look for any valid spawn point type
-            valid_starts = ['info_player_start', 'info_player_deathmatch', 'info_player_coop']
-            return any(start in content for start in valid_starts)
-        except:
-            return False
-
-    def is_valid_bsp(self, f, offset=0):
-        try:
-            import struct
-            f.seek(offset)
-            magic = f.read(4)
-            
-            # --- Support for BSP2 and 2PSB (Something Wicked) ---
-            if magic in [b'BSP2', b'2PSB']:
-                ent_off = struct.unpack('<I', f.read(4))[0]
-                ent_size = struct.unpack('<I', f.read(4))[0]
-            else:
-                f.seek(offset)
-                version = struct.unpack('<I', f.read(4))[0]
-                # Standard Quake is version 29
-                if version != 29: return False
-                ent_off = struct.unpack('<I', f.read(4))[0]
-                ent_size = struct.unpack('<I', f.read(4))[0]
-
-            if ent_size == 0: return False
-
-            # --- Read Entity Data ---
-            f.seek(offset + ent_off)
-            # We read more data now (up to 1MB) to ensure we find the player start
-            # in massive files like Something Wicked.
-            entity_chunk = f.read(min(ent_size, 1048576)).decode('latin-1', errors='ignore').lower()
-            
-            # 1. Must have worldspawn
-            if 'worldspawn' not in entity_chunk:
-                return False
-            
-            # 2. Relaxed player start check (catches custom mod spawns)
-            if 'info_player' not in entity_chunk:
-                return False
-                
-            return True
-        except:
-            return False
-
     def watch_screenshots(self, mod_name):
         #Threaded worker that watches for new screenshots in the mod root.
         mod_path = os.path.join(self.base_dir.get(), mod_name)
@@ -809,12 +4277,14 @@ class QuakeLauncher:
         while not self.stop_screenshot_watch.is_set():
             # Use the global variable here too
             for pattern in SCREENSHOT_PATTERNS:
-                if not os.path.exists(mod_path): continue
-                for f in os.listdir(mod_path):
+                if not self.fs.isdir(mod_path): continue
+                for f in self.fs.listdir(mod_path):
                     if fnmatch.fnmatch(f.lower(), pattern):
-                        sel = self.map_listbox.curselection()
-                        if not sel: continue
-                        map_name = self.map_listbox.get(sel[0]).lower()
+                        # Never touch Tk widgets from this thread; the UI keeps
+                        # current_map_name up to date for us
+                        map_name = self.current_map_name
+                        if not map_name: continue
+                        map_name = map_name.lower()
                         
                         # (The rest of your existing logic remains the same)
                         full_old_path = os.path.join(mod_path, f)
@@ -825,11 +4295,42 @@ class QuakeLauncher:
                         time.sleep(1) 
                         try:
                             shutil.move(full_old_path, full_new_path)
-                            self.root.after(0, lambda p=full_new_path: self.display_new_screenshot(p))
+                            self.fs.invalidate(mod_path)
+                            self.fs.invalidate(previews_path)
+                            self.submit_ingest(full_new_path)
                         except Exception: pass
             
             time.sleep(2)
 
+    def submit_ingest(self, path, display=True):
+        # Queue a captured preview for conversion + thumbnailing
+        self.ingest_pool.submit(self.ingest_preview, path, display)
+
+    def ingest_preview(self, path, display):
+        # Ingest pool: one map at a time, since repeated shots reuse the same name
+        with self.ingest_locks_guard:
+            lock = self.ingest_locks.setdefault(path.lower(), threading.Lock())
+        with lock:
+            if not os.path.exists(path):
+                return  # a later shot of the same map already replaced it
+            try:
+                new_path = ingest_screenshot(path, self.screenshot_format,
+                                             strip_metadata=self.strip_screenshot_metadata)
+            except Exception as e:
+                print(f"Screenshot ingest error: {e}")
+                new_path = path
+            self.fs.invalidate(os.path.dirname(path))
+        if display:
+            self.jobs.post(self.display_new_screenshot, new_path)
+
+    def ingest_leftover_previews(self, mod_path):
+        # Older launcher versions left raw TGA captures in previews/
+        pre = self.fs.resolve(mod_path, "previews")
+        if pre:
+            for f in self.fs.listdir(pre):
+                if f.lower().endswith('.tga'):
+                    self.submit_ingest(os.path.join(pre, f), display=False)
+
     def display_new_screenshot(self, path):
         # Force the cache to clear so the new file is loaded from disk
         self.cached_image = None
@@ -838,118 +4339,18 @@ class QuakeLauncher:
         self.current_img_path = path
         self.render_image(path)
 
-    def get_map_stats(self, entity_data, skill):
-        #Counts monsters and secrets based on skill level bitmasks.
-        # Normalize skill input
+    def update_map_stats_display(self, info):
+        #Shows the cached counts for the current skill in the UI label.
+        current_skill = self.skill_level.get()
         try:
-            skill = int(skill)
-        except:
-            skill = 1
-
-        # Find all monster entity blocks
-        # This looks for the start of an entity { to the end }
-        entities = re.findall(r'\{[^{}]*\}', entity_data)
-        
-        monster_count = 0
-        secret_count = 0
-        
-        # Skill bitmasks
-        # 256 = Not on Easy, 512 = Not on Normal, 1024 = Not on Hard
-        exclude_bits = {0: 256, 1: 512, 2: 1024, 3: 1024}
-        target_bit = exclude_bits.get(skill, 512)
-
-        for ent in entities:
-            # Check for Secrets
-            if '"classname" "trigger_secret"' in ent:
-                secret_count += 1
-                continue
-            
-            # Check for Monsters
-            if '"classname" "monster_' in ent:
-                # Look for spawnflags
-                sf_match = re.search(r'"spawnflags"\s+"(\d+)"', ent)
-                if sf_match:
-                    spawnflags = int(sf_match.group(1))
-                    # If the "exclude" bit for this skill is set, don't count it
-                    if spawnflags & target_bit:
-                        continue
-                
-                monster_count += 1
-
-        return monster_count, secret_count
-
-    def update_map_stats_display(self, mod_path, map_name):
-        #Coordinates the search for the map and updates the UI label.
-        self.map_info_label.config(text="Monsters: -- | Secrets: --")
-        
-        entity_text = ""
-        # 1. Check Loose Files (in /maps or root)
-        for folder in ["maps", ""]:
-            bsp_path = os.path.join(mod_path, folder, f"{map_name}.bsp")
-            if os.path.exists(bsp_path):
-                with open(bsp_path, 'rb') as f:
-                    entity_text = self.extract_entities_robust(f)
-                break
-
-        # 2. If not found loose, check PAKs
-        if not entity_text:
-            for f_name in os.listdir(mod_path):
-                if f_name.lower().endswith('.pak'):
-                    pak_path = os.path.join(mod_path, f_name)
-                    entity_text = self.get_entities_from_pak(pak_path, map_name)
-                    if entity_text: break
-
-        if entity_text:
-            # Get current skill from the StringVar
-            current_skill = self.skill_level.get()
-            m, s = self.get_map_stats(entity_text, current_skill)
+            stats = info["stats"].get(int(current_skill))
+        except ValueError:
+            stats = None
+        if stats:
+            m, s = stats
             self.map_info_label.config(text=f"Skill {current_skill} | Monsters: {m} | Secrets: {s}")
-
-    def extract_entities_robust(self, f, offset=0):
-        # Extracts the full entity lump based on the BSP format.
-        try:
-            import struct
-            f.seek(offset)
-            magic = f.read(4)
-            
-            ent_off, ent_size = None, None
-            
-            if magic == b'BSP2':
-                ent_off = struct.unpack('<I', f.read(4))[0]
-                ent_size = struct.unpack('<I', f.read(4))[0]
-            elif magic == b'2PSL':
-                f.seek(offset + 8)
-                ent_off = struct.unpack('<Q', f.read(8))[0]
-                ent_size = struct.unpack('<Q', f.read(8))[0]
-            else:
-                # Standard BSP (Version 29)
-                f.seek(offset + 4) 
-                ent_off = struct.unpack('<I', f.read(4))[0]
-                ent_size = struct.unpack('<I', f.read(4))[0]
-
-            if ent_off and ent_size > 0:
-                f.seek(offset + ent_off)
-                return f.read(ent_size).decode('latin-1', errors='ignore')
-        except:
-            pass
-        return ""
-
-    def get_entities_from_pak(self, pak_path, map_target):
-        # Finds a map inside a PAK and returns its entity string.
-        try:
-            import struct
-            with open(pak_path, 'rb') as f:
-                header = f.read(12)
-                off, sz = struct.unpack('<II', header[4:12])
-                f.seek(off)
-                for _ in range(sz // 64):
-                    ent = f.read(64)
-                    filename = ent[:56].split(b'\0')[0].decode('ascii', errors='ignore').lower()
-                    if filename.endswith(f"{map_target.lower()}.bsp"):
-                        file_off = struct.unpack('<I', ent[56:60])[0]
-                        return self.extract_entities_robust(f, file_off)
-        except: pass
-        return ""
+        else:
+            self.map_info_label.config(text="Monsters: -- | Secrets: --")
 
     def save_mod_cli(self, *args):
         sel = self.mod_listbox.curselection()
@@ -962,45 +4363,8 @@ class QuakeLauncher:
         self.save_config()
         self.save_config()
 
-    def get_map_title(self, mod_name, map_name):
-        # Attempts to find the 'message' (title) of the map from its entity data.
-        if map_name == "(Default)":
-            return f"Mod: {mod_name}"
-
-        # We use .get() because base_dir is a Tkinter StringVar
-        mod_path = os.path.join(self.base_dir.get(), mod_name)
-        entity_text = ""
-
-        # 1. Search loose files
-        for folder in ["maps", ""]:
-            bsp_path = os.path.join(mod_path, folder, f"{map_name}.bsp")
-            if os.path.exists(bsp_path):
-                try:
-                    with open(bsp_path, 'rb') as f:
-                        entity_text = self.extract_entities_robust(f)
-                    break
-                except Exception: continue
-
-        # 2. Search PAKs if not found
-        if not entity_text:
-            try:
-                for f_name in os.listdir(mod_path):
-                    if f_name.lower().endswith('.pak'):
-                        pak_path = os.path.join(mod_path, f_name)
-                        entity_text = self.get_entities_from_pak(pak_path, map_name)
-                        if entity_text: break
-            except Exception: pass
-
-        # 3. Extract the 'message' field
-        if entity_text:
-            match = re.search(r'"message"\s+"([^"]+)"', entity_text)
-            if match:
-                return match.group(1)
-
-        # 4. Fallback to cleaned-up filename
-        return map_name.replace('_', ' ').title()
-
     def restore_last_selection(self):
+        # Runs on "mods loaded"; the map itself is restored by on_maps_ready
         last_mod = self.config.get("last_mod")
         last_map = self.config.get("last_map")
         mod_scroll = self.config.get("mod_scroll", 0)
@@ -1013,46 +4377,25 @@ class QuakeLauncher:
         for i in range(self.mod_listbox.size()):
             if self.mod_listbox.get(i) == last_mod:
                 self.mod_listbox.selection_set(i)
-                self.mod_listbox.event_generate("<<ListboxSelect>>")
+                self.mod_listbox.activate(i)
+                self.pending_restore = {"mod": last_mod, "map": last_map, "map_scroll": map_scroll}
+                self.on_mod_select(None)
                 break
 
         # Restore mod scroll
         self.mod_listbox.yview_moveto(mod_scroll)
 
-        # Restore map after maps load (async safe)
-        def restore_map():
-            if last_map:
-                for i in range(self.map_listbox.size()):
-                    if self.map_listbox.get(i) == last_map:
-                        self.map_listbox.selection_set(i)
-                        self.map_listbox.event_generate("<<ListboxSelect>>")
-                        break
-
-            # Restore map scroll
-            self.map_listbox.yview_moveto(map_scroll)
-
-        self.root.after(400, restore_map)
-
-    def update_save_list(self, mod_path):
-        #Finds .sav files and adds formatted timestamps to the labels
+    def update_save_list(self, mod_path, found=None):
+        #Fills the save dropdown; pass found (from scan_saves) to skip the disk scan
+        if found is None:
+            found = self.scan_saves(mod_path)
         self.save_lookup = {"(None)": "(None)"} # Initialize lookup
         saves = ["(None)"]
-        
-        if os.path.exists(mod_path):
-            found_files = [f for f in os.listdir(mod_path) if f.lower().endswith('.sav')]
-            # Sort newest first
-            found_files.sort(key=lambda x: os.path.getmtime(os.path.join(mod_path, x)), reverse=True)
 
-            for f in found_files:
-                f_path = os.path.join(mod_path, f)
-                mtime = os.path.getmtime(f_path)
-                date_str = time.strftime('%Y-%m-%d', time.localtime(mtime))
-                
-                display_name = f"{f}  ({date_str})"
-                saves.append(display_name)
-                
-                # Store the mapping: Display Name -> Real Filename
-                self.save_lookup[display_name] = f
+        for display_name, f in found:
+            saves.append(display_name)
+            # Store the mapping: Display Name -> Real Filename
+            self.save_lookup[display_name] = f
         
         self.all_saves = saves
         
@@ -1068,7 +4411,7 @@ class QuakeLauncher:
 
     def archive_existing_screenshots(self, mod_path):
         # Moves any existing loose screenshots to an 'oldscreenshots' folder.
-        if not os.path.exists(mod_path):
+        if not self.fs.isdir(mod_path):
             return
 
         old_shots_dir = os.path.join(mod_path, "oldscreenshots")
@@ -1076,7 +4419,7 @@ class QuakeLauncher:
         found_any = False
         # Use the global variable here
         for pattern in SCREENSHOT_PATTERNS:
-            for f in os.listdir(mod_path):
+            for f in self.fs.listdir(mod_path):
                 if fnmatch.fnmatch(f.lower(), pattern):
                     if not os.path.exists(old_shots_dir):
                         os.makedirs(old_shots_dir)
@@ -1085,6 +4428,11 @@ class QuakeLauncher:
                         src = os.path.join(mod_path, f)
                         dst = os.path.join(old_shots_dir, f)
                         
+                        if os.path.exists(dst) and filecmp.cmp(src, dst, shallow=False):
+                            # Same shot archived before: don't keep another copy
+                            os.remove(src)
+                            self.fs.invalidate(mod_path)
+                            continue
                         if os.path.exists(dst):
                             timestamp = int(time.time())
                             name, ext = os.path.splitext(f)
@@ -1092,6 +4440,7 @@ class QuakeLauncher:
                         
                         shutil.move(src, dst)
                         found_any = True
+                        self.fs.invalidate(mod_path)
                     except Exception as e:
                         print(f"Error archiving {f}: {e}")
         
@@ -1121,7 +4470,7 @@ class QuakeLauncher:
             self.save_map_display.config(state="readonly")
 
             # Auto-select map in the listbox
-            all_visible_maps = self.map_listbox.get(0, tk.END)
+            all_visible_maps = self.visible_maps
             for i, m in enumerate(all_visible_maps):
                 if m.lower() == map_name.lower():
                     self.map_listbox.selection_clear(0, tk.END)
@@ -1177,7 +4526,7 @@ class QuakeLauncher:
             self.save_map_display.config(state="readonly")
 
             # 4. AUTO-SELECT the map in the Map Listbox
-            all_visible_maps = self.map_listbox.get(0, tk.END)
+            all_visible_maps = self.visible_maps
             for i, m in enumerate(all_visible_maps):
                 if m.lower() == map_name.lower():
                     self.map_listbox.selection_clear(0, tk.END)
@@ -1243,8 +4592,770 @@ class QuakeLauncher:
 
 
 
+# --- Timedemo benchmark mode (python3 the-quaker-deliverance.py --benchmark ...) ---
+
+# Matches the engine summary, e.g. "969 frames 7.3 seconds 132.7 fps" (vkQuake,
+# Ironwail, Quakespasm) or "969 frames 7.31 seconds 132.65 fps, 0.4 ms ..." (FTEQW)
+TIMEDEMO_RE = re.compile(r'(\d+)\s+frames\s+([\d.]+)\s+seconds\s+([\d.]+)\s+fps', re.IGNORECASE)
+
+
+def parse_timedemo_output(text):
+    # Returns {"frames", "seconds", "fps"} from the last timedemo summary, or None
+    matches = TIMEDEMO_RE.findall(text or "")
+    if not matches:
+        return None
+    frames, seconds, fps = matches[-1]
+    return {"frames": int(frames), "seconds": float(seconds), "fps": float(fps)}
+
+
+def read_log_tail(path, start_size):
+    # Text appended to a log (e.g. qconsole.log) since it was start_size bytes long
+    try:
+        with open(path, 'rb') as f:
+            if os.path.getsize(path) < start_size:
+                start_size = 0  # log was truncated/recreated by the engine
+            f.seek(start_size)
+            return f.read().decode('latin-1', errors='ignore')
+    except OSError:
+        return ""
+
+
+def run_timedemo(cmd, cwd=None, log_path=None, timeout=300):
+    # Runs one engine invocation and returns its parsed timedemo result.
+    # Engines keep running after a timedemo, so the process is stopped as soon
+    # as the summary line shows up on stdout (or the timeout expires).
+    log_start = os.path.getsize(log_path) if log_path and os.path.exists(log_path) else 0
+    output = []
+    done = threading.Event()
+    started = time.monotonic()
+
+    try:
+        proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, text=True, errors="replace")
+    except OSError as e:
+        return {"status": f"error: {e}", "frames": None, "seconds": None, "fps": None, "wall": 0.0}
+
+    def reader():
+        for line in proc.stdout:
+            output.append(line)
+            if TIMEDEMO_RE.search(line):
+                done.set()
+        done.set()
+
+    threading.Thread(target=reader, daemon=True).start()
+    finished = done.wait(timeout)
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    wall = time.monotonic() - started
+
+    # Prefer stdout; fall back to the console log for engines that only log there
+    result = parse_timedemo_output("".join(output))
+    if result is None and log_path:
+        result = parse_timedemo_output(read_log_tail(log_path, log_start))
+    if result is None:
+        status = "timeout" if not finished else "no timedemo output"
+        return {"status": status, "frames": None, "seconds": None, "fps": None, "wall": round(wall, 3)}
+    result.update(status="ok", wall=round(wall, 3))
+    return result
+
+
+def run_benchmark(engines, mods, demos, arg_sets, repeat=1, base_dir=None, timeout=300, log=print):
+    # Runs every engine x mod x demo x args combination `repeat` times
+    rows = []
+    for exe in engines:
+        for mod in mods:
+            log_path = os.path.join(base_dir, mod, "qconsole.log") if base_dir else None
+            for demo in demos:
+                for args in arg_sets:
+                    for run in range(1, repeat + 1):
+                        cmd = build_launch_command(exe, mod, extra_args=args, commands=["+timedemo", demo])
+                        log(f"[{run}/{repeat}] {' '.join(cmd)}")
+                        result = run_timedemo(cmd, cwd=os.path.dirname(exe) or None,
+                                              log_path=log_path, timeout=timeout)
+                        row = {"engine": os.path.basename(exe), "mod": mod, "demo": demo,
+                               "args": args, "run": run}
+                        row.update(result)
+                        log(f"    {row['status']}: {row['fps']} fps")
+                        rows.append(row)
+    return rows
+
+
+def summarize_benchmark(rows):
+    # One line per configuration with mean/min/max fps over the successful runs
+    groups = {}
+    for row in rows:
+        key = (row["engine"], row["mod"], row["demo"], row["args"])
+        groups.setdefault(key, []).append(row)
+
+    summary = []
+    for (engine, mod, demo, args), runs in groups.items():
+        fps = [r["fps"] for r in runs if r["status"] == "ok"]
+        summary.append({
+            "engine": engine, "mod": mod, "demo": demo, "args": args,
+            "runs": len(runs), "ok": len(fps),
+            "mean_fps": round(sum(fps) / len(fps), 2) if fps else None,
+            "min_fps": min(fps) if fps else None,
+            "max_fps": max(fps) if fps else None,
+        })
+    return summary
+
+
+def write_benchmark_results(rows, path):
+    # .json gets runs + summary; anything else is written as CSV of the runs
+    summary = summarize_benchmark(rows)
+    if path.lower().endswith(".json"):
+        with open(path, 'w') as f:
+            json.dump({"runs": rows, "summary": summary}, f, indent=4)
+    else:
+        import csv
+        fields = ["engine", "mod", "demo", "args", "run", "status", "frames", "seconds", "fps", "wall"]
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+    return summary
+
+
+def print_benchmark_table(summary):
+    header = f"{'engine':<20} {'mod':<12} {'demo':<12} {'args':<24} {'ok':>5} {'mean':>9} {'min':>9} {'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for s in sorted(summary, key=lambda s: (s["mod"], s["demo"], -(s["mean_fps"] or 0))):
+        fmt = lambda v: f"{v:9.1f}" if v is not None else f"{'-':>9}"
+        print(f"{s['engine'][:20]:<20} {s['mod'][:12]:<12} {s['demo'][:12]:<12} {s['args'][:24]:<24} "
+              f"{s['ok']:>2}/{s['runs']:<2} {fmt(s['mean_fps'])} {fmt(s['min_fps'])} {fmt(s['max_fps'])}")
+
+
+def benchmark_main(argv):
+    import argparse
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f: config = json.load(f)
+
+    parser = argparse.ArgumentParser(prog="the-quaker-deliverance.py --benchmark",
+                                     description="Run +timedemo across engines, mods, demos and CLI args.")
+    parser.add_argument("--engine", action="append", dest="engines",
+                        help="Engine executable (repeatable, default: configured engine)")
+    parser.add_argument("--mod", action="append", dest="mods", help="Mod/game dir (repeatable, default: id1)")
+    parser.add_argument("--demo", action="append", dest="demos", help="Demo name (repeatable, default: demo1)")
+    parser.add_argument("--args", action="append", dest="arg_sets",
+                        help='Extra CLI args for one configuration, e.g. --args="-heapsize 262144" (repeatable)')
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (default: 3)")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds before a run is abandoned")
+    parser.add_argument("--base-dir", default=config.get("base_dir", ""),
+                        help="Quake root, used to read <mod>/qconsole.log")
+    parser.add_argument("--output", default="benchmark.csv", help="Results file (.csv or .json)")
+    opts = parser.parse_args(argv)
+
+    engines = opts.engines or ([config["exe"]] if config.get("exe") else [])
+    if not engines:
+        parser.error("no engine given and none configured")
+
+    rows = run_benchmark(engines, opts.mods or ["id1"], opts.demos or ["demo1"], opts.arg_sets or [""],
+                         repeat=max(1, opts.repeat), base_dir=opts.base_dir or None, timeout=opts.timeout)
+    summary = write_benchmark_results(rows, opts.output)
+    print()
+    print_benchmark_table(summary)
+    print(f"\nResults written to {opts.output}")
+    return 0 if all(s["ok"] for s in summary) else 1
+
+
+# --- UI responsiveness benchmark (python3 the-quaker-deliverance.py --ui-benchmark ...) ---
+# Runs the real launcher under Xvfb against a synthetic library, scripts the
+# usual interactions and measures how late a 5 ms heartbeat after() fires:
+# every late beat is a stall the user would have felt.
+UI_BENCH_HEARTBEAT_MS = 5
+UI_BENCH_CONFIG = {"exe": "", "skill": "1", "window_size": "1200x800", "watch_library": False,
+                   "generate_overviews": False, "show_map_titles": True}
+
+
+def make_synthetic_library(root, mods=8, maps=300, previews=40):
+    # Quake tree of mods with one PAK each: minimal BSPs (sparse, so a few
+    # hundred MB of "maps" cost no disk), varied monsters and some previews
+    shot = Image.effect_noise((1920, 1080), 64).convert("RGB")
+    for m in range(mods):
+        mod_path = os.path.join(root, "id1" if m == 0 else f"mod{m:02d}")
+        os.makedirs(os.path.join(mod_path, "previews"), exist_ok=True)
+        directory = b""
+        with open(os.path.join(mod_path, "pak0.pak"), 'wb') as f:
+            f.write(b"\0" * 12)
+            for i in range(maps):
+                name = f"m{m:02d}e{i:03d}"
+                monster = b'{\n"classname" "monster_ogre"\n"spawnflags" "%d"\n}\n'
+                ents = (b'{\n"classname" "worldspawn"\n"message" "Synthetic map %d"\n}\n' % i +
+                        b'{\n"classname" "info_player_start"\n}\n' +
+                        b"".join(monster % (256 if j % 3 == 0 else 0) for j in range(i % 200)) + b"\0")
+                off, size = f.tell(), 65536 + len(ents)
+                f.write(struct.pack('<iII', 29, BSP_HEADER_BYTES, len(ents)).ljust(BSP_HEADER_BYTES, b"\0") + ents)
+                f.seek(off + size)
+                directory += f"maps/{name}.bsp".encode().ljust(56, b"\0") + struct.pack('<II', off, size)
+                if i < previews:
+                    preview = os.path.join(mod_path, "previews", name + ".jpg")
+                    if m == 0 and i == 0:
+                        shot.save(preview, quality=90)
+                        first = preview
+                    else:
+                        try: os.link(first, preview)
+                        except OSError: shutil.copyfile(first, preview)
+            dir_off = f.tell()
+            f.write(directory)
+            f.seek(0)
+            f.write(b"PACK" + struct.pack('<II', dir_off, len(directory)))
+    return root
+
+
+def start_xvfb(screen="1600x1000x24"):
+    # Starts Xvfb on the first free display and points DISPLAY at it
+    exe = shutil.which("Xvfb")
+    if not exe:
+        raise OSError("Xvfb not found (e.g. sudo apt install xvfb), or pass --use-display")
+    for n in range(99, 120):
+        if os.path.exists(f"/tmp/.X11-unix/X{n}") or os.path.exists(f"/tmp/.X{n}-lock"):
+            continue
+        proc = subprocess.Popen([exe, f":{n}", "-screen", "0", screen, "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and proc.poll() is None:
+            if os.path.exists(f"/tmp/.X11-unix/X{n}"):
+                os.environ["DISPLAY"] = f":{n}"
+                return proc
+            time.sleep(0.05)
+        proc.kill()
+        proc.wait()
+    raise OSError("could not start Xvfb")
+
+
+def stall_summary(lags):
+    # p50/p99/max of the heartbeat lateness (ms)
+    if not lags:
+        return {"beats": 0, "p50_ms": None, "p99_ms": None, "max_ms": None, "stalls_over_50ms": 0}
+    s = sorted(lags)
+    pick = lambda p: round(s[min(len(s) - 1, int(p / 100 * (len(s) - 1) + 0.5))], 2)
+    return {"beats": len(s), "p50_ms": pick(50), "p99_ms": pick(99), "max_ms": round(s[-1], 2),
+            "stalls_over_50ms": sum(1 for v in s if v > 50)}
+
+
+class UiBenchmark:
+    # Runs (phase, action, delay ms) steps on the Tk thread, one after the
+    # other, while the heartbeat records how late each beat was per phase
+
+    def __init__(self, app, steps, heartbeat_ms=UI_BENCH_HEARTBEAT_MS):
+        self.app = app
+        self.root = app.root
+        self.steps = list(steps)
+        self.heartbeat_ms = heartbeat_ms
+        self.lags = {}  # phase -> [ms late]
+        self.phase = None
+        self.last_beat = None
+        self.done = False
+
+    def run(self):
+        self.root.after(self.heartbeat_ms, self.beat)
+        self.root.after(0, self.next_step)
+        self.root.mainloop()
+        return self.lags
+
+    def beat(self):
+        now = time.perf_counter()
+        if self.last_beat is not None and self.phase:
+            late = (now - self.last_beat) * 1000 - self.heartbeat_ms
+            self.lags.setdefault(self.phase, []).append(max(0.0, late))
+        self.last_beat = now
+        if not self.done:
+            self.root.after(self.heartbeat_ms, self.beat)
+
+    def next_step(self):
+        if not self.steps:
+            self.done = True
+            self.root.quit()
+            return
+        phase, action, delay = self.steps.pop(0)
+        self.phase = phase
+        try:
+            action()
+        except Exception as e:
+            print(f"UI benchmark step error ({phase}): {e}")
+        self.root.after(delay, self.next_step)
+
+
+def ui_benchmark_steps(app, mods=8, arrow_steps=60):
+    # The scripted session: (phase, action, ms to wait before the next step)
+    def select_row(listbox, i):
+        if listbox.size() == 0: return
+        i %= listbox.size()
+        listbox.selection_clear(0, tk.END)
+        listbox.selection_set(i)
+        listbox.activate(i)
+        listbox.see(i)
+        listbox.event_generate("<<ListboxSelect>>")
+
+    def typing(var, text, phase, delay):
+        steps = [(phase, lambda n=n: var.set(text[:n]), delay) for n in range(1, len(text) + 1)]
+        return steps + [(phase, lambda n=n: var.set(text[:n]), delay) for n in range(len(text) - 1, -1, -1)]
+
+    def scroll_gallery():
+        if app.gallery:
+            app.gallery.canvas.yview_scroll(3, "units")
+
+    def close_gallery():
+        if app.gallery:
+            app.gallery.close()
+
+    steps = [("startup", lambda: None, 1500)]
+    steps += [("select mod", lambda i=i: select_row(app.mod_listbox, i), 400) for i in range(mods)]
+    steps += [("select mod (cached)", lambda i=i: select_row(app.mod_listbox, i), 200) for i in range(mods)]
+    steps += [("arrow through maps", lambda i=i: select_row(app.map_listbox, i), 33) for i in range(arrow_steps)]
+    steps += typing(app.map_search_var, "e01", "map search", 80)
+    steps += typing(app.map_search_var, "has:monster_ogre monsters>100", "entity query", 60)
+    steps += typing(app.mod_search_var, "mod0", "mod search", 80)
+    steps += [("skill", lambda k=k: app.skill_level.set(str(k % 4)), 150) for k in range(8)]
+    sizes = ["1200x800", "1320x860", "1440x920", "1320x860"]
+    steps += [("resize", lambda g=sizes[k % 4]: app.root.geometry(g), UI_FRAME_MS) for k in range(24)]
+    steps += [("resize", lambda: None, 400)]  # the high quality render after the drag
+    steps += typing(app.extra_args, "-heapsize 65536", "extra args", 60)
+    steps += [("gallery", app.open_gallery, 300)]
+    steps += [("gallery", scroll_gallery, UI_FRAME_MS) for _ in range(40)]
+    steps += [("gallery", close_gallery, 200)]
+    return steps
+
+
+def ui_benchmark_main(argv):
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(prog="the-quaker-deliverance.py --ui-benchmark",
+                                     description="Script the launcher UI under Xvfb and report event loop stalls.")
+    parser.add_argument("--mods", type=int, default=8, help="Mods in the synthetic library (default: 8)")
+    parser.add_argument("--maps", type=int, default=300, help="Maps per mod (default: 300)")
+    parser.add_argument("--library", help="Use this Quake root instead of a synthetic one "
+                                          "(its previews/ caches are written as usual)")
+    parser.add_argument("--use-display", action="store_true", help="Run on $DISPLAY instead of starting Xvfb")
+    parser.add_argument("--output", help="Results file (.csv or .json)")
+    parser.add_argument("--max-p99", type=float, help="Exit with status 1 if the overall p99 stall (ms) is above this")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    opts = parser.parse_args(argv)
+    output = os.path.abspath(opts.output) if opts.output else None
+
+    xvfb = None if opts.use_display else start_xvfb()
+    work = tempfile.mkdtemp(prefix="tqd-ui-bench-")
+    cwd = os.getcwd()
+    try:
+        library = os.path.abspath(opts.library) if opts.library else \
+            make_synthetic_library(os.path.join(work, "quake"), opts.mods, opts.maps)
+        with open(os.path.join(work, CONFIG_FILE), 'w') as f:
+            json.dump(dict(UI_BENCH_CONFIG, base_dir=library), f)
+        os.chdir(work)  # config, ledger and history files stay in the scratch dir
+        root = tk.Tk()
+        app = QuakeLauncher(root)
+        started = time.perf_counter()
+        lags = UiBenchmark(app, ui_benchmark_steps(app, mods=opts.mods)).run()
+        elapsed = time.perf_counter() - started
+        app.on_close()
+    finally:
+        os.chdir(cwd)
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait()
+        if opts.keep:
+            print(f"Scratch directory: {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    rows = [dict(phase=phase, **stall_summary(v)) for phase, v in lags.items()]
+    rows.append(dict(phase="all", **stall_summary([x for v in lags.values() for x in v])))
+    header = f"{'phase':<22} {'beats':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'>50ms':>6}"
+    print(header)
+    print("-" * len(header))
+    fmt = lambda v: f"{v:8.1f}" if v is not None else f"{'-':>8}"
+    for row in rows:
+        print(f"{row['phase']:<22} {row['beats']:>6} {fmt(row['p50_ms'])} {fmt(row['p99_ms'])} "
+              f"{fmt(row['max_ms'])} {row['stalls_over_50ms']:>6}")
+    print(f"\n{elapsed:.1f}s scripted session")
+
+    if output:
+        if output.lower().endswith(".json"):
+            with open(output, 'w') as f:
+                json.dump(rows, f, indent=4)
+        else:
+            import csv
+            with open(output, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        print(f"Results written to {opts.output}")
+
+    p99 = rows[-1]["p99_ms"]
+    if opts.max_p99 is not None and p99 is not None and p99 > opts.max_p99:
+        print(f"FAIL: p99 stall {p99:.1f} ms > {opts.max_p99:.1f} ms")
+        return 1
+    return 0
+
+
+# --- Library daemon (python3 the-quaker-deliverance.py --daemon) ---
+# Keeps the library index warm in memory and answers newline-delimited JSON
+# over a Unix socket: {"cmd": "maps", "mod": "id1"} ->
+# {"ok": true, "result": [...]} or {"ok": false, "error": "..."}.
+
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "the-quaker-deliverance.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join("/tmp", f"the-quaker-deliverance-{uid}.sock")
+
+
+class LibraryClient:
+    # Client side of the daemon protocol; one connection per thread, reopened as needed
+
+    def __init__(self, socket_path=None, timeout=30):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def call(self, cmd, **args):
+        # Raises OSError if the daemon is not running, RuntimeError if it refused
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            conn = self._local.conn = (sock, sock.makefile('rwb'))
+        try:
+            conn[1].write((json.dumps(dict(args, cmd=cmd)) + "\n").encode())
+            conn[1].flush()
+            line = conn[1].readline()
+            if not line:
+                raise ConnectionError("daemon closed the connection")
+        except OSError:
+            self.close()
+            raise
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "daemon error"))
+        return reply.get("result")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn:
+            for c in reversed(conn):
+                try: c.close()
+                except OSError: pass
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    # One thread per client connection; any number of requests per connection
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                reply = {"ok": True, "result": self.server.library.handle_request(request)}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+            self.wfile.flush()
+
+
+class LibraryDaemon(LibraryCore):
+    # Long-running, headless owner of the library index. Map lists, titles and
+    # map info stay in memory between requests; the LibraryWatcher drops what
+    # changed on disk, so answers are as fresh as a local scan. The whole
+    # library is also kept as a LibraryModel for library-wide search.
+
+    def __init__(self, quake_root, exe="", mod_extra_args=None, socket_path=None, watch=True):
+        self.init_library(quake_root)
+        self.exe = exe
+        self.mod_extra_args = mod_extra_args or {}
+        self.socket_path = socket_path or default_socket_path()
+        self.watch = watch
+        self.lock = threading.Lock()  # guards maps/titles
+        self.maps = {}    # mod -> [map, ...]
+        self.titles = {}  # mod -> {map: title}
+        self.model = LibraryModel()  # replaced wholesale, never edited in place (except counts)
+        self.model_path = LIBRARY_CACHE_FILE
+        self.server = None
+        self.watcher = None
+
+    def mod_path(self, mod):
+        # Requests name mods, never paths; keep them inside the Quake root
+        if not mod or mod in (".", "..") or "/" in mod or os.sep in mod:
+            raise ValueError(f"bad mod name: {mod!r}")
+        path = self.fs.resolve(self.quake_root, mod)
+        if not path or not self.fs.isdir(path):
+            raise ValueError(f"no such mod: {mod}")
+        return path
+
+    def get_maps(self, mod):
+        with self.lock:
+            maps = self.maps.get(mod)
+        if maps is None:
+            mod_path = self.mod_path(mod)
+            maps = self.read_map_cache(mod_path)
+            if maps is None:
+                maps = self.scan_mod_files_worker(mod, mod_path)
+            with self.lock:
+                self.maps[mod] = maps
+        return maps
+
+    def get_titles(self, mod, names=None):
+        # Known titles for mod; names not seen yet are read from the BSPs/PAKs
+        with self.lock:
+            known = self.titles.get(mod)
+        if known is None:
+            known = self.read_title_cache(self.mod_path(mod))
+            with self.lock:
+                known = self.titles.setdefault(mod, known)
+        if names is None:
+            return dict(known)
+        missing = [n for n in names if n not in known and n != "(Default)"]
+        if missing:
+            fetched = self.read_titles_batch(self.mod_path(mod), missing)
+            with self.lock:
+                known.update(fetched)
+        return {n: known[n] for n in names if n in known}
+
+    # --- Commands: handle_request dispatches {"cmd": name} to cmd_<name> ---
+
+    def handle_request(self, request):
+        handler = getattr(self, "cmd_" + str(request.get("cmd")), None)
+        if handler is None:
+            raise ValueError(f"unknown command: {request.get('cmd')}")
+        args = {k: v for k, v in request.items() if k != "cmd"}
+        return handler(**args)
+
+    def cmd_ping(self):
+        return {"root": self.quake_root, "pid": os.getpid(),
+                "maps": len(self.model), "model_bytes": self.model.nbytes()}
+
+    def cmd_search(self, text="", mod=None, skill=1, min_monsters=None, max_monsters=None,
+                   sort="name", limit=100):
+        # Library-wide: maps whose name or title contains text, optionally filtered
+        # by monster count (at skill) and sorted by name, monsters, size or mtime
+        return [rec.as_dict(skill) for rec in self.model.query(
+            text, mod, skill, min_monsters, max_monsters, sort, limit)]
+
+    def cmd_mods(self):
+        return self.list_mods()
+
+    def cmd_maps(self, mod):
+        return self.get_maps(mod)
+
+    def cmd_titles(self, mod, maps=None):
+        return self.get_titles(mod, maps)
+
+    def cmd_map_info(self, mod, map):
+        self.mod_path(mod)
+        info = self.load_map_info(mod, map)
+        self.model.set_stats(mod, map, info["stats"])
+        return info
+
+    def cmd_saves(self, mod):
+        return self.scan_saves(self.mod_path(mod))
+
+    def cmd_demos(self, mod):
+        return self.index_demos(self.mod_path(mod))
+
+    def cmd_preview(self, mod, map=None):
+        # Path of the preview image (clients run on the same machine)
+        mod_path = self.mod_path(mod)
+        if map:
+            return self.find_map_image(mod_path, map)
+        return self.find_mod_image(mod, mod_path)
+
+    def cmd_launch(self, mod, map=None, skill=None, save=None, args=None):
+        if not self.exe or not os.path.exists(self.exe):
+            raise ValueError("engine executable not configured (--exe)")
+        self.mod_path(mod)
+        extra = args if args is not None else self.mod_extra_args.get(mod, "")
+        cmd = build_launch_command(self.exe, mod, skill=skill, map_name=map,
+                                   save_name=save, extra_args=extra)
+        proc = subprocess.Popen(cmd, cwd=os.path.dirname(self.exe))
+        return {"pid": proc.pid, "cmd": cmd}
+
+    def cmd_rescan(self, mod=None):
+        self.on_library_change(mod)
+        return True
+
+    def cmd_shutdown(self):
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return True
+
+    # --- Lifecycle ---
+
+    def on_library_change(self, mod_name):
+        # Watcher thread (or "rescan"): the next request re-reads what changed
+        self.invalidate_mod(mod_name)
+        if mod_name is None:
+            mods = set(self.list_mods())
+            gone = {m: ([], None) for m in self.model.mod_names if m not in mods}
+            if gone:
+                self.model = self.model.with_mods(gone)
+            return
+        with self.lock:
+            self.maps.pop(mod_name, None)
+            self.titles.pop(mod_name, None)
+        # map_cache.json may predate the change; scan_cache.json keeps the rescan cheap
+        try:
+            mod_path = self.mod_path(mod_name)
+            maps = self.scan_mod_files_worker(mod_name, mod_path)
+            with self.lock:
+                self.maps[mod_name] = maps
+            rows = self.library_rows(mod_name, mod_path, maps)
+            self.model = self.model.with_mods({mod_name: (rows, self.mod_cache_fp(mod_path))})
+        except (OSError, ValueError) as e:
+            print(f"Daemon rescan error: {e}")
+
+    def prewarm(self):
+        # Load every mod's map list once so the first client gets instant answers
+        started = time.perf_counter()
+        mods = self.list_mods()
+        for mod in mods:
+            try:
+                self.get_maps(mod)
+            except Exception as e:
+                print(f"Daemon prewarm error ({mod}): {e}")
+        print(f"Library warm: {len(mods)} mods in {time.perf_counter() - started:.2f}s")
+        self.refresh_model(mods)
+
+    def refresh_model(self, mods):
+        # Rebuild only the mods whose caches changed since the model was saved,
+        # reading any missing titles, then fill in unknown monster/secret counts
+        started = time.perf_counter()
+        changes = {m: ([], None) for m in self.model.mod_names if m not in mods}
+        for mod in mods:
+            try:
+                mod_path = self.mod_path(mod)
+                if self.model.mod_fps.get(mod) == self.mod_cache_fp(mod_path):
+                    continue
+                maps = self.get_maps(mod)
+                self.get_titles(mod, maps)
+                changes[mod] = (self.library_rows(mod, mod_path, maps), self.mod_cache_fp(mod_path))
+            except Exception as e:
+                print(f"Library model error ({mod}): {e}")
+        if changes:
+            self.model = self.model.with_mods(changes)
+        model = self.model
+        print(f"Library model: {len(model)} maps, {model.nbytes() / 1048576:.1f} MB "
+              f"in {time.perf_counter() - started:.2f}s")
+
+        # Counts need the whole entity lump, so they come last (probe only: no
+        # per-map dicts are kept for maps nobody has asked about)
+        for row in range(len(model)):
+            if model.monsters[row * 4] != UNKNOWN_COUNT: continue
+            mod, name = model.mod_names[model.mod_idx[row]], model.name(row)
+            probe = self.probe_map(os.path.join(self.quake_root, mod), name, entity_limit=None)
+            if probe and probe["entities"]:
+                model.set_stats(mod, name, skill_stats(entity_summary(probe["entities"])))
+        self.save_model()
+
+    def save_model(self):
+        try:
+            self.model.save(self.model_path, self.quake_root)
+        except OSError as e:
+            print(f"Library cache error: {e}")
+
+    def bind(self):
+        if os.path.exists(self.socket_path):
+            # A leftover socket from a crashed daemon is replaced; a live one is not
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise OSError(f"a daemon is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.socket_path)
+            finally:
+                probe.close()
+        # The socket is created owner-only: a chmod after bind() would leave a
+        # window in which another local user could connect (and launch).
+        # Nothing else runs yet, so the process-wide umask change is safe.
+        old_umask = os.umask(0o177)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, _DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon_threads = True
+        self.server.library = self
+
+    def serve(self):
+        self.bind()
+        self.model = LibraryModel.load(self.model_path, self.quake_root) or LibraryModel()
+        threading.Thread(target=self.prewarm, name="tqd-prewarm", daemon=True).start()
+        if self.watch:
+            self.watcher = LibraryWatcher(self.quake_root, self.on_library_change).start()
+        print(f"Serving {self.quake_root} on {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            if self.watcher:
+                self.watcher.stop()
+            self.save_model()
+            self.server.server_close()
+            try: os.remove(self.socket_path)
+            except OSError: pass
+
+
+def daemon_main(argv):
+    import argparse
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r') as f: config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Config error: {e}")
+    parser = argparse.ArgumentParser(
+        prog="the-quaker-deliverance.py --daemon",
+        description="Serve the Quake library index over a Unix socket (JSON lines).")
+    parser.add_argument("--base", default=config.get("base_dir", ""),
+                        help="Quake folder containing id1 and the mods (default: from config)")
+    parser.add_argument("--exe", default=config.get("exe", ""),
+                        help="engine used by the launch command (default: from config)")
+    parser.add_argument("--socket", default=config.get("daemon_socket") or None,
+                        help=f"socket path (default: {default_socket_path()})")
+    parser.add_argument("--no-watch", action="store_true",
+                        help="do not watch the library for changes")
+    parser.add_argument("--scan-workers", type=int, default=config.get("scan_workers", SCAN_IO_WORKERS),
+                        help=f"files of one mod validated at once during a scan (default: {SCAN_IO_WORKERS})")
+    opts = parser.parse_args(argv)
+
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        print("Daemon mode needs Unix domain sockets, which this platform lacks.")
+        return 1
+    if not opts.base or not os.path.isdir(opts.base):
+        print("Quake folder not found; pass --base or set it in the launcher first.")
+        return 1
+    daemon = LibraryDaemon(opts.base, exe=opts.exe, mod_extra_args=config.get("mod_extra_args"),
+                           socket_path=opts.socket, watch=not opts.no_watch)
+    daemon.scan_workers = max(1, opts.scan_workers)
+    try:
+        daemon.serve()
+    except OSError as e:
+        print(f"Daemon error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        sys.exit(benchmark_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--pak-benchmark":
+        sys.exit(pak_benchmark_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--ui-benchmark":
+        sys.exit(ui_benchmark_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--daemon":
+        sys.exit(daemon_main(sys.argv[2:]))
     root = tk.Tk()
     app = QuakeLauncher(root)
     root.mainloop()